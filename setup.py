@@ -19,6 +19,12 @@ setuptools.setup(
     packages=setuptools.find_packages(exclude=["examples", "tests"]),
     python_requires='>=3.6',
     install_requires=['tornado>=5.0'],
+    entry_points={
+        'console_scripts': [
+            'tornado-jsonrpc2-loadtest = tornado_jsonrpc2.loadtest:main',
+            'tornado-jsonrpc2-replay = tornado_jsonrpc2.capture:main',
+        ],
+    },
     extras_require={
         'test': ['pytest-tornado>=0.7'],
     },
@@ -0,0 +1,136 @@
+"""
+Tests for the access log of calls.
+"""
+
+import functools
+import json
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.accesslog import AccessLog, FileSink
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+        self.closed = False
+
+    def __call__(self, records):
+        self.records.extend(records)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sink():
+    return ListSink()
+
+
+@pytest.fixture
+def access_log(sink):
+    return AccessLog(sink, flush_interval=60)
+
+
+@pytest.fixture
+def app(access_log):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "access_log": access_log}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_records_calls(jsonrpc_fetch, access_log, sink):
+    await jsonrpc_fetch(body=json_encode(
+        {"jsonrpc": "2.0", "method": "subtract", "params": [42, 23], "id": 1}))
+    await jsonrpc_fetch(body=json_encode(
+        [{"jsonrpc": "2.0", "method": "subtract", "params": [1, 2], "id": 2},
+         {"jsonrpc": "2.0", "method": "unknown", "id": 3},
+         {"jsonrpc": "2.0", "method": "subtract", "params": [1, 2]}]))
+
+    assert sink.records == []
+    await access_log.close()
+
+    records = sorted(sink.records, key=lambda record: (record["batch_index"] is not None,
+                                                       record["batch_index"]))
+    assert [(record["method"], record["id"], record["status"], record["batch_index"])
+            for record in records] == [
+        ("subtract", 1, 0, None),
+        ("subtract", 2, 0, 0),
+        ("unknown", 3, -32601, 1),
+        ("subtract", None, None, 2),
+    ]
+    assert all(record["duration"] >= 0 for record in records)
+    assert records[0]["client"] == "127.0.0.1"
+    assert sink.closed
+    assert access_log.stats() == {"recorded": 4, "dropped": 0, "written": 4,
+                                  "failed": 0, "buffered": 0}
+
+
+@pytest.mark.gen_test
+async def test_sampling(jsonrpc_fetch, access_log, sink):
+    access_log.sample_rate = 0.5
+    access_log._random = iter([0.1, 0.9, 0.2, 0.7]).__next__
+    for id in range(4):
+        await jsonrpc_fetch(body=json_encode(
+            {"jsonrpc": "2.0", "method": "subtract", "params": [1, 1], "id": id}))
+
+    await access_log.flush()
+    assert [record["id"] for record in sink.records] == [0, 2]
+
+
+@pytest.mark.gen_test
+async def test_dropping_when_full(sink):
+    access_log = AccessLog(sink, buffer_size=2, flush_interval=60)
+    for id in range(3):
+        access_log.record(None, {"id": id, "result": 1}, 0.1)
+
+    assert access_log.stats()["dropped"] == 1
+    await access_log.close()
+    assert len(sink.records) == 2
+
+
+@pytest.mark.gen_test
+async def test_failing_sink():
+    def sink(records):
+        raise OSError("disk full")
+
+    access_log = AccessLog(sink, flush_interval=60)
+    access_log.record(None, None, 0.1)
+    await access_log.close()
+
+    assert access_log.stats()["failed"] == 1
+
+
+@pytest.mark.gen_test
+async def test_file_sink(tmpdir):
+    path = str(tmpdir.join('access.log'))
+    access_log = AccessLog(FileSink(path), flush_interval=60)
+    access_log.record(None, {"id": 1, "error": {"code": -32600}}, 0.5)
+    await access_log.close()
+
+    with open(path) as f:
+        record = json.loads(f.readline())
+
+    assert record["status"] == -32600
+    assert record["duration"] == 0.5
@@ -0,0 +1,148 @@
+"""
+Tests for capturing and replaying traffic.
+"""
+
+import functools
+import json
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.capture import (
+    MAGIC, CaptureFile, Captured, Replay, TrafficCapture, main, read_capture)
+
+
+def make_app(capture=None):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "capture": capture}),
+    ])
+
+
+@pytest.fixture
+def capture_path(tmpdir):
+    return str(tmpdir.join('traffic.cap'))
+
+
+@pytest.fixture
+def capture(capture_path):
+    return TrafficCapture(capture_path, flush_interval=60)
+
+
+@pytest.fixture
+def app(capture):
+    return make_app(capture)
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+def call(id, params=(42, 23)):
+    return json_encode({"jsonrpc": "2.0", "method": "subtract",
+                        "params": list(params), "id": id}).encode('utf-8')
+
+
+@pytest.mark.gen_test
+async def test_captures_requests(jsonrpc_fetch, capture, capture_path):
+    await jsonrpc_fetch(body=call(1))
+    await jsonrpc_fetch(body=call(2, (1, 2)))
+    await capture.close()
+
+    records = list(read_capture(capture_path))
+    assert [record.body for record in records] == [call(1), call(2, (1, 2))]
+    assert records[0].arrival <= records[1].arrival
+    assert all(record.duration >= 0 for record in records)
+    assert capture.stats()["written"] == 2
+
+
+@pytest.mark.gen_test
+async def test_unsampled_requests_are_not_captured(jsonrpc_fetch, capture, capture_path):
+    capture.sample_rate = 0
+    capture._random = lambda: 0.5
+    await jsonrpc_fetch(body=call(1))
+    await capture.close()
+
+    assert list(read_capture(capture_path)) == []
+
+
+@pytest.mark.gen_test
+async def test_appending_and_truncated_records(capture_path):
+    with open(capture_path, 'wb') as f:
+        f.write(MAGIC)
+
+    capture = TrafficCapture(capture_path)
+    capture.record_request(b'first', 1.0, 0.5)
+    capture.record_request(bytearray(b'second'), 2.0, 0.25)
+    await capture.close()
+    with open(capture_path, 'ab') as f:
+        f.write(b'\x00' * 5)
+
+    assert list(read_capture(capture_path)) == [
+        Captured(1.0, 0.5, b'first'), Captured(2.0, 0.25, b'second')]
+
+    with open(capture_path, 'wb') as f:
+        f.write(b'{"jsonrpc": "2.0"}')
+    with pytest.raises(ValueError):
+        list(read_capture(capture_path))
+
+
+@pytest.mark.gen_test
+async def test_replay(http_server, base_url):
+    records = [Captured(100.2, 0.001, call(2)),
+               Captured(100.0, 0.001, call(1)),
+               Captured(100.1, 0.001, b'[]')]
+    replay = Replay(base_url + '/jsonrpc', records, speed=2)
+    results = await replay.run()
+
+    assert [record.body for record in replay.records] == [call(1), b'[]', call(2)]
+    assert results["requests"] == 3
+    assert results["errors"] == 1
+    assert results["replay"]["duration"] >= 0.1
+    assert results["original"]["latency"]["count"] == 3
+    assert set(results["difference"]["latency"]) == {"50", "90", "99", "99.9"}
+
+    results = await Replay(base_url + '/jsonrpc', records, speed=None,
+                           max_outstanding=1).run()
+    assert results["requests"] == 3
+    assert results["replay"]["duration"] < 0.1
+
+
+@pytest.mark.gen_test
+async def test_failures_are_recorded_separately():
+    records = [Captured(100.0, 0.001, call(1)), Captured(100.0, 0.001, call(2))]
+    results = await Replay('http://127.0.0.1:1/jsonrpc', records, speed=None).run()
+
+    assert results["failures"] == 2
+    assert results["replay"]["latency"] == {"count": 0}
+    assert results["replay"]["failed_latency"]["count"] == 2
+
+
+def test_main(tmpdir, capture_path):
+    capture_file = CaptureFile(capture_path)
+    capture_file([(1.0, 0.01, call(1)), (1.05, 0.01, call(2))])
+    capture_file.close()
+    output = str(tmpdir.join('results.json'))
+    main([capture_path, '--app', 'tests.test_capture:make_app', '--max-rate',
+          '--output', output])
+
+    with open(output) as f:
+        results = json.load(f)
+
+    assert results["requests"] == 2
+    assert results["errors"] == 0
+    assert results["speed"] is None
@@ -0,0 +1,177 @@
+"""
+Tests for failing fast with circuit breakers.
+"""
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.circuitbreaker import Breaker, CircuitBreakers, CircuitOpenError
+from tornado_jsonrpc2.exceptions import InvalidParams
+from tornado_jsonrpc2.middleware import Pipeline
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_opens_on_error_rate(clock):
+    breaker = Breaker(window=4, min_calls=4, error_rate=0.5, clock=clock)
+    for failed in (False, True, False):
+        breaker.after_call(breaker.before_call(), failed, 0.01)
+    assert breaker.state == "closed"
+
+    breaker.after_call(breaker.before_call(), True, 0.01)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = Breaker(min_calls=2, slow_call_duration=1, slow_rate=1.0, clock=clock)
+    for _ in range(2):
+        breaker.after_call(breaker.before_call(), False, 2)
+
+    assert breaker.state == "open"
+
+
+def test_window_forgets_old_calls(clock):
+    breaker = Breaker(window=2, min_calls=2, error_rate=0.6, clock=clock)
+    for failed in (True, False, False, True):
+        breaker.after_call(breaker.before_call(), failed, 0)
+
+    assert breaker.state == "closed"
+    assert breaker.stats()["failed"] == 1
+
+
+def test_half_open_probing(clock):
+    breaker = Breaker(min_calls=1, error_rate=1, reset_timeout=10, probes=2, clock=clock)
+    breaker.after_call(breaker.before_call(), True, 0)
+    assert breaker.state == "open"
+
+    clock.now = 10
+    first = breaker.before_call()
+    second = breaker.before_call()
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.after_call(first, False, 0)
+    breaker.after_call(second, True, 0)
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+    clock.now = 20
+    for _ in range(2):
+        breaker.after_call(breaker.before_call(), False, 0)
+    assert breaker.state == "closed"
+
+
+def test_calls_from_before_probing_are_ignored(clock):
+    breaker = Breaker(min_calls=1, error_rate=1, reset_timeout=10, probes=1, clock=clock)
+    slow = breaker.before_call()
+    breaker.after_call(breaker.before_call(), True, 0)
+    assert breaker.state == "open"
+
+    clock.now = 10
+    probe = breaker.before_call()
+    breaker.after_call(slow, False, 0)
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.after_call(probe, False, 0)
+    assert breaker.state == "closed"
+
+    late = breaker.before_call()
+    breaker.after_call(breaker.before_call(), True, 0)
+    assert breaker.state == "open"
+    breaker.after_call(late, True, 0)
+    assert breaker.opened == 2
+
+
+@pytest.fixture
+def backend():
+    return {"healthy": False}
+
+
+@pytest.fixture
+def breakers(clock):
+    return CircuitBreakers(min_calls=2, error_rate=1, reset_timeout=5, clock=clock)
+
+
+@pytest.fixture
+def app(backend, breakers):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def fetch(value):
+        if value < 0:
+            raise InvalidParams("Negative value")
+        if not backend["healthy"]:
+            raise ConnectionError("Backend down")
+        return value
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "middleware": Pipeline([breakers])}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    async def fetch(method, value):
+        response = await http_client.fetch(
+            base_url + '/jsonrpc', method="POST",
+            body=json_encode({"jsonrpc": "2.0", "method": method,
+                              "params": [value], "id": 1}))
+        return json_decode(response.body)
+
+    return fetch
+
+
+@pytest.mark.gen_test
+async def test_open_breaker_fails_fast(jsonrpc_fetch, backend, breakers, clock):
+    for _ in range(2):
+        response = await jsonrpc_fetch("fetch", 1)
+        assert response["error"]["code"] == -32603
+
+    response = await jsonrpc_fetch("fetch", 1)
+    assert response["error"]["code"] == -32000
+    assert breakers.stats()["fetch"]["state"] == "open"
+
+    backend["healthy"] = True
+    clock.now = 5
+    response = await jsonrpc_fetch("fetch", 1)
+    assert response["result"] == 1
+    assert breakers.stats()["fetch"]["state"] == "closed"
+
+
+@pytest.mark.gen_test
+async def test_client_errors_do_not_count(jsonrpc_fetch, breakers):
+    for _ in range(3):
+        response = await jsonrpc_fetch("fetch", -1)
+        assert response["error"]["code"] == -32602
+
+    assert breakers.stats()["fetch"]["state"] == "closed"
+
+
+@pytest.mark.gen_test
+async def test_no_breakers_for_unknown_methods(jsonrpc_fetch, breakers):
+    for _ in range(3):
+        response = await jsonrpc_fetch("unknown", 1)
+        assert response["error"]["code"] == -32601
+
+    assert breakers.stats() == {}
@@ -0,0 +1,155 @@
+"""
+Tests for the client with hedging and retry budgets.
+"""
+
+import time
+
+import pytest
+import tornado.web
+from tornado import gen
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.client import JSONRPCClient, RemoteError, RetryBudget, TransportError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_retry_budget():
+    clock = Clock()
+    budget = RetryBudget(ratio=0.5, min_per_second=0.1, capacity=2, clock=clock)
+
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    clock.now = 10
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def app(calls):
+    def make_dispatcher(delay):
+        dispatcher = Dispatcher()
+
+        @dispatcher.method()
+        async def echo(value):
+            calls.append((delay, value))
+            await gen.sleep(delay)
+            return value
+
+        return dispatcher
+
+    return tornado.web.Application([
+        (r"/fast", JSONRPCHandler, {"response_creator": make_dispatcher(0)}),
+        (r"/slow", JSONRPCHandler, {"response_creator": make_dispatcher(0.5)}),
+    ])
+
+
+@pytest.fixture
+def unreachable():
+    # Nothing is listening on port 1.
+    return 'http://127.0.0.1:1/jsonrpc'
+
+
+@pytest.mark.gen_test
+async def test_call(http_server, base_url):
+    client = JSONRPCClient(base_url + '/fast')
+
+    assert await client.call("echo", [42]) == 42
+    await client.notify("echo", [1])
+
+    with pytest.raises(RemoteError) as error:
+        await client.call("unknown")
+    assert error.value.error_code == -32601
+
+
+@pytest.mark.gen_test
+async def test_hedging_to_faster_endpoint(http_server, base_url, calls):
+    client = JSONRPCClient([base_url + '/slow', base_url + '/fast'])
+    client.latencies.extend([0.01] * 20)
+
+    started = time.monotonic()
+    assert await client.call("echo", ["hedged"], idempotent=True) == "hedged"
+
+    assert time.monotonic() - started < 0.4
+    assert calls == [(0.5, "hedged"), (0, "hedged")]
+    assert client.stats()["hedges"] == 1
+    assert client.stats()["hedge_wins"] == 1
+    assert len(client.latencies) == 21
+
+    # The slow request is not aborted and its latency is recorded as well.
+    await gen.sleep(0.6)
+    assert len(client.latencies) == 22
+    assert max(client.latencies) >= 0.5
+
+
+@pytest.mark.gen_test
+async def test_no_hedging_for_non_idempotent_calls(http_server, base_url, calls):
+    client = JSONRPCClient([base_url + '/fast', base_url + '/slow'])
+    client.latencies.extend([0.001] * 20)
+
+    await client.call("echo", [1])
+    assert client.stats()["hedges"] == 0
+
+
+@pytest.mark.gen_test
+async def test_hedging_needs_budget(http_server, base_url):
+    budget = RetryBudget(capacity=0)
+    client = JSONRPCClient([base_url + '/fast', base_url + '/fast'], budget=budget)
+    client.latencies.extend([0.0] * 20)
+
+    await client.call("echo", [1], idempotent=True)
+    assert client.stats()["hedges"] == 0
+    assert client.stats()["budget_exhausted"] == 1
+
+
+@pytest.mark.gen_test
+async def test_retry_on_other_endpoint(http_server, base_url, unreachable):
+    client = JSONRPCClient([unreachable, base_url + '/fast'])
+
+    assert await client.call("echo", [1], idempotent=True) == 1
+    assert client.stats()["retries"] == 1
+
+    # Only idempotent calls are retried. The next endpoint is the unreachable one.
+    with pytest.raises(TransportError):
+        await client.call("echo", [1])
+
+
+@pytest.mark.gen_test
+async def test_retries_limited_by_budget(unreachable):
+    client = JSONRPCClient([unreachable, unreachable],
+                           budget=RetryBudget(capacity=1, min_per_second=0))
+
+    with pytest.raises(TransportError):
+        await client.call("echo", [1], idempotent=True)
+
+    assert client.stats()["retries"] == 1
+    assert client.stats()["budget_exhausted"] == 1
+
+
+def test_hedge_delay_percentile():
+    client = JSONRPCClient('http://localhost/jsonrpc', hedge_percentile=90,
+                           hedge_min_samples=10, min_hedge_delay=0.005)
+    assert client.hedge_delay() is None
+
+    for value in range(1, 11):
+        client.record_latency(value / 1000)
+
+    assert client.hedge_delay() == 0.009
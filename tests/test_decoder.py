@@ -0,0 +1,52 @@
+"""
+Tests for decoding requests.
+"""
+
+import pytest
+from tornado.escape import json_encode
+
+from tornado_jsonrpc2.exceptions import InvalidRequest
+from tornado_jsonrpc2.jsonrpc import (
+    decode, get_decoder, JSONRPC1Request, JSONRPC2Request, JSONRPCRequest)
+
+
+@pytest.mark.parametrize("version, request_class", [
+    ["1.0", JSONRPC1Request],
+    ["2.0", JSONRPC2Request],
+])
+def test_pinned_decoder_creates_request_for_version(version, request_class):
+    body = json_encode([{"jsonrpc": version, "method": "foo", "params": [], "id": 1}])
+    request, = get_decoder(version)(body)
+
+    assert type(request) is request_class
+    assert request.version == version
+
+
+@pytest.mark.parametrize("version, other_version", [
+    ["1.0", "2.0"],
+    ["2.0", "1.0"],
+    ["2.0", "3000"],
+])
+def test_pinned_decoder_refuses_other_versions(version, other_version):
+    body = json_encode({"jsonrpc": other_version, "method": "foo", "id": 1})
+
+    with pytest.raises(InvalidRequest) as error:
+        get_decoder(version)(body)
+
+    assert error.value.args[0] == "Refusing to handle version {}".format(other_version)
+
+
+def test_pinned_decoders_are_reused():
+    assert get_decoder("2.0") is get_decoder("2.0")
+
+
+def test_unpinned_decoder_handles_all_versions():
+    body = json_encode([
+        {"jsonrpc": "2.0", "method": "foo", "id": 1},
+        {"method": "foo", "params": [], "id": 2},
+        {"jsonrpc": "3000", "method": "foo", "id": 3},
+    ])
+    requests = decode(body)
+
+    assert [type(request) for request in requests] == [
+        JSONRPC2Request, JSONRPC1Request, JSONRPCRequest]
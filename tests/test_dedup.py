@@ -0,0 +1,101 @@
+"""
+Tests for deduplicating calls in batch requests.
+"""
+
+import pytest
+import functools
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.dedup import Deduplicator
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def deduplicator():
+    return Deduplicator()
+
+
+@pytest.fixture
+def app(calls, deduplicator):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method(pure=True)
+    def square(value):
+        calls.append(("square", value))
+        return value * value
+
+    @dispatcher.method()
+    def increment(value):
+        calls.append(("increment", value))
+        return value + 1
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "deduplicator": deduplicator}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_identical_pure_calls_are_computed_once(jsonrpc_fetch, calls, deduplicator):
+    request = [
+        {"jsonrpc": "2.0", "method": "square", "params": [3], "id": 1},
+        {"jsonrpc": "2.0", "method": "square", "params": [4], "id": 2},
+        {"jsonrpc": "2.0", "method": "square", "params": [3], "id": 3},
+        {"jsonrpc": "2.0", "method": "square", "params": [3]},
+        {"jsonrpc": "2.0", "method": "increment", "params": [3], "id": 4},
+        {"jsonrpc": "2.0", "method": "increment", "params": [3], "id": 5},
+    ]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response == [
+        {"jsonrpc": "2.0", "id": 1, "result": 9},
+        {"jsonrpc": "2.0", "id": 2, "result": 16},
+        {"jsonrpc": "2.0", "id": 3, "result": 9},
+        {"jsonrpc": "2.0", "id": 4, "result": 4},
+        {"jsonrpc": "2.0", "id": 5, "result": 4},
+    ]
+    assert calls == [("square", 3), ("square", 4), ("increment", 3), ("increment", 3)]
+    assert deduplicator.stats() == {"calls": 4, "executed": 2, "ratio": 0.5}
+
+
+@pytest.mark.gen_test
+async def test_notification_does_not_provide_response(jsonrpc_fetch, calls):
+    request = [
+        {"jsonrpc": "2.0", "method": "square", "params": [3]},
+        {"jsonrpc": "2.0", "method": "square", "params": [3], "id": 1},
+    ]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response == [{"jsonrpc": "2.0", "id": 1, "result": 9}]
+    assert calls == [("square", 3), ("square", 3)]
+
+
+@pytest.mark.gen_test
+async def test_versions_are_not_mixed(jsonrpc_fetch, calls):
+    request = [
+        {"jsonrpc": "2.0", "method": "square", "params": [3], "id": 1},
+        {"method": "square", "params": [3], "id": 2},
+    ]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response == [{"jsonrpc": "2.0", "id": 1, "result": 9},
+                        {"id": 2, "result": 9, "error": None}]
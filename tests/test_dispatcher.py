@@ -0,0 +1,119 @@
+"""
+Tests for dispatching requests to registered methods.
+"""
+
+import pytest
+import functools
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.exceptions import InvalidParams
+from tornado_jsonrpc2.schema import compile_params_schema
+
+
+@pytest.fixture
+def app():
+    dispatcher = Dispatcher()
+
+    @dispatcher.method(params={
+        "type": "object",
+        "properties": {"minuend": {"type": "integer"},
+                       "subtrahend": {"type": "integer", "minimum": 0}},
+        "required": ["minuend", "subtrahend"],
+        "additionalProperties": False})
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    @dispatcher.method(name="tags.join", params={
+        "type": "array", "items": {"type": "string", "maxLength": 3}})
+    async def join(*tags):
+        return ",".join(tags)
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher}),
+    ])
+
+
+@pytest.fixture
+def test_url(base_url):
+    return base_url + '/jsonrpc'
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, test_url):
+    return functools.partial(
+        http_client.fetch,
+        test_url,
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.parametrize("params", [
+    [42, 23],
+    {"subtrahend": 23, "minuend": 42},
+])
+@pytest.mark.gen_test
+async def test_calling_method(jsonrpc_fetch, params):
+    request = {"jsonrpc": "2.0", "method": "subtract", "params": params, "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": 19}
+
+
+@pytest.mark.gen_test
+async def test_calling_coroutine_method(jsonrpc_fetch):
+    request = {"jsonrpc": "2.0", "method": "tags.join", "params": ["a", "b"], "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": "a,b"}
+
+
+@pytest.mark.parametrize("method, params, message", [
+    ["subtract", [42, "23"], "params[1]: expected integer, got string"],
+    ["subtract", [42, -1], "params[1]: -1 is less than 0"],
+    ["subtract", [42], "params: missing value for 'subtrahend'"],
+    ["subtract", [1, 2, 3], "params: expected at most 2 values, got 3"],
+    ["subtract", {"minuend": 1}, "params: missing value for 'subtrahend'"],
+    ["subtract", {"minuend": 1, "subtrahend": 1, "x": 1}, "params: unexpected value for 'x'"],
+    ["tags.join", ["a", "long"], "params[1]: length 4 is greater than 3"],
+])
+@pytest.mark.gen_test
+async def test_invalid_params(jsonrpc_fetch, method, params, message):
+    request = {"jsonrpc": "2.0", "method": method, "params": params, "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    expected_error = {"code": -32602, "message": "Invalid params: " + message}
+    assert response == {"jsonrpc": "2.0", "id": 1, "error": expected_error}
+
+
+@pytest.mark.gen_test
+async def test_unknown_method(jsonrpc_fetch):
+    request = {"jsonrpc": "2.0", "method": "foobar", "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response['error']['code'] == -32601
+
+
+def test_schema_with_unsupported_keywords():
+    with pytest.raises(ValueError):
+        compile_params_schema({"type": "object", "oneOf": []})
+
+
+@pytest.mark.parametrize("schema, params", [
+    [{"type": ["integer", "null"]}, 1.5],
+    [{"enum": [1, 2]}, 3],
+    [{"type": "string", "pattern": "^a"}, "ba"],
+    [{"type": "array", "minItems": 2}, [1]],
+    [{"type": "object", "properties": {"a": {"exclusiveMaximum": 1}}}, {"a": 1}],
+])
+def test_schema_rejecting_params(schema, params):
+    with pytest.raises(InvalidParams):
+        compile_params_schema(schema)(params)
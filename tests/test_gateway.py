@@ -0,0 +1,222 @@
+"""
+Tests for forwarding requests to upstreams.
+"""
+
+import pytest
+import functools
+import tornado.web
+from tornado.escape import json_encode, json_decode
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.gateway import (
+    HashRing, JSONRPCGatewayHandler, RoutingTable, ShardedUpstream)
+
+
+class RecordingHandler(JSONRPCHandler):
+    streams = set()
+    bodies = []
+
+    async def post(self):
+        self.streams.add(self.request.connection.stream)
+        self.bodies.append(self.request.body)
+        await super().post()
+
+
+class DroppingHandler(JSONRPCHandler):
+    bodies = []
+
+    async def post(self):
+        self.bodies.append(self.request.body)
+        if len(self.bodies) > 1:
+            # Executed, but the connection is lost before answering.
+            self.request.connection.stream.close()
+            return
+
+        await super().post()
+
+
+class ScalarHandler(tornado.web.RequestHandler):
+    def post(self):
+        self.write("42")
+
+
+def start_upstream(dispatcher):
+    socket, port = bind_unused_port()
+    server = HTTPServer(tornado.web.Application([
+        (r"/jsonrpc", RecordingHandler, {"response_creator": dispatcher}),
+        (r"/broken", tornado.web.RequestHandler),
+        (r"/scalar", ScalarHandler),
+        (r"/dropping", DroppingHandler, {"response_creator": dispatcher}),
+    ]))
+    server.add_sockets([socket])
+    return server, 'http://127.0.0.1:{}'.format(port)
+
+
+@pytest.fixture
+def upstreams(io_loop):
+    RecordingHandler.streams = set()
+    RecordingHandler.bodies = []
+    DroppingHandler.bodies = []
+
+    math = Dispatcher()
+    math.add_method(lambda minuend, subtrahend: minuend - subtrahend, name="math.subtract")
+    math.add_method(lambda *values: sum(values), name="math.sum")
+    math.add_method(lambda user_id: {"user": user_id, "shard": 0}, name="users.get")
+
+    text = Dispatcher()
+    text.add_method(lambda *words: " ".join(words), name="text.join")
+    text.add_method(lambda user_id: {"user": user_id, "shard": 1}, name="users.get")
+
+    servers = [start_upstream(math), start_upstream(text)]
+    yield [url for _, url in servers]
+
+    for server, _ in servers:
+        server.stop()
+
+
+@pytest.fixture
+def routing(upstreams):
+    math_url, text_url = upstreams
+    routing = RoutingTable({"math.": math_url + "/jsonrpc",
+                            "text.": text_url + "/jsonrpc",
+                            "broken.": math_url + "/broken",
+                            "scalar.": math_url + "/scalar",
+                            "dropping.": math_url + "/dropping",
+                            "users.": ShardedUpstream([math_url + "/jsonrpc",
+                                                       text_url + "/jsonrpc"],
+                                                      key="user_id", position=0)})
+    yield routing
+
+    for pool in routing.pools:
+        pool.close()
+
+
+@pytest.fixture
+def app(routing):
+    return tornado.web.Application([
+        (r"/gateway", JSONRPCGatewayHandler, {"routing": routing}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/gateway',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_forwarding_single_request(jsonrpc_fetch):
+    body = '{"jsonrpc": "2.0", "method": "math.subtract", "params": {"minuend": 42, "subtrahend": 23}, "id": 1}'
+    response = await jsonrpc_fetch(body=body)
+    assert 200 == response.code
+
+    assert json_decode(response.body) == {"jsonrpc": "2.0", "id": 1, "result": 19}
+    assert RecordingHandler.bodies == [body.encode()]
+
+
+@pytest.mark.gen_test
+async def test_connections_are_reused(jsonrpc_fetch):
+    for number in range(5):
+        request = {"jsonrpc": "2.0", "method": "math.sum", "params": [number, 1], "id": number}
+        response = await jsonrpc_fetch(body=json_encode(request))
+        assert json_decode(response.body)['result'] == number + 1
+
+    assert len(RecordingHandler.streams) == 1
+
+
+@pytest.mark.gen_test
+async def test_forwarding_batch(jsonrpc_fetch):
+    request = [
+        {"jsonrpc": "2.0", "method": "text.join", "params": ["a", "b"], "id": "1"},
+        {"jsonrpc": "2.0", "method": "math.sum", "params": [1, 2, 4], "id": "2"},
+        {"jsonrpc": "2.0", "method": "unknown", "id": "3"},
+        {"jsonrpc": "2.0", "method": "math.sum", "params": [1]},
+        {"jsonrpc": "2.0", "method": "math.subtract", "params": [42, 23], "id": "4"},
+        {"jsonrpc": "2.0", "method": "broken.call", "id": "5"},
+    ]
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    assert [item['id'] for item in response] == ["1", "2", "3", "4", "5"]
+    assert response[0]['result'] == "a b"
+    assert response[1]['result'] == 7
+    assert response[2]['error']['code'] == -32601
+    assert response[3]['result'] == 19
+    assert response[4]['error'] == {"code": -32000,
+                                    "message": "Server error: Upstream answered with status 405"}
+
+
+@pytest.mark.gen_test
+async def test_invalid_upstream_response(jsonrpc_fetch):
+    request = [{"jsonrpc": "2.0", "method": "scalar.call", "id": 1},
+               {"jsonrpc": "2.0", "method": "math.sum", "params": [1, 2], "id": 2}]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response[0]['error'] == {"code": -32000,
+                                    "message": "Server error: Invalid response from upstream"}
+    assert response[1]['result'] == 3
+
+
+@pytest.mark.gen_test
+async def test_unavailable_upstream(jsonrpc_fetch, routing):
+    routing.routes.insert(0, ("gone.", type(routing.pools[0])("http://127.0.0.1:1/")))
+    request = {"jsonrpc": "2.0", "method": "gone.away", "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response['error'] == {"code": -32000, "message": "Server error: Upstream unavailable"}
+
+
+@pytest.mark.gen_test
+async def test_lost_response_is_not_resent(jsonrpc_fetch, routing):
+    request = {"jsonrpc": "2.0", "method": "dropping.call", "id": 1}
+    await jsonrpc_fetch(body=json_encode(request))
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    response = json_decode(response.body)
+    assert response['error'] == {"code": -32000, "message": "Server error: Upstream unavailable"}
+    assert len(DroppingHandler.bodies) == 2
+
+
+@pytest.mark.gen_test
+async def test_sharding_batch(jsonrpc_fetch, routing):
+    sharded = routing.lookup("users.")
+    users = ["user{}".format(number) for number in range(20)]
+    request = [{"jsonrpc": "2.0", "method": "users.get", "params": {"user_id": user}, "id": index}
+               for index, user in enumerate(users)]
+    request.append({"jsonrpc": "2.0", "method": "users.get", "params": ["user3"], "id": "last"})
+    request.append({"jsonrpc": "2.0", "method": "users.get", "params": {}, "id": "nokey"})
+
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    assert [item['id'] for item in response] == list(range(20)) + ["last", "nokey"]
+    for user, item in zip(users, response):
+        expected_shard = sharded.pools.index(sharded.ring.get(json_encode(user)))
+        assert item['result'] == {"user": user, "shard": expected_shard}
+
+    assert response[20]['result'] == response[3]['result']
+    assert response[21]['error']['code'] == -32602
+
+    # Both shards got one sub-batch each.
+    assert {item['result']['shard'] for item in response[:20]} == {0, 1}
+    assert len(RecordingHandler.bodies) == 2
+
+
+def test_consistent_hashing_moves_few_keys():
+    keys = ["key{}".format(number) for number in range(1000)]
+    before = HashRing({name: name for name in "abcd"})
+    after = HashRing({name: name for name in "abcde"})
+
+    moved = [key for key in keys if before.get(key) != after.get(key)]
+    assert all(after.get(key) == "e" for key in moved)
+    assert len(moved) < 400
@@ -0,0 +1,98 @@
+"""
+Tests for calling idempotent methods through HTTP GET.
+"""
+
+import pytest
+import tornado.web
+from tornado.escape import json_decode, url_escape
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+
+
+@pytest.fixture
+def app():
+    dispatcher = Dispatcher()
+
+    @dispatcher.method(idempotent=True, cache_control="max-age=60")
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    @dispatcher.method()
+    def delete():
+        raise RuntimeError("We should have never gotten here.")
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "allow_get": True}),
+        (r"/noget", JSONRPCHandler, {"response_creator": dispatcher}),
+    ])
+
+
+def query_url(base_url, path='/jsonrpc', **arguments):
+    return base_url + path + '?' + '&'.join(
+        '{}={}'.format(name, url_escape(value)) for name, value in arguments.items())
+
+
+@pytest.mark.gen_test
+async def test_calling_idempotent_method(http_client, base_url):
+    url = query_url(base_url, jsonrpc='2.0', method='subtract', params='[42, 23]', id='1')
+    response = await http_client.fetch(url)
+    assert 200 == response.code
+    assert response.headers['Cache-Control'] == 'max-age=60'
+    assert response.headers['Etag']
+
+    assert json_decode(response.body) == {"jsonrpc": "2.0", "id": 1, "result": 19}
+
+
+@pytest.mark.gen_test
+async def test_etag_depends_on_result_only(http_client, base_url):
+    first = await http_client.fetch(query_url(
+        base_url, jsonrpc='2.0', method='subtract', params='[42, 23]', id='1'))
+    second = await http_client.fetch(query_url(
+        base_url, jsonrpc='2.0', method='subtract', params='{"minuend": 42, "subtrahend": 23}', id='"a"'))
+    third = await http_client.fetch(query_url(
+        base_url, jsonrpc='2.0', method='subtract', params='[42, 22]', id='1'))
+
+    assert first.headers['Etag'] == second.headers['Etag']
+    assert first.headers['Etag'] != third.headers['Etag']
+
+
+@pytest.mark.gen_test
+async def test_conditional_request(http_client, base_url):
+    url = query_url(base_url, jsonrpc='2.0', method='subtract', params='[42, 23]', id='1')
+    response = await http_client.fetch(url)
+
+    response = await http_client.fetch(url, raise_error=False,
+                                       headers={'If-None-Match': response.headers['Etag']})
+    assert 304 == response.code
+    assert not response.body
+
+
+@pytest.mark.gen_test
+async def test_calling_method_not_marked_idempotent(http_client, base_url):
+    url = query_url(base_url, jsonrpc='2.0', method='delete', id='1')
+    response = await http_client.fetch(url, raise_error=False)
+    assert 405 == response.code
+    assert 'Cache-Control' not in response.headers
+
+    response = json_decode(response.body)
+    assert response['error'] == {
+        'code': -32600,
+        'message': "Invalid Request: Method 'delete' can not be called through GET"}
+
+
+@pytest.mark.gen_test
+async def test_calling_with_invalid_params(http_client, base_url):
+    url = query_url(base_url, jsonrpc='2.0', method='subtract', params='[42,', id='1')
+    response = await http_client.fetch(url, raise_error=False)
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    assert response['error']['code'] == -32700
+
+
+@pytest.mark.gen_test
+async def test_get_has_to_be_enabled(http_client, base_url):
+    url = query_url(base_url, '/noget', jsonrpc='2.0', method='subtract', params='[42, 23]', id='1')
+    response = await http_client.fetch(url, raise_error=False)
+    assert 405 == response.code
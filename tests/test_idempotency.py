@@ -0,0 +1,239 @@
+"""
+Tests for replaying responses of retried calls.
+"""
+
+import asyncio
+import functools
+
+import pytest
+import tornado.web
+from tornado import gen
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.exceptions import InvalidRequest, ServerError
+from tornado_jsonrpc2.idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def charges():
+    return []
+
+
+@pytest.fixture
+def store():
+    return IdempotencyStore()
+
+
+@pytest.fixture
+def app(charges, store):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    async def charge(amount):
+        charges.append(amount)
+        await gen.sleep(0.01)
+        return len(charges)
+
+    @dispatcher.method()
+    async def flaky(amount):
+        charges.append(amount)
+        if len(charges) == 1:
+            raise ValueError("database timeout")
+        return len(charges)
+
+    class ClientHandler(JSONRPCHandler):
+        def get_client_id(self):
+            return self.request.headers.get("X-Client")
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "idempotency": store}),
+        (r"/clients", ClientHandler, {"response_creator": dispatcher,
+                                      "idempotency": store}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+    )
+
+
+def charge(amount, id, key=None):
+    call = {"jsonrpc": "2.0", "method": "charge", "params": [amount], "id": id}
+    if key is not None:
+        call["idempotency_key"] = key
+    return call
+
+
+@pytest.mark.gen_test
+async def test_call_key_replays_response(jsonrpc_fetch, charges, store):
+    first = await jsonrpc_fetch(body=json_encode(charge(10, 1, key="abc")))
+    second = await jsonrpc_fetch(body=json_encode(charge(10, 2, key="abc")))
+
+    assert json_decode(first.body) == {"jsonrpc": "2.0", "id": 1, "result": 1}
+    assert json_decode(second.body) == {"jsonrpc": "2.0", "id": 2, "result": 1}
+    assert charges == [10]
+    assert store.stats()["replayed"] == 1
+
+
+@pytest.mark.gen_test
+async def test_concurrent_duplicate_waits(jsonrpc_fetch, charges, store):
+    responses = await asyncio.gather(*(
+        jsonrpc_fetch(body=json_encode(charge(10, id, key="abc"))) for id in (1, 2)))
+
+    assert [json_decode(response.body)["result"] for response in responses] == [1, 1]
+    assert charges == [10]
+    assert store.stats()["waited"] == 1
+
+
+@pytest.mark.gen_test
+async def test_calls_without_key_run_again(jsonrpc_fetch, charges):
+    await jsonrpc_fetch(body=json_encode(charge(10, 1)))
+    await jsonrpc_fetch(body=json_encode(charge(10, 1)))
+
+    assert charges == [10, 10]
+
+
+@pytest.mark.gen_test
+async def test_key_reused_for_other_params(jsonrpc_fetch, charges):
+    await jsonrpc_fetch(body=json_encode(charge(10, 1, key="abc")))
+    response = await jsonrpc_fetch(body=json_encode(charge(20, 2, key="abc")))
+
+    assert json_decode(response.body)["error"]["code"] == -32600
+    assert charges == [10]
+
+
+@pytest.mark.gen_test
+async def test_invalid_key(jsonrpc_fetch, charges):
+    response = await jsonrpc_fetch(body=json_encode(charge(10, 1, key=5)))
+
+    assert json_decode(response.body)["error"]["code"] == -32600
+    assert charges == []
+
+
+@pytest.mark.gen_test
+async def test_header_replays_request(jsonrpc_fetch, charges, store):
+    batch = json_encode([charge(10, 1), charge(20, 2)])
+    headers = {"Idempotency-Key": "batch-1"}
+    first = await jsonrpc_fetch(body=batch, headers=headers)
+    second = await jsonrpc_fetch(body=batch, headers=headers)
+
+    assert first.body == second.body
+    assert charges == [10, 20]
+
+    response = await jsonrpc_fetch(body=json_encode([charge(30, 3)]), headers=headers)
+    assert json_decode(response.body)["error"]["code"] == -32600
+
+
+@pytest.mark.gen_test
+async def test_errors_are_not_stored(jsonrpc_fetch, charges, store):
+    call = dict(charge(10, 1, key="abc"), method="flaky")
+    first = await jsonrpc_fetch(body=json_encode(call))
+    second = await jsonrpc_fetch(body=json_encode(dict(call, id=2)))
+    third = await jsonrpc_fetch(body=json_encode(dict(call, id=3)))
+
+    assert json_decode(first.body)["error"]["code"] == -32603
+    assert json_decode(second.body) == {"jsonrpc": "2.0", "id": 2, "result": 2}
+    assert json_decode(third.body) == {"jsonrpc": "2.0", "id": 3, "result": 2}
+    assert charges == [10, 10]
+
+
+@pytest.mark.gen_test
+async def test_request_errors_are_not_stored(jsonrpc_fetch, charges):
+    batch = json_encode([dict(charge(10, 1), method="flaky"), charge(20, 2)])
+    headers = {"Idempotency-Key": "batch-1"}
+    first = await jsonrpc_fetch(body=batch, headers=headers)
+    second = await jsonrpc_fetch(body=batch, headers=headers)
+
+    assert json_decode(first.body)[0]["error"]["code"] == -32603
+    assert [message["result"] for message in json_decode(second.body)] == [3, 4]
+    assert charges == [10, 20, 10, 20]
+
+
+@pytest.mark.gen_test
+async def test_keys_are_scoped_to_clients(http_client, base_url, charges):
+    async def fetch(client, body, headers={}):
+        response = await http_client.fetch(
+            base_url + '/clients', method="POST", body=json_encode(body),
+            headers=dict(headers, **{"X-Client": client}))
+        return json_decode(response.body)
+
+    assert (await fetch("a", charge(10, 1, key="k")))["result"] == 1
+    assert (await fetch("b", charge(10, 1, key="k")))["result"] == 2
+    assert (await fetch("a", charge(10, 1, key="k")))["result"] == 1
+
+    headers = {"Idempotency-Key": "r"}
+    await fetch("a", charge(20, 2), headers)
+    await fetch("b", charge(20, 2), headers)
+    assert charges == [10, 10, 20, 20]
+
+
+@pytest.mark.gen_test
+async def test_expiry_and_eviction():
+    store = IdempotencyStore(max_entries=2, ttl=0.01)
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        return "response"
+
+    for key in ("a", "b", "c"):
+        await store.execute(key, None, compute)
+    assert list(store.entries) == ["b", "c"]
+
+    await gen.sleep(0.02)
+    await store.execute("c", None, compute)
+    assert len(runs) == 4
+
+
+@pytest.mark.gen_test
+async def test_failure_releases_key():
+    store = IdempotencyStore()
+
+    async def fail():
+        raise ValueError("broken")
+
+    with pytest.raises(ValueError):
+        await store.execute("a", None, fail)
+
+    assert "a" not in store.entries
+
+
+@pytest.mark.gen_test
+async def test_conflicting_fingerprint():
+    store = IdempotencyStore()
+
+    async def compute():
+        return "response"
+
+    await store.execute("a", 1, compute)
+    with pytest.raises(InvalidRequest):
+        await store.execute("a", 2, compute)
+
+    assert store.stats()["conflicts"] == 1
+
+
+@pytest.mark.gen_test
+async def test_cancellation_fails_waiting_calls():
+    store = IdempotencyStore()
+    started = asyncio.Event()
+
+    async def compute():
+        started.set()
+        await asyncio.Event().wait()
+
+    first = asyncio.ensure_future(store.execute("a", None, compute))
+    await started.wait()
+    second = asyncio.ensure_future(store.execute("a", None, compute))
+    await gen.sleep(0)
+
+    first.cancel()
+    with pytest.raises(ServerError):
+        await second
+
+    assert "a" not in store.entries
@@ -0,0 +1,145 @@
+"""
+Tests for listing and cancelling calls in flight.
+"""
+
+import asyncio
+
+import pytest
+import tornado.web
+from tornado import gen
+from tornado.escape import json_encode, json_decode
+from tornado.httpclient import HTTPError
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.inflight import InFlightAdminHandler, InFlightRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def registry(clock):
+    return InFlightRegistry(clock=clock)
+
+
+@pytest.fixture
+def release():
+    return asyncio.Event()
+
+
+@pytest.fixture
+def app(registry, release):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    async def wait(value):
+        await release.wait()
+        return value
+
+    @dispatcher.method()
+    def echo(value):
+        return value
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "inflight": registry,
+                                       "batch_concurrency": 10}),
+        (r"/admin/calls(?:/(\d+))?", InFlightAdminHandler, {"registry": registry}),
+    ])
+
+
+@pytest.fixture
+def admin_fetch(http_client, base_url):
+    async def fetch(path='', method='GET'):
+        response = await http_client.fetch(base_url + '/admin/calls' + path,
+                                           method=method)
+        return json_decode(response.body)
+
+    return fetch
+
+
+def start_batch(http_client, base_url, *calls):
+    return asyncio.ensure_future(http_client.fetch(
+        base_url + '/jsonrpc', method="POST", body=json_encode([
+            {"jsonrpc": "2.0", "method": method, "params": [value], "id": index}
+            for index, (method, value) in enumerate(calls)])))
+
+
+async def wait_for_calls(registry, count):
+    while len(registry.calls) < count:
+        await gen.sleep(0.001)
+
+
+@pytest.mark.gen_test
+async def test_lists_calls_oldest_first(http_client, base_url, admin_fetch,
+                                        registry, clock, release):
+    first = start_batch(http_client, base_url, ("wait", 1))
+    await wait_for_calls(registry, 1)
+    clock.now = 5
+    second = start_batch(http_client, base_url, ("wait", 2), ("wait", 3))
+    await wait_for_calls(registry, 3)
+    clock.now = 7
+
+    listing = await admin_fetch()
+    assert [(call["request_id"], call["batch_index"], call["age"])
+            for call in listing["calls"]] == [(0, 0, 7), (0, 0, 2), (1, 1, 2)]
+    assert listing["calls"][0]["client"] == "127.0.0.1"
+    assert listing["methods"] == {"wait": {"count": 3, "oldest": 7}}
+
+    listing = await admin_fetch('?min_age=5')
+    assert len(listing["calls"]) == 1
+    call = await admin_fetch('/{}'.format(listing["calls"][0]["id"]))
+    assert call["age"] == 7
+
+    release.set()
+    await gen.multi([first, second])
+    assert registry.calls == {}
+    assert registry.stats() == {"in_flight": 0, "registered": 3, "cancelled": 0}
+
+
+@pytest.mark.gen_test
+async def test_cancelling_a_call(http_client, base_url, admin_fetch, registry, release):
+    batch = start_batch(http_client, base_url, ("wait", 1), ("wait", 2), ("echo", 3))
+    await wait_for_calls(registry, 2)
+
+    call = (await admin_fetch())["calls"][1]
+    assert (await admin_fetch('/{}'.format(call["id"]), method='DELETE')) == {
+        "cancelled": [call["id"]]}
+
+    release.set()
+    responses = json_decode((await batch).body)
+    assert responses[0] == {"jsonrpc": "2.0", "id": 0, "result": 1}
+    assert responses[1]["error"]["code"] == -32000
+    assert responses[2]["result"] == 3
+    assert registry.stats()["cancelled"] == 1
+
+
+@pytest.mark.gen_test
+async def test_cancelling_by_method(http_client, base_url, admin_fetch, registry):
+    request = asyncio.ensure_future(http_client.fetch(
+        base_url + '/jsonrpc', method="POST", body=json_encode(
+            {"jsonrpc": "2.0", "method": "wait", "params": [1], "id": 1})))
+    await wait_for_calls(registry, 1)
+
+    with pytest.raises(HTTPError) as error:
+        await admin_fetch(method='DELETE')
+    assert error.value.code == 400
+
+    assert len((await admin_fetch('?method=wait', method='DELETE'))["cancelled"]) == 1
+    response = json_decode((await request).body)
+    assert response["error"] == {"code": -32000,
+                                 "message": "Server error: Call was cancelled"}
+
+    with pytest.raises(HTTPError) as error:
+        await admin_fetch('/12345', method='DELETE')
+    assert error.value.code == 404
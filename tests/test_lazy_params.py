@@ -0,0 +1,130 @@
+"""
+Tests for keeping params encoded until they are accessed.
+"""
+
+import json
+import pytest
+import functools
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2.handler import JSONRPCHandler
+from tornado_jsonrpc2.exceptions import InvalidParams, ParseError
+from tornado_jsonrpc2.jsonrpc import decode
+from tornado_jsonrpc2.lazyjson import RawParams, loads
+
+
+@pytest.fixture
+def app():
+    async def forward(request):
+        if request.method == "raw":
+            return request.raw_params
+
+        return request.params
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": forward,
+                                       "lazy_params": True,
+                                       "max_params_depth": 2}),
+    ])
+
+
+@pytest.fixture
+def test_url(base_url):
+    return base_url + '/jsonrpc'
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, test_url):
+    return functools.partial(
+        http_client.fetch,
+        test_url,
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.parametrize("document", [
+    '{"jsonrpc": "2.0", "method": "a", "params": [1, "]", {"b": "\\"}"}], "id": 1}',
+    '[{"method": "a", "params": {"x": [[]]}, "id": null}, 1, "x", {}]',
+    '{"params": "scalar", "method": "a"}',
+    ' [ ] ',
+])
+def test_loads_matches_json(document):
+    def resolve(value):
+        if isinstance(value, RawParams):
+            return json.loads(value.raw)
+        elif isinstance(value, dict):
+            return {key: resolve(item) for key, item in value.items()}
+        elif isinstance(value, list):
+            return [resolve(item) for item in value]
+        return value
+
+    assert resolve(loads(document)) == json.loads(document)
+
+
+@pytest.mark.parametrize("document", [
+    '{"method": "a", "params": [1, 2}',
+    '{"method": "a", "params": ["]',
+    '{"method": "a" "params": []}',
+    '[{"method": "a"},]',
+    '{"method": "a"} x',
+])
+def test_loads_rejects_invalid_documents(document):
+    with pytest.raises(json.JSONDecodeError):
+        loads(document)
+
+
+def test_params_are_decoded_when_accessed():
+    request = decode('{"jsonrpc": "2.0", "method": "a", "params": [1, {"b": 2}], "id": 1}',
+                     lazy_params=True)
+    assert request.raw_params == '[1, {"b": 2}]'
+    request.validate()
+
+    assert request.params == [1, {"b": 2}]
+    assert request.raw_params == '[1, {"b": 2}]'
+
+
+def test_invalid_params_are_detected_when_accessed():
+    request = decode('{"jsonrpc": "2.0", "method": "a", "params": [1 2], "id": 1}',
+                     lazy_params=True)
+
+    with pytest.raises(InvalidParams):
+        request.params
+
+
+def test_broken_structure_is_a_parse_error():
+    with pytest.raises(ParseError):
+        decode('{"jsonrpc": "2.0", "method": "a", "params": [1, 2', lazy_params=True)
+
+
+@pytest.mark.gen_test
+async def test_forwarding_raw_params(jsonrpc_fetch):
+    body = '{"jsonrpc": "2.0", "method": "raw", "params": {"b" :  [1,2]}, "id": 1}'
+    response = await jsonrpc_fetch(body=body)
+
+    response = json_decode(response.body)
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": '{"b" :  [1,2]}'}
+
+
+@pytest.mark.gen_test
+async def test_accessing_params(jsonrpc_fetch):
+    request = [{"jsonrpc": "2.0", "method": "params", "params": {"b": [1, 2]}, "id": 1},
+               {"jsonrpc": "2.0", "method": "params", "params": "nope", "id": 2}]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    first, second = json_decode(response.body)
+    assert first == {"jsonrpc": "2.0", "id": 1, "result": {"b": [1, 2]}}
+    assert second['error']['code'] == -32600
+
+
+@pytest.mark.gen_test
+async def test_limits_are_checked_when_accessed(jsonrpc_fetch):
+    request = [{"jsonrpc": "2.0", "method": "raw", "params": [[[1]]], "id": 1},
+               {"jsonrpc": "2.0", "method": "params", "params": [[[1]]], "id": 2}]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    first, second = json_decode(response.body)
+    assert first == {"jsonrpc": "2.0", "id": 1, "result": "[[[1]]]"}
+    assert second['error'] == {"code": -32602,
+                               "message": "Invalid params: Params exceed the maximum depth of 2"}
@@ -0,0 +1,122 @@
+"""
+Tests for limiting the size of requests.
+"""
+
+import pytest
+import functools
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2.handler import (
+    BasicJSONRPCHandler, JSONRPCHandler, StreamingJSONRPCHandler)
+
+
+@pytest.fixture
+def app():
+    async def echo(request):
+        return request.params
+
+    class NonStreamingHandler(BasicJSONRPCHandler):
+        async def post(self):
+            await self.handle_jsonrpc(self.request)
+
+        async def compute_result(self, request):
+            return request.params
+
+    limits = {"max_body_size": 200,
+              "max_batch_size": 3,
+              "max_params_depth": 2,
+              "max_params_size": 10}
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, dict(response_creator=echo, **limits)),
+        (r"/streaming", StreamingJSONRPCHandler, dict(response_creator=echo, **limits)),
+        (r"/basic", NonStreamingHandler, limits),
+    ])
+
+
+@pytest.fixture(params=['/jsonrpc', '/streaming', '/basic'])
+def test_url(base_url, request):
+    return base_url + request.param
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, test_url):
+    return functools.partial(
+        http_client.fetch,
+        test_url,
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_request_within_limits(jsonrpc_fetch):
+    request = {"jsonrpc": "2.0", "method": "echo", "params": [1, [2, 3]], "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": [1, [2, 3]]}
+
+
+@pytest.mark.gen_test
+async def test_oversized_body(jsonrpc_fetch):
+    request = {"jsonrpc": "2.0", "method": "echo", "params": ["x" * 300], "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    expected_error = {'code': -32600,
+                      'message': 'Invalid Request: Request body exceeds the maximum size of 200 bytes'}
+    assert response['error'] == expected_error
+    assert response['id'] is None
+
+
+@pytest.mark.gen_test
+@pytest.mark.parametrize('path', ['/jsonrpc', '/streaming'])
+async def test_oversized_chunked_body(http_client, base_url, path):
+    request = {"jsonrpc": "2.0", "method": "echo", "params": ["x" * 300], "id": 1}
+    body = json_encode(request).encode()
+
+    async def producer(write):
+        for start in range(0, len(body), 50):
+            await write(body[start:start + 50])
+
+    response = await http_client.fetch(base_url + path,
+                                       method="POST",
+                                       headers={'Content-Type': 'application/json'},
+                                       body_producer=producer)
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    assert response['error']['code'] == -32600
+    assert 'maximum size of 200 bytes' in response['error']['message']
+
+
+@pytest.mark.gen_test
+async def test_oversized_batch(jsonrpc_fetch):
+    request = [{"jsonrpc": "2.0", "method": "echo", "id": i} for i in range(4)]
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    expected_error = {'code': -32600,
+                      'message': 'Invalid Request: Batch request exceeds the maximum size of 3 requests'}
+    assert response == {"jsonrpc": "2.0", "id": None, "error": expected_error}
+
+
+@pytest.mark.parametrize("params, message", [
+    [[[[1]]], 'Invalid Request: Params exceed the maximum depth of 2'],
+    [list(range(11)), 'Invalid Request: Params exceed the maximum size of 10 values'],
+    [{"a": list(range(5)), "b": list(range(5))}, 'Invalid Request: Params exceed the maximum size of 10 values'],
+])
+@pytest.mark.gen_test
+async def test_oversized_params(jsonrpc_fetch, params, message):
+    request = {"jsonrpc": "2.0", "method": "echo", "params": params, "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+    assert 200 == response.code
+
+    response = json_decode(response.body)
+    expected_error = {'code': -32600, 'message': message}
+    assert response == {"jsonrpc": "2.0", "id": 1, "error": expected_error}
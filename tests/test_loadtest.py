@@ -0,0 +1,130 @@
+"""
+Tests for the load generator.
+"""
+
+import json
+
+import pytest
+import tornado.web
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.loadtest import Histogram, LoadTest, PayloadMix, main, parse_args, run
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for value in range(1, 1001):
+        histogram.record(value / 1000)
+
+    assert histogram.count == 1000
+    for percent in (50, 90, 99):
+        expected = percent / 100
+        assert abs(histogram.percentile(percent) - expected) <= expected / 2 ** 6
+    assert histogram.percentile(100) == 1.0
+
+    summary = histogram.to_dict()
+    assert summary["min"] == 1.0
+    assert summary["max"] == 1000.0
+    assert set(summary["percentiles"]) == {"50", "90", "99", "99.9"}
+
+
+def test_merging_histograms():
+    first, second = Histogram(), Histogram()
+    first.record(0.001)
+    second.record(0.002)
+    first.merge(second)
+
+    assert first.count == 2
+    assert first.percentile(100) == 0.002
+    assert Histogram().to_dict() == {"count": 0}
+
+
+def test_payload_mix():
+    payloads = PayloadMix("subtract", [42, 23], batch_size=3, seed=1,
+                          weights={"batch": 1, "notification": 1},
+                          versions=("1.0", "2.0"))
+
+    kinds = set()
+    for _ in range(20):
+        body, kind, calls = payloads.next()
+        body = json.loads(body.decode('utf-8'))
+        kinds.add(kind)
+        if kind == "batch":
+            assert isinstance(body, list) and len(body) == calls == 3
+        else:
+            assert calls == 1
+            assert body.get("id") is None
+
+    assert kinds == {"batch", "notification"}
+
+    with pytest.raises(ValueError):
+        PayloadMix("subtract", weights={"stream": 1})
+
+
+def make_app():
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher}),
+    ])
+
+
+@pytest.fixture
+def app():
+    return make_app()
+
+
+@pytest.mark.gen_test
+async def test_closed_loop(http_server, base_url):
+    payloads = PayloadMix("subtract", [42, 23], weights={"single": 1, "batch": 1})
+    results = await LoadTest(base_url + '/jsonrpc', payloads).run_closed(2, 0.2)
+
+    assert results["mode"] == "closed"
+    assert results["requests"] > 0
+    assert results["calls"] >= results["requests"]
+    assert results["errors"] == results["failures"] == 0
+    assert results["latency"]["count"] == results["requests"]
+
+
+@pytest.mark.gen_test
+async def test_open_loop(http_server, base_url):
+    payloads = PayloadMix("unknown")
+    results = await LoadTest(base_url + '/jsonrpc', payloads).run_open(50, 0.2)
+
+    assert results["mode"] == "open"
+    assert results["requests"] == 10
+    assert results["errors"] == 10
+
+
+@pytest.mark.gen_test
+async def test_failures_are_recorded_separately():
+    payloads = PayloadMix("subtract", [42, 23])
+    results = await LoadTest('http://127.0.0.1:1/jsonrpc', payloads).run_open(20, 0.1)
+
+    assert results["failures"] == 2
+    assert results["latency"] == {"count": 0}
+    assert results["failed_latency"]["count"] == 2
+
+
+@pytest.mark.gen_test
+async def test_running_local_app():
+    args = parse_args(['--app', 'tests.test_loadtest:make_app',
+                       '--params', '[5, 3]', '--duration', '0.1',
+                       '--concurrency', '1'])
+    results = await run(args)
+
+    assert results["requests"] > 0
+    assert results["errors"] == 0
+
+
+def test_main(tmpdir):
+    output = str(tmpdir.join('results.json'))
+    main(['--app', 'tests.test_loadtest:make_app', '--duration', '0.1',
+          '--rate', '20', '--params', '[5, 3]', '--output', output])
+
+    with open(output) as f:
+        assert json.load(f)["requests"] == 2
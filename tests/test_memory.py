@@ -0,0 +1,101 @@
+"""
+Tests for tracking allocations per method.
+"""
+
+import functools
+import tracemalloc
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.memory import AllocationTracker
+from tornado_jsonrpc2.middleware import Pipeline
+from tornado_jsonrpc2.service import RPCService
+
+KEPT = []
+
+
+@pytest.fixture
+def tracker():
+    return AllocationTracker(top_sites=3)
+
+
+@pytest.fixture
+def app(tracker):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def allocate(size):
+        KEPT.append(bytearray(size))
+        return len(KEPT)
+
+    @dispatcher.method()
+    def spike(size):
+        return len(bytearray(size))
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "middleware": Pipeline([tracker])}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    async def fetch(method, size):
+        response = await http_client.fetch(
+            base_url + '/jsonrpc', method="POST",
+            body=json_encode({"jsonrpc": "2.0", "method": method,
+                              "params": [size], "id": 1}))
+        return json_decode(response.body)
+
+    return fetch
+
+
+@pytest.mark.gen_test
+async def test_unsampled_calls_are_not_tracked(jsonrpc_fetch, tracker):
+    await jsonrpc_fetch("spike", 1000)
+
+    assert tracker.stats()["methods"] == {}
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.gen_test
+async def test_tracks_net_and_peak(jsonrpc_fetch, tracker):
+    tracker.track_next(2)
+    await jsonrpc_fetch("allocate", 1000000)
+    await jsonrpc_fetch("spike", 1000000)
+    await jsonrpc_fetch("spike", 1000000)
+
+    methods = tracker.stats()["methods"]
+    assert methods["allocate"]["calls"] == 1
+    assert methods["allocate"]["net_max"] >= 1000000
+    assert methods["spike"]["calls"] == 1
+    assert methods["spike"]["net_max"] < 100000
+    if hasattr(tracemalloc, 'reset_peak'):
+        assert methods["spike"]["peak_max"] >= 1000000
+
+    site, size = methods["allocate"]["sites"][0]
+    assert site.startswith(__file__)
+    assert size >= 1000000
+    assert not tracemalloc.is_tracing()
+
+
+def test_sample_rate():
+    tracker = AllocationTracker(sample_rate=0.5)
+    draws = iter([0.9, 0.1])
+    tracker._random = functools.partial(next, draws)
+
+    assert not tracker.should_track()
+    assert tracker.should_track()
+
+
+def test_stats_through_service(tracker):
+    service = RPCService(middleware=[tracker])
+    tracker.record("method", 10, 20, [("file.py:1", 10)])
+
+    stats = service.stats()["middleware"]["AllocationTracker"]
+    assert stats["methods"]["method"] == {
+        "calls": 1, "net_mean": 10, "net_max": 10, "peak_mean": 20,
+        "peak_max": 20, "sites": [("file.py:1", 10)]}
@@ -0,0 +1,128 @@
+"""
+Tests for middleware wrapping calls.
+"""
+
+import functools
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.exceptions import InvalidParams, ServerError
+from tornado_jsonrpc2.middleware import Middleware, Pipeline
+
+
+class Recorder(Middleware):
+    def __init__(self, name, events):
+        self.name = name
+        self.events = events
+
+    async def around_call(self, handler, request, call_next):
+        self.events.append((self.name, "before"))
+        result = await call_next(request)
+        self.events.append((self.name, "after"))
+        return result
+
+
+class Auth(Middleware):
+    async def pre_dispatch(self, handler, request):
+        if handler.request.headers.get("Authorization") != "secret":
+            raise ServerError("Unauthorized")
+
+
+class Doubler(Middleware):
+    async def post_response(self, handler, request, message):
+        if message is not None and "result" in message:
+            message["result"] *= 2
+        return message
+
+
+class ErrorMapper(Middleware):
+    def __init__(self, errors):
+        self.errors = errors
+
+    async def on_error(self, handler, request, error):
+        self.errors.append(error)
+        if isinstance(error, ZeroDivisionError):
+            raise InvalidParams("Division by zero")
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def errors():
+    return []
+
+
+@pytest.fixture
+def pipeline(events, errors):
+    return Pipeline([Auth(), Recorder("outer", events), Recorder("inner", events),
+                     Doubler(), ErrorMapper(errors)])
+
+
+@pytest.fixture
+def app(pipeline, events):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def divide(dividend, divisor):
+        events.append(("divide", "called"))
+        return dividend / divisor
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "middleware": pipeline}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json', 'Authorization': 'secret'},
+    )
+
+
+def divide(dividend, divisor):
+    return json_encode({"jsonrpc": "2.0", "method": "divide",
+                        "params": [dividend, divisor], "id": 1})
+
+
+@pytest.mark.gen_test
+async def test_hooks_wrap_call(jsonrpc_fetch, events):
+    response = await jsonrpc_fetch(body=divide(6, 2))
+
+    assert json_decode(response.body)["result"] == 6.0
+    assert events == [("outer", "before"), ("inner", "before"), ("divide", "called"),
+                      ("inner", "after"), ("outer", "after")]
+
+
+@pytest.mark.gen_test
+async def test_pre_dispatch_refuses(jsonrpc_fetch, events):
+    response = await jsonrpc_fetch(body=divide(6, 2), headers={})
+
+    assert json_decode(response.body)["error"]["code"] == -32000
+    assert events == []
+
+
+@pytest.mark.gen_test
+async def test_on_error_replaces_error(jsonrpc_fetch, errors):
+    response = await jsonrpc_fetch(body=divide(1, 0))
+
+    assert json_decode(response.body)["error"]["code"] == -32602
+    assert [type(error) for error in errors] == [ZeroDivisionError]
+
+
+def test_unused_hooks_are_left_out():
+    assert Pipeline([]).compute is None
+    assert Pipeline([]).respond is None
+
+    pipeline = Pipeline([Doubler()])
+    assert pipeline.compute is None
+    assert pipeline.respond is not None
@@ -0,0 +1,188 @@
+"""
+Tests for scheduling calls by priority and between clients.
+"""
+
+import asyncio
+import functools
+
+import pytest
+import tornado.web
+from tornado import gen
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.exceptions import ServerError
+from tornado_jsonrpc2.scheduler import Scheduler
+
+
+async def enqueue(scheduler, order, name, client=None, priority=0):
+    await scheduler.acquire(client, priority)
+    order.append(name)
+    scheduler.release()
+
+
+async def run_queued(scheduler, calls):
+    """
+    Queue `calls` behind a running call and return the order they ran in.
+    """
+    order = []
+    await scheduler.acquire()
+    tasks = []
+    for name, client, priority in calls:
+        tasks.append(asyncio.ensure_future(
+            enqueue(scheduler, order, name, client, priority)))
+        await gen.sleep(0)
+
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.gen_test
+async def test_higher_priority_first():
+    scheduler = Scheduler(concurrency=1)
+    order = await run_queued(scheduler, [("export", None, 1),
+                                         ("lookup", None, 0),
+                                         ("report", None, 2)])
+
+    assert order == ["lookup", "export", "report"]
+
+
+@pytest.mark.gen_test
+async def test_clients_take_turns():
+    scheduler = Scheduler(concurrency=1)
+    calls = [("bulk{}".format(i), "bulk", 0) for i in range(3)]
+    calls.append(("user", "user", 0))
+    order = await run_queued(scheduler, calls)
+
+    assert order == ["bulk0", "user", "bulk1", "bulk2"]
+
+
+@pytest.mark.gen_test
+async def test_weights():
+    scheduler = Scheduler(concurrency=1, weights={"heavy": 2})
+    calls = [("light{}".format(i), "light", 0) for i in range(2)]
+    calls.extend(("heavy{}".format(i), "heavy", 0) for i in range(4))
+    order = await run_queued(scheduler, calls)
+
+    assert order == ["heavy0", "light0", "heavy1", "heavy2", "light1", "heavy3"]
+
+
+@pytest.mark.gen_test
+async def test_starving_calls_are_promoted():
+    scheduler = Scheduler(concurrency=1, max_wait=0.01)
+    order = []
+    await scheduler.acquire()
+    background = asyncio.ensure_future(enqueue(scheduler, order, "background", priority=1))
+    await gen.sleep(0.02)
+    interactive = asyncio.ensure_future(enqueue(scheduler, order, "interactive"))
+    await gen.sleep(0)
+
+    scheduler.release()
+    await asyncio.gather(background, interactive)
+
+    assert order == ["background", "interactive"]
+    assert scheduler.stats()["promoted"] == 1
+
+
+@pytest.mark.gen_test
+async def test_bounded_queues():
+    scheduler = Scheduler(concurrency=1, max_queue_size=2, max_client_queue_size=1)
+    await scheduler.acquire()
+    waiting = [asyncio.ensure_future(scheduler.acquire("a"))]
+    await gen.sleep(0)
+
+    with pytest.raises(ServerError):
+        await scheduler.acquire("a")
+
+    waiting.append(asyncio.ensure_future(scheduler.acquire("b")))
+    await gen.sleep(0)
+
+    with pytest.raises(ServerError):
+        await scheduler.acquire("c")
+
+    assert scheduler.stats()["rejected"] == 2
+    assert scheduler.stats()["queued"] == 2
+
+    for _ in range(3):
+        scheduler.release()
+        await gen.sleep(0)
+
+    await asyncio.gather(*waiting)
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.gen_test
+async def test_cancelled_waiter_leaves_queue():
+    scheduler = Scheduler(concurrency=1)
+    await scheduler.acquire()
+    waiter = asyncio.ensure_future(scheduler.acquire("a"))
+    await gen.sleep(0)
+    waiter.cancel()
+    await gen.sleep(0)
+
+    assert scheduler.stats()["queued"] == 0
+
+    scheduler.release()
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.fixture
+def scheduler():
+    return Scheduler(concurrency=1)
+
+
+@pytest.fixture
+def app(scheduler):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    async def wait(seconds):
+        await gen.sleep(seconds)
+        return seconds
+
+    @dispatcher.method(priority=1)
+    def export():
+        return "exported"
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "scheduler": scheduler}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_scheduled_calls(jsonrpc_fetch, scheduler):
+    requests = [{"jsonrpc": "2.0", "method": "wait", "params": [0.01], "id": 1},
+                {"jsonrpc": "2.0", "method": "export", "id": 2}]
+    responses = await asyncio.gather(*(jsonrpc_fetch(body=json_encode(request))
+                                       for request in requests))
+
+    results = [json_decode(response.body)["result"] for response in responses]
+    assert results == [0.01, "exported"]
+    assert scheduler.stats()["admitted"] == 2
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.gen_test
+async def test_rejected_call(jsonrpc_fetch, scheduler):
+    scheduler.max_queue_size = 0
+    await scheduler.acquire()
+    try:
+        response = await jsonrpc_fetch(body=json_encode(
+            {"jsonrpc": "2.0", "method": "export", "id": 1}))
+    finally:
+        scheduler.release()
+
+    assert response.code == 200
+    assert json_decode(response.body)["error"]["code"] == -32000
@@ -0,0 +1,103 @@
+"""
+Tests for the application-scoped RPC service.
+"""
+
+import functools
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2.dedup import Deduplicator
+from tornado_jsonrpc2.middleware import Middleware
+from tornado_jsonrpc2.service import RPCService, RPCServiceHandler
+
+
+class Counter(Middleware):
+    def __init__(self):
+        self.calls = 0
+
+    async def around_call(self, handler, request, call_next):
+        self.calls += 1
+        return await call_next(request)
+
+
+@pytest.fixture
+def counter():
+    return Counter()
+
+
+@pytest.fixture
+def service(counter):
+    service = RPCService(version="2.0", max_batch_size=2, allow_get=True,
+                         middleware=[counter], deduplicator=Deduplicator())
+
+    @service.method(pure=True)
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    return service
+
+
+@pytest.fixture
+def app(service):
+    return tornado.web.Application([service.route()])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_calling_method(jsonrpc_fetch, counter):
+    response = await jsonrpc_fetch(body=json_encode(
+        {"jsonrpc": "2.0", "method": "subtract", "params": [42, 23], "id": 1}))
+
+    assert json_decode(response.body) == {"jsonrpc": "2.0", "id": 1, "result": 19}
+    assert counter.calls == 1
+
+
+@pytest.mark.gen_test
+async def test_configuration_applies(jsonrpc_fetch, http_client, base_url, service):
+    call = {"jsonrpc": "2.0", "method": "subtract", "params": [1, 1], "id": 1}
+    response = await jsonrpc_fetch(body=json_encode([call] * 3))
+    assert json_decode(response.body)["error"]["code"] == -32600
+
+    response = await jsonrpc_fetch(body=json_encode(
+        {"method": "subtract", "params": [1, 1], "id": 1}))
+    assert json_decode(response.body)["error"]["code"] == -32600
+
+    response = await http_client.fetch(
+        base_url + '/jsonrpc?jsonrpc=2.0&method=subtract&params=[3,1]&id=1')
+    assert json_decode(response.body)["result"] == 2
+
+    await jsonrpc_fetch(body=json_encode([call] * 2))
+    assert service.stats()["deduplicator"]["executed"] == 1
+
+
+def test_settings_are_built_once(service):
+    settings = service.handler_settings
+
+    assert settings["compute_call"] is service.middleware.compute
+    assert RPCService(version="2.0").handler_settings["decode"] is settings["decode"]
+    assert service.route("/rpc") == ("/rpc", RPCServiceHandler, {"service": service})
+
+
+@pytest.mark.gen_test
+async def test_warm_up_and_close():
+    from tornado_jsonrpc2.watchdog import LoopWatchdog
+
+    watchdog = LoopWatchdog()
+    service = RPCService(watchdog=watchdog)
+    service.warm_up()
+    assert watchdog.running
+
+    await service.close()
+    assert not watchdog.running
+    assert set(service.stats()) == {"watchdog"}
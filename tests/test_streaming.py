@@ -0,0 +1,125 @@
+"""
+Tests for streaming results of methods returning asynchronous iterators.
+"""
+
+import functools
+import socket
+
+import pytest
+import tornado.web
+from tornado import gen
+from tornado.escape import json_encode, json_decode
+from tornado.httpclient import HTTPError
+from tornado.iostream import IOStream, StreamClosedError
+from tornado.log import app_log
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+
+
+@pytest.fixture
+def finished():
+    return []
+
+
+@pytest.fixture
+def app(finished):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    async def rows(count):
+        for number in range(count):
+            yield {"row": number}
+
+    @dispatcher.method()
+    async def broken():
+        yield 1
+        raise RuntimeError("Lost the database")
+
+    @dispatcher.method()
+    async def endless():
+        try:
+            while True:
+                yield "x" * 1000
+                await gen.sleep(0.001)
+        finally:
+            finished.append(True)
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher}),
+    ])
+
+
+@pytest.fixture
+def test_url(base_url):
+    return base_url + '/jsonrpc'
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, test_url):
+    return functools.partial(
+        http_client.fetch,
+        test_url,
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_streaming_result(jsonrpc_fetch):
+    chunks = []
+    request = {"jsonrpc": "2.0", "method": "rows", "params": [5000], "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request),
+                                   streaming_callback=chunks.append)
+    assert 200 == response.code
+    assert response.headers['Transfer-Encoding'] == 'chunked'
+    assert len(chunks) > 1
+
+    response = json_decode(b''.join(chunks))
+    assert response == {"jsonrpc": "2.0", "id": 1,
+                        "result": [{"row": number} for number in range(5000)]}
+
+
+@pytest.mark.gen_test
+async def test_streaming_empty_result(jsonrpc_fetch):
+    request = {"jsonrpc": "2.0", "method": "rows", "params": [0], "id": 1}
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    assert json_decode(response.body) == {"jsonrpc": "2.0", "id": 1, "result": []}
+
+
+@pytest.mark.gen_test
+async def test_batch_collects_results(jsonrpc_fetch):
+    request = [{"jsonrpc": "2.0", "method": "rows", "params": [2], "id": 1},
+               {"jsonrpc": "2.0", "method": "broken", "id": 2}]
+    response = await jsonrpc_fetch(body=json_encode(request))
+
+    first, second = json_decode(response.body)
+    assert first == {"jsonrpc": "2.0", "id": 1, "result": [{"row": 0}, {"row": 1}]}
+    assert second['error'] == {"code": -32603, "message": "Internal error: Lost the database"}
+
+
+@pytest.mark.gen_test
+async def test_failing_stream_closes_connection(jsonrpc_fetch):
+    request = {"jsonrpc": "2.0", "method": "broken", "id": 1}
+    with pytest.raises((HTTPError, StreamClosedError)):
+        await jsonrpc_fetch(body=json_encode(request))
+
+
+@pytest.mark.gen_test
+async def test_disconnect_closes_generator(http_server, http_port, finished, caplog):
+    stream = IOStream(socket.socket())
+    await stream.connect(('127.0.0.1', http_port))
+    body = json_encode({"jsonrpc": "2.0", "method": "endless", "id": 1}).encode()
+    await stream.write(b'POST /jsonrpc HTTP/1.1\r\nHost: localhost\r\n'
+                       b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    await stream.read_until(b'"result": [')
+    stream.close()
+
+    for _ in range(100):
+        if finished:
+            break
+        await gen.sleep(0.01)
+
+    assert finished == [True]
+    assert not [record for record in caplog.records
+                if record.name == app_log.name and record.levelname == 'ERROR']
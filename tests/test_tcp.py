@@ -0,0 +1,164 @@
+"""
+Tests for JSON-RPC over TCP and Unix domain sockets.
+"""
+
+import os
+import socket
+import struct
+
+import pytest
+from tornado import gen
+from tornado.escape import json_encode, json_decode
+from tornado.iostream import IOStream, StreamClosedError
+from tornado.tcpclient import TCPClient
+from tornado.testing import bind_unused_port
+
+from tornado_jsonrpc2 import Dispatcher
+from tornado_jsonrpc2.tcp import JSONRPCTCPServer
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    async def sleep(seconds):
+        await gen.sleep(seconds)
+        return seconds
+
+    @dispatcher.method()
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    return dispatcher
+
+
+@pytest.fixture
+def start_server(io_loop, dispatcher):
+    servers = []
+
+    def start(**options):
+        server = JSONRPCTCPServer(dispatcher, **options)
+        sock, port = bind_unused_port()
+        server.add_sockets([sock])
+        servers.append(server)
+        return port
+
+    yield start
+
+    for server in servers:
+        server.stop()
+
+
+async def connect(port):
+    return await TCPClient().connect('127.0.0.1', port)
+
+
+async def call(stream, request):
+    await stream.write(json_encode(request).encode('utf-8') + b'\n')
+    return json_decode(await stream.read_until(b'\n'))
+
+
+def request(method, params, id):
+    return {"jsonrpc": "2.0", "method": method, "params": params, "id": id}
+
+
+@pytest.mark.gen_test
+async def test_newline_delimited(start_server):
+    stream = await connect(start_server())
+
+    response = await call(stream, request("subtract", [42, 23], 1))
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": 19}
+
+    response = await call(stream, [request("subtract", [1, 1], 2),
+                                   request("subtract", [2, 1], 3)])
+    assert [message["result"] for message in response] == [0, 1]
+
+
+@pytest.mark.gen_test
+async def test_errors(start_server):
+    stream = await connect(start_server())
+
+    await stream.write(b'{"jsonrpc": "2.0", "method": \n')
+    response = json_decode(await stream.read_until(b'\n'))
+    assert response["error"]["code"] == -32700
+
+    response = await call(stream, request("unknown", [], 1))
+    assert response["error"]["code"] == -32601
+
+
+@pytest.mark.gen_test
+async def test_pipelining_out_of_order(start_server):
+    stream = await connect(start_server())
+
+    await stream.write(b''.join(
+        json_encode(request("sleep", [seconds], id)).encode('utf-8') + b'\n'
+        for id, seconds in ((1, 0.05), (2, 0))))
+    # A notification gets no response.
+    await stream.write(json_encode({"jsonrpc": "2.0", "method": "sleep",
+                                    "params": [0]}).encode('utf-8') + b'\n')
+
+    first = json_decode(await stream.read_until(b'\n'))
+    second = json_decode(await stream.read_until(b'\n'))
+    assert [first["id"], second["id"]] == [2, 1]
+
+
+@pytest.mark.gen_test
+async def test_in_flight_limit(start_server):
+    stream = await connect(start_server(max_in_flight=1))
+
+    await stream.write(b''.join(
+        json_encode(request("sleep", [seconds], id)).encode('utf-8') + b'\n'
+        for id, seconds in ((1, 0.05), (2, 0))))
+
+    first = json_decode(await stream.read_until(b'\n'))
+    second = json_decode(await stream.read_until(b'\n'))
+    assert [first["id"], second["id"]] == [1, 2]
+
+
+@pytest.mark.gen_test
+async def test_length_prefixed(start_server):
+    stream = await connect(start_server(framing='length'))
+
+    body = json_encode(request("subtract", [42, 23], 1)).encode('utf-8')
+    await stream.write(struct.pack('>I', len(body)) + body)
+
+    length, = struct.unpack('>I', await stream.read_bytes(4))
+    response = json_decode(await stream.read_bytes(length))
+    assert response["result"] == 19
+
+
+@pytest.mark.gen_test
+async def test_oversized_message(start_server):
+    stream = await connect(start_server(framing='length', max_message_size=10))
+
+    body = json_encode(request("subtract", [42, 23], 1)).encode('utf-8')
+    await stream.write(struct.pack('>I', len(body)) + body)
+
+    length, = struct.unpack('>I', await stream.read_bytes(4))
+    response = json_decode(await stream.read_bytes(length))
+    assert response["error"]["code"] == -32600
+
+    with pytest.raises(StreamClosedError):
+        await stream.read_bytes(1)
+
+
+@pytest.mark.gen_test
+async def test_unknown_framing(dispatcher):
+    with pytest.raises(ValueError):
+        JSONRPCTCPServer(dispatcher, framing='xml')
+
+
+@pytest.mark.gen_test
+async def test_unix_socket(io_loop, dispatcher, tmpdir):
+    path = os.path.join(str(tmpdir), 'jsonrpc.sock')
+    server = JSONRPCTCPServer(dispatcher)
+    server.listen_unix(path)
+    try:
+        stream = IOStream(socket.socket(socket.AF_UNIX))
+        await stream.connect(path)
+
+        response = await call(stream, request("subtract", [5, 3], 1))
+        assert response["result"] == 2
+    finally:
+        server.stop()
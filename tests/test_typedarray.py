@@ -0,0 +1,135 @@
+"""
+Tests for numeric arrays sent as tagged binary buffers.
+"""
+
+import array
+import base64
+import functools
+import struct
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler, typedarray
+from tornado_jsonrpc2.exceptions import InvalidParams
+from tornado_jsonrpc2.middleware import Pipeline
+from tornado_jsonrpc2.typedarray import TypedArrays, decode_array, encode_array, numpy
+
+
+def tagged(format, values, dtype, shape):
+    data = struct.pack('<{}{}'.format(len(values), format), *values)
+    return {"$typedarray": base64.b64encode(data).decode('ascii'),
+            "dtype": dtype, "shape": shape}
+
+
+def test_decoding():
+    value = decode_array(tagged('d', [1, 2, 3, 4, 5, 6], "float64", [2, 3]))
+
+    assert value.tolist() == [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]]
+    if numpy is None:
+        assert isinstance(value, memoryview)
+
+
+@pytest.mark.parametrize("obj", [
+    {"$typedarray": "AAAA", "dtype": "complex", "shape": [1]},
+    {"$typedarray": "AAAA", "dtype": "int8", "shape": [-3]},
+    {"$typedarray": "not base64!", "dtype": "int8", "shape": [3]},
+    {"$typedarray": "AAAA", "dtype": "int32", "shape": [2]},
+])
+def test_decoding_invalid(obj):
+    with pytest.raises(InvalidParams):
+        decode_array(obj)
+
+
+def test_encoding_roundtrip():
+    values = array.array('i', [1, -2, 3])
+    obj = encode_array(values)
+
+    assert obj["dtype"] == "int32"
+    assert obj["shape"] == [3]
+    assert decode_array(obj).tolist() == [1, -2, 3]
+
+    view = memoryview(array.array('f', [1, 2, 3, 4])).cast('B').cast('f', [2, 2])
+    assert decode_array(encode_array(view)).tolist() == [[1.0, 2.0], [3.0, 4.0]]
+
+
+def test_empty_array_without_numpy(monkeypatch):
+    monkeypatch.setattr(typedarray, 'numpy', None)
+    obj = encode_array(array.array('d'))
+    assert obj["shape"] == [0]
+
+    decoded = decode_array(obj)
+    assert isinstance(decoded, memoryview)
+    assert decoded.tolist() == []
+    assert encode_array(decoded) == obj
+
+    with pytest.raises(InvalidParams):
+        decode_array(tagged('d', [], "float64", [2, 0]))
+    with pytest.raises(InvalidParams):
+        decode_array(tagged('b', [1], "int8", [1] * 65))
+
+
+def test_encoding_as_list():
+    assert encode_array(array.array('d', [1.5]), tagged=False) == [1.5]
+    # Types without a dtype fall back to lists.
+    assert encode_array(memoryview(b'ab').cast('c')) == [b'a', b'b']
+
+
+@pytest.mark.skipif(numpy is None, reason="NumPy is not installed")
+def test_numpy_roundtrip():
+    values = numpy.arange(6, dtype='>i4').reshape(2, 3)
+    decoded = decode_array(encode_array(values))
+
+    assert isinstance(decoded, numpy.ndarray)
+    assert decoded.tolist() == values.tolist()
+
+
+@pytest.fixture
+def app():
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def scale(values, factor):
+        return {"values": array.array('d', [value * factor for value in values.tolist()])}
+
+    @dispatcher.method()
+    def ones(count):
+        return array.array('d', [1.0] * count)
+
+    pipeline = Pipeline([TypedArrays()])
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "middleware": pipeline}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+    )
+
+
+@pytest.mark.gen_test
+async def test_typed_array_params(jsonrpc_fetch):
+    response = await jsonrpc_fetch(body=json_encode(
+        {"jsonrpc": "2.0", "method": "scale", "id": 1,
+         "params": {"values": tagged('d', [1, 2], "float64", [2]), "factor": 2}}))
+    result = json_decode(response.body)["result"]
+
+    assert result["values"]["dtype"] == "float64"
+    assert decode_array(result["values"]).tolist() == [2.0, 4.0]
+
+
+@pytest.mark.gen_test
+async def test_plain_list_fallback(jsonrpc_fetch):
+    body = json_encode({"jsonrpc": "2.0", "method": "ones", "params": [2], "id": 1})
+
+    response = await jsonrpc_fetch(body=body)
+    assert json_decode(response.body)["result"] == [1.0, 1.0]
+
+    response = await jsonrpc_fetch(body=body, headers={"X-Typed-Arrays": "1"})
+    assert decode_array(json_decode(response.body)["result"]).tolist() == [1.0, 1.0]
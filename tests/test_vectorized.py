@@ -0,0 +1,125 @@
+"""
+Tests for methods receiving many calls at once.
+"""
+
+import asyncio
+import functools
+
+import pytest
+import tornado.web
+from tornado.escape import json_encode, json_decode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.exceptions import InvalidParams
+
+
+@pytest.fixture
+def invocations():
+    return []
+
+
+@pytest.fixture
+def dispatcher(invocations):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method(vectorized=True, window=0.01, max_batch=5,
+                       params={"type": "array", "items": {"type": "integer"}})
+    async def square(calls):
+        invocations.append(calls)
+        return [params[0] * params[0] if params[0] >= 0
+                else InvalidParams("Negative value") for params in calls]
+
+    @dispatcher.method(vectorized=True)
+    def broken(calls):
+        return []
+
+    return dispatcher
+
+
+@pytest.fixture
+def app(dispatcher):
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "batch_concurrency": 100}),
+        (r"/capped", JSONRPCHandler, {"response_creator": dispatcher,
+                                      "batch_concurrency": 2}),
+        (r"/sequential", JSONRPCHandler, {"response_creator": dispatcher}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+def call(method, params, id):
+    return {"jsonrpc": "2.0", "method": method, "params": params, "id": id}
+
+
+@pytest.mark.gen_test
+async def test_batch_is_invoked_once(jsonrpc_fetch, invocations):
+    batch = [call("square", [value], value) for value in (1, 2, 3)]
+    response = await jsonrpc_fetch(body=json_encode(batch))
+
+    assert [message["result"] for message in json_decode(response.body)] == [1, 4, 9]
+    assert invocations == [[[1], [2], [3]]]
+
+
+@pytest.mark.gen_test
+async def test_batch_concurrency(http_client, base_url, invocations):
+    batch = json_encode([call("square", [value], value) for value in (1, 2, 3, 4)])
+    response = await http_client.fetch(base_url + '/sequential', method="POST", body=batch)
+
+    assert [message["result"] for message in json_decode(response.body)] == [1, 4, 9, 16]
+    assert invocations == [[[1]], [[2]], [[3]], [[4]]]
+
+    invocations.clear()
+    await http_client.fetch(base_url + '/capped', method="POST", body=batch)
+    assert invocations == [[[1], [2]], [[3], [4]]]
+
+
+@pytest.mark.gen_test
+async def test_concurrent_requests_are_collected(jsonrpc_fetch, invocations, dispatcher):
+    responses = await asyncio.gather(*(
+        jsonrpc_fetch(body=json_encode(call("square", [value], value)))
+        for value in (2, 3)))
+
+    assert [json_decode(response.body)["result"] for response in responses] == [4, 9]
+    assert len(invocations) == 1
+    assert dispatcher.get_method("square").batcher.stats() == {
+        "calls": 2, "invocations": 1, "batch_size": 2.0}
+
+
+@pytest.mark.gen_test
+async def test_max_batch(jsonrpc_fetch, invocations):
+    batch = [call("square", [value], value) for value in range(7)]
+    response = await jsonrpc_fetch(body=json_encode(batch))
+
+    assert len(json_decode(response.body)) == 7
+    assert [len(calls) for calls in invocations] == [5, 2]
+
+
+@pytest.mark.gen_test
+async def test_errors_per_call(jsonrpc_fetch, invocations):
+    batch = [call("square", [2], 1), call("square", [-2], 2),
+             call("square", ["x"], 3)]
+    response = await jsonrpc_fetch(body=json_encode(batch))
+    messages = json_decode(response.body)
+
+    assert messages[0]["result"] == 4
+    assert messages[1]["error"]["code"] == -32602
+    assert messages[2]["error"]["code"] == -32602
+    # Invalid params never reach the method.
+    assert invocations == [[[2], [-2]]]
+
+
+@pytest.mark.gen_test
+async def test_wrong_number_of_results(jsonrpc_fetch):
+    response = await jsonrpc_fetch(body=json_encode(call("broken", [], 1)))
+
+    assert json_decode(response.body)["error"]["code"] == -32603
@@ -0,0 +1,97 @@
+"""
+Tests for detecting calls blocking the IOLoop.
+"""
+
+import functools
+import time
+
+import pytest
+import tornado.web
+from tornado import gen
+from tornado.escape import json_encode
+
+from tornado_jsonrpc2 import Dispatcher, JSONRPCHandler
+from tornado_jsonrpc2.watchdog import LoopWatchdog
+
+
+@pytest.fixture
+def stalls():
+    return []
+
+
+@pytest.fixture
+def watchdog(stalls):
+    watchdog = LoopWatchdog(threshold=0.05, interval=0.01, on_stall=stalls.append)
+    yield watchdog
+    watchdog.stop()
+
+
+@pytest.fixture
+def app(watchdog):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def block(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    @dispatcher.method()
+    async def wait(seconds):
+        await gen.sleep(seconds)
+        return seconds
+
+    return tornado.web.Application([
+        (r"/jsonrpc", JSONRPCHandler, {"response_creator": dispatcher,
+                                       "watchdog": watchdog}),
+    ])
+
+
+@pytest.fixture
+def jsonrpc_fetch(http_client, base_url):
+    return functools.partial(
+        http_client.fetch,
+        base_url + '/jsonrpc',
+        method="POST",
+        headers={'Content-Type': 'application/json'},
+    )
+
+
+@pytest.mark.gen_test
+async def test_attributes_stall_to_method(jsonrpc_fetch, watchdog, stalls):
+    watchdog.start()
+    await jsonrpc_fetch(body=json_encode(
+        {"jsonrpc": "2.0", "method": "block", "params": [0.2], "id": 7}))
+    await gen.sleep(0.05)
+
+    assert len(stalls) == 1
+    stall = stalls[0]
+    assert stall.method == "block"
+    assert stall.id == 7
+    assert stall.duration >= 0.1
+    assert "time.sleep(seconds)" in ''.join(stall.stack)
+
+    stats = watchdog.stats()
+    assert stats["stalls"] == 1
+    assert stats["methods"]["block"]["stalls"] == 1
+    assert stats["methods"]["block"]["max"] == stall.duration
+
+
+@pytest.mark.gen_test
+async def test_waiting_is_no_stall(jsonrpc_fetch, watchdog, stalls):
+    await jsonrpc_fetch(body=json_encode(
+        {"jsonrpc": "2.0", "method": "wait", "params": [0.1], "id": 1}))
+    await gen.sleep(0.05)
+
+    assert watchdog.running
+    assert stalls == []
+
+
+@pytest.mark.gen_test
+async def test_stall_outside_of_calls(watchdog, stalls):
+    watchdog.start()
+    time.sleep(0.1)
+    await gen.sleep(0.05)
+
+    assert len(stalls) == 1
+    assert stalls[0].method is None
+    assert watchdog.stats()["methods"][None]["stalls"] == 1
@@ -0,0 +1,142 @@
+"""
+Tests for JSON-RPC over WebSocket and subscriptions.
+"""
+
+import pytest
+import tornado.web
+from tornado.concurrent import Future
+from tornado.escape import json_encode, json_decode
+from tornado.websocket import websocket_connect
+
+from tornado_jsonrpc2 import Dispatcher
+from tornado_jsonrpc2.websocket import (
+    JSONRPCWebSocketHandler, Subscriber, SubscriptionHub)
+
+
+@pytest.fixture
+def hub():
+    hub = SubscriptionHub()
+    hub.add_topic("prices")
+    return hub
+
+
+@pytest.fixture
+def app(hub):
+    dispatcher = Dispatcher()
+
+    @dispatcher.method()
+    def subtract(minuend, subtrahend):
+        return minuend - subtrahend
+
+    return tornado.web.Application([
+        (r"/ws", JSONRPCWebSocketHandler, {"response_creator": dispatcher,
+                                           "hub": hub}),
+    ])
+
+
+@pytest.fixture
+def ws_url(http_server, base_url):
+    return base_url.replace('http', 'ws', 1) + '/ws'
+
+
+async def call(connection, request):
+    await connection.write_message(json_encode(request))
+    return json_decode(await connection.read_message())
+
+
+@pytest.mark.gen_test
+async def test_calling_method(ws_url):
+    connection = await websocket_connect(ws_url)
+
+    response = await call(connection, {"jsonrpc": "2.0", "method": "subtract",
+                                       "params": [42, 23], "id": 1})
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": 19}
+
+
+@pytest.mark.gen_test
+async def test_subscribing_and_unsubscribing(ws_url, hub):
+    connection = await websocket_connect(ws_url)
+
+    response = await call(connection, {"jsonrpc": "2.0", "method": "rpc.subscribe",
+                                       "params": ["prices"], "id": 1})
+    assert response == {"jsonrpc": "2.0", "id": 1, "result": ["prices"]}
+
+    assert hub.publish("prices", {"EUR": 1.5}) == 1
+    notification = json_decode(await connection.read_message())
+    assert notification == {"jsonrpc": "2.0", "method": "prices", "params": {"EUR": 1.5}}
+
+    response = await call(connection, {"jsonrpc": "2.0", "method": "rpc.unsubscribe",
+                                       "params": ["prices"], "id": 2})
+    assert response == {"jsonrpc": "2.0", "id": 2, "result": ["prices"]}
+    assert hub.publish("prices", {"EUR": 1.6}) == 0
+
+
+@pytest.mark.gen_test
+async def test_subscribing_to_unknown_topic(ws_url, hub):
+    connection = await websocket_connect(ws_url)
+
+    response = await call(connection, {"jsonrpc": "2.0", "method": "rpc.subscribe",
+                                       "params": ["prices", "news"], "id": 1})
+    assert response['error']['code'] == -32602
+    assert hub.stats()['topics'] == {"prices": 0}
+
+
+@pytest.mark.gen_test
+async def test_closing_connection_removes_subscription(ws_url, hub):
+    connection = await websocket_connect(ws_url)
+    await call(connection, {"jsonrpc": "2.0", "method": "rpc.subscribe",
+                            "params": ["prices"], "id": 1})
+    assert hub.stats()['topics'] == {"prices": 1}
+
+    connection.close()
+    while hub.stats()['topics']['prices']:
+        await tornado.gen.sleep(0.01)
+
+
+class StuckHandler:
+    def __init__(self):
+        self.messages = []
+        self.closed = False
+
+    def write_message(self, message):
+        self.messages.append(message)
+        return Future()  # Never finishes
+
+    def close(self, code=None, reason=None):
+        self.closed = True
+
+
+@pytest.mark.gen_test
+async def test_slow_subscriber_drops_messages():
+    hub = SubscriptionHub(buffer_size=2)
+    hub.add_topic("prices")
+    handler = StuckHandler()
+    hub.subscribe("prices", Subscriber(hub, handler))
+
+    for price in range(5):
+        hub.publish("prices", price)
+        await tornado.gen.sleep(0)
+
+    assert len(handler.messages) == 1
+    assert hub.stats()['dropped'] == 2
+
+
+@pytest.mark.gen_test
+async def test_slow_subscriber_gets_disconnected():
+    hub = SubscriptionHub(buffer_size=2, overflow='disconnect')
+    hub.add_topic("prices")
+    handler = StuckHandler()
+    hub.subscribe("prices", Subscriber(hub, handler))
+
+    delivered = []
+    for price in range(5):
+        delivered.append(hub.publish("prices", price))
+        await tornado.gen.sleep(0)
+
+    assert delivered == [1, 1, 1, 0, 0]
+    assert handler.closed
+    assert hub.stats() == {"topics": {"prices": 0}, "dropped": 0, "disconnected": 1}
+
+
+def test_publishing_to_unknown_topic():
+    assert SubscriptionHub().publish("unknown", 1) == 0
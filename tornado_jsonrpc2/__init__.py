@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from .dispatcher import Dispatcher
 from .handler import JSONRPCHandler
 
-__all__ = ('JSONRPCHandler', )
+__all__ = ('Dispatcher', 'JSONRPCHandler')
@@ -0,0 +1,178 @@
+"""
+Buffered access log of JSON-RPC calls.
+
+Handlers configured with an `AccessLog` put a record of every call into a
+bounded buffer. The records are written in batches to a sink by a
+background thread so that answering calls never waits for the log.
+"""
+
+import collections
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TextIO
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.log import app_log
+
+__all__ = ('AccessLog', 'BufferedWriter', 'FileSink', 'StreamSink')
+
+FIELDS = ('time', 'client', 'method', 'id', 'status', 'duration', 'batch_index')
+
+
+class StreamSink:
+    """
+    Writing records as JSON lines to a stream, stdout by default.
+    """
+
+    def __init__(self, stream: Optional[TextIO]=None):
+        self.stream = stream
+
+    def __call__(self, records: List[dict]) -> None:
+        stream = self.stream or sys.stdout
+        stream.write(''.join(json.dumps(record) + '\n' for record in records))
+        stream.flush()
+
+    def close(self) -> None:
+        pass
+
+
+class FileSink(StreamSink):
+    """
+    Appending records as JSON lines to the file at `path`.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(open(path, 'a', encoding='utf-8'))
+        self.path = path
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+class BufferedWriter:
+    """
+    Collecting records and writing them to `sink` in batches.
+
+    `sink` is called with a list of records from a background thread.
+    If it has a `close` method it is called by `close`.
+
+    Only a share of `sample_rate` of the records should be collected, see
+    `sample`. Up to `buffer_size` records are kept until the next write
+    every `flush_interval` seconds. If the buffer is full the oldest record
+    is dropped and counted.
+    """
+
+    def __init__(self, sink: Callable, buffer_size: int=10000,
+                 sample_rate: float=1.0, flush_interval: float=1.0):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.buffer = collections.deque(maxlen=buffer_size)
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+        self._executor = ThreadPoolExecutor(1)
+        self._callback = None
+        self._random = random.random
+
+    def sample(self) -> bool:
+        """
+        Decide if the next record should be collected.
+        """
+        return self.sample_rate >= 1 or self._random() < self.sample_rate
+
+    def start(self) -> None:
+        if self._callback is None:
+            self._callback = PeriodicCallback(self.flush, self.flush_interval * 1000)
+            self._callback.start()
+
+    async def flush(self) -> None:
+        """
+        Write the records buffered so far.
+        """
+        if not self.buffer:
+            return
+
+        records = list(self.buffer)
+        self.buffer.clear()
+        try:
+            await IOLoop.current().run_in_executor(self._executor, self._write, records)
+        except Exception:
+            self.failed += len(records)
+            app_log.exception("Writing %d records of %s failed",
+                              len(records), type(self).__name__)
+        else:
+            self.written += len(records)
+
+    async def close(self) -> None:
+        """
+        Stop the background writing, write what is left and close the sink.
+        """
+        if self._callback is not None:
+            self._callback.stop()
+            self._callback = None
+
+        await self.flush()
+        close = getattr(self.sink, 'close', None)
+        if close is not None:
+            await IOLoop.current().run_in_executor(self._executor, close)
+
+    def stats(self) -> dict:
+        return {"recorded": self.recorded,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "buffered": len(self.buffer)}
+
+    def _append(self, record: tuple) -> None:
+        if self._callback is None:
+            self.start()
+
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+
+        self.buffer.append(record)
+        self.recorded += 1
+
+    def _write(self, records: list) -> None:
+        self.sink(records)
+
+
+class AccessLog(BufferedWriter):
+    """
+    Collecting records of calls and writing them to `sink` in batches.
+
+    `sink` is called with a list of records as dicts, by default they are
+    written to stdout. Buffering and sampling work like for
+    `BufferedWriter`.
+    """
+
+    def __init__(self, sink: Optional[Callable]=None, buffer_size: int=10000,
+                 sample_rate: float=1.0, flush_interval: float=1.0):
+        super().__init__(sink if sink is not None else StreamSink(),
+                         buffer_size=buffer_size, sample_rate=sample_rate,
+                         flush_interval=flush_interval)
+
+    def record(self, request, message: Optional[dict], duration: float,
+               client=None) -> None:
+        """
+        Record a call answered with `message` after `duration` seconds.
+        """
+        if message is None:
+            status = None
+        else:
+            error = message.get('error')
+            status = 0 if error is None else error.get('code')
+
+        self._append((time.time(), client, getattr(request, 'method', None),
+                      getattr(request, 'id', None), status, duration,
+                      getattr(request, 'batch_index', None)))
+
+    def _write(self, records: list) -> None:
+        self.sink([dict(zip(FIELDS, record)) for record in records])
@@ -0,0 +1,89 @@
+"""
+Collecting calls to vectorized methods.
+
+A vectorized method is invoked with the params of many calls at once.
+The `Batcher` of such a method collects the calls arriving during a short
+window, from one batch request as well as from concurrent requests, and
+hands their results back to the individual calls.
+"""
+
+import inspect
+from typing import Any, Callable
+
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+from .exceptions import InternalError
+
+__all__ = ('Batcher', )
+
+
+class Batcher:
+    """
+    Invoking `func` once for the calls collected during `window` seconds.
+
+    `func` receives a list with the params of every call and has to return
+    a list with one result per call in the same order. An exception in place
+    of a result is raised for that call only.
+    Once `max_batch` calls are waiting they are passed on right away.
+    """
+
+    def __init__(self, func: Callable, window: float=0.002, max_batch: int=100):
+        self.func = func
+        self.window = window
+        self.max_batch = max_batch
+        self.calls = 0
+        self.invocations = 0
+
+        self._pending = []
+        self._timeout = None
+
+    async def submit(self, params) -> Any:
+        future = Future()
+        self._pending.append((params, future))
+        self.calls += 1
+
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timeout is None:
+            self._timeout = IOLoop.current().call_later(self.window, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        if self._timeout is not None:
+            IOLoop.current().remove_timeout(self._timeout)
+            self._timeout = None
+
+        pending, self._pending = self._pending, []
+        if pending:
+            self.invocations += 1
+            IOLoop.current().add_callback(self._invoke, pending)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls,
+                "invocations": self.invocations,
+                "batch_size": self.calls / self.invocations if self.invocations else 0.0}
+
+    async def _invoke(self, pending: list) -> None:
+        try:
+            results = self.func([params for params, _ in pending])
+            if inspect.isawaitable(results):
+                results = await results
+
+            if not isinstance(results, list) or len(results) != len(pending):
+                raise InternalError("Vectorized method did not return one result per call")
+        except Exception as error:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(pending, results):
+            if future.done():  # The caller is gone.
+                continue
+
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
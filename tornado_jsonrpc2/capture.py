@@ -0,0 +1,269 @@
+"""
+Capturing traffic and replaying it.
+
+Handlers configured with a `TrafficCapture` append the bodies of sampled
+requests with their arrival time and the time taken to answer them to a
+file. Like the access log the records are written in batches by a
+background thread.
+
+``python -m tornado_jsonrpc2.capture FILE`` replays a capture against an
+endpoint at the original rate, a multiple of it or as fast as possible
+and compares throughput and latency with the captured ones.
+
+A capture file starts with a magic string followed by records of the
+arrival as UNIX timestamp (double), the duration in seconds (float) and
+the length of the body (unsigned int), all big-endian, and the body.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import struct
+import sys
+import time
+from typing import Iterator, List, Optional
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPError
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+
+from .accesslog import BufferedWriter
+from .measure import PERCENTILES, Histogram, count_errors, load_app
+
+__all__ = ('Captured', 'Replay', 'TrafficCapture', 'main', 'read_capture', 'run')
+
+MAGIC = b'TJRPCAP1'
+RECORD = struct.Struct('>dfI')
+
+Captured = collections.namedtuple('Captured', 'arrival duration body')
+
+
+class CaptureFile:
+    """
+    Appending records to the capture file at `path`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def __call__(self, records: List[tuple]) -> None:
+        self.file.write(b''.join(RECORD.pack(arrival, duration, len(body)) + body
+                                 for arrival, duration, body in records))
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class TrafficCapture(BufferedWriter):
+    """
+    Capturing a share of `sample_rate` of the requests to the file at `path`.
+
+    Buffering and writing work like for `AccessLog`.
+    """
+
+    def __init__(self, path: str, sample_rate: float=1.0, buffer_size: int=10000,
+                 flush_interval: float=1.0):
+        super().__init__(CaptureFile(path), buffer_size=buffer_size,
+                         sample_rate=sample_rate, flush_interval=flush_interval)
+        self.path = path
+
+    def record_request(self, body: bytes, arrival: float, duration: float) -> None:
+        """
+        Record a request with `body` arrived at `arrival` and answered
+        after `duration` seconds.
+        """
+        self._append((arrival, duration, bytes(body)))
+
+
+def read_capture(path: str) -> Iterator[Captured]:
+    """
+    Read the records of a capture file.
+
+    A record cut off at the end of the file, like after a crash while
+    writing, is ignored.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a capture file".format(path))
+
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+
+            arrival, duration, length = RECORD.unpack(header)
+            body = f.read(length)
+            if len(body) < length:
+                return
+
+            yield Captured(arrival, duration, body)
+
+
+class Replay:
+    """
+    Sending captured requests to `url` in the order they arrived.
+
+    Requests are sent at their original offsets divided by `speed` or, if
+    `speed` is `None`, as fast as possible. At most `max_outstanding`
+    requests are running at a time. Latencies are measured from the time a
+    request was due, those of failed requests are kept apart.
+    """
+
+    def __init__(self, url: str, records: List[Captured], speed: Optional[float]=1.0,
+                 max_outstanding: int=1000, timeout: float=30):
+        if speed is not None and speed <= 0:
+            raise ValueError("Speed must be positive")
+
+        self.url = url
+        self.records = sorted(records, key=lambda record: record.arrival)
+        self.speed = speed
+        self.max_outstanding = max_outstanding
+        self.timeout = timeout
+        self.histogram = Histogram()
+        self.failed_histogram = Histogram()
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        self.elapsed = 0.0
+        self.client = None
+
+    async def send(self, record: Captured, started: float) -> None:
+        try:
+            response = await self.client.fetch(
+                self.url, method='POST', body=record.body,
+                headers={'Content-Type': 'application/json'},
+                request_timeout=self.timeout)
+        except (HTTPError, OSError):
+            self.failures += 1
+            self.failed_histogram.record(time.monotonic() - started)
+            return
+
+        self.histogram.record(time.monotonic() - started)
+        self.requests += 1
+        self.errors += count_errors(response.body)
+
+    async def run(self) -> dict:
+        self.client = AsyncHTTPClient(force_instance=True,
+                                      max_clients=self.max_outstanding)
+        start = time.monotonic()
+        outstanding = set()
+        try:
+            for record in self.records:
+                due = None
+                if self.speed is not None:
+                    due = start + (record.arrival - self.records[0].arrival) / self.speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        await gen.sleep(delay)
+
+                while len(outstanding) >= self.max_outstanding:
+                    await asyncio.wait(outstanding, return_when=asyncio.FIRST_COMPLETED)
+
+                future = asyncio.ensure_future(
+                    self.send(record, due if due is not None else time.monotonic()))
+                outstanding.add(future)
+                future.add_done_callback(outstanding.discard)
+
+            if outstanding:
+                await gen.multi(list(outstanding))
+        finally:
+            self.client.close()
+
+        self.elapsed = time.monotonic() - start
+        return self.results()
+
+    def results(self) -> dict:
+        original = Histogram()
+        for record in self.records:
+            original.record(record.duration)
+
+        span = 0.0
+        if self.records:
+            span = (max(record.arrival + record.duration for record in self.records) -
+                    self.records[0].arrival)
+
+        original_throughput = len(self.records) / (span or 1.0)
+        throughput = self.requests / (self.elapsed or 1.0)
+        return {"url": self.url,
+                "speed": self.speed,
+                "requests": self.requests,
+                "errors": self.errors,
+                "failures": self.failures,
+                "original": {"duration": span,
+                             "throughput": original_throughput,
+                             "latency": original.to_dict()},
+                "replay": {"duration": self.elapsed,
+                           "throughput": throughput,
+                           "latency": self.histogram.to_dict(),
+                           "failed_latency": self.failed_histogram.to_dict()},
+                "difference": {
+                    "throughput": throughput / original_throughput,
+                    "latency": {str(percent): (self.histogram.percentile(percent) -
+                                               original.percentile(percent)) * 1000
+                                for percent in PERCENTILES}}}
+
+
+def parse_args(argv: Optional[List[str]]=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m tornado_jsonrpc2.capture',
+        description="Replay captured requests against a JSON-RPC endpoint.")
+    parser.add_argument('capture', help="Capture file")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help="URL of the endpoint")
+    target.add_argument('--app', metavar='MODULE:FACTORY',
+                        help="Start the application returned by FACTORY in "
+                             "this process and target it")
+    parser.add_argument('--path', default='/jsonrpc',
+                        help="Path of the endpoint when using --app")
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument('--speed', type=float, default=1.0,
+                      help="Multiple of the original rate")
+    rate.add_argument('--max-rate', action='store_true',
+                      help="Send requests as fast as possible")
+    parser.add_argument('--max-outstanding', type=int, default=1000,
+                        help="Running requests")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help="Write the results to this file")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    server = None
+    url = args.url
+    if args.app:
+        server = HTTPServer(load_app(args.app)())
+        sockets = bind_sockets(0, '127.0.0.1')
+        server.add_sockets(sockets)
+        port = sockets[0].getsockname()[1]
+        url = 'http://127.0.0.1:{}{}'.format(port, args.path)
+
+    replay = Replay(url, list(read_capture(args.capture)),
+                    speed=None if args.max_rate else args.speed,
+                    max_outstanding=args.max_outstanding, timeout=args.timeout)
+    try:
+        return await replay.run()
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def main(argv: Optional[List[str]]=None) -> None:
+    args = parse_args(argv)
+    results = IOLoop.current().run_sync(lambda: run(args))
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
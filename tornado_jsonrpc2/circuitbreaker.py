@@ -0,0 +1,198 @@
+"""
+Failing fast on methods whose backend is unhealthy.
+
+The `CircuitBreakers` middleware keeps a `Breaker` per method. A breaker
+opens once too many of the recent calls failed or were slow. While open,
+calls are refused right away with a server error. After a timeout a few
+probe calls are let through and the breaker closes again if they succeed.
+"""
+
+import collections
+import time
+from typing import Callable, Iterable, Optional
+
+from .exceptions import InvalidParams, InvalidRequest, MethodNotFound, ServerError
+from .middleware import Middleware
+
+__all__ = ('Breaker', 'CircuitBreakers', 'CircuitOpenError')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# Errors caused by the client say nothing about the health of a method.
+CLIENT_ERRORS = (InvalidParams, InvalidRequest, MethodNotFound)
+
+
+class CircuitOpenError(ServerError):
+    pass
+
+
+class Breaker:
+    """
+    The state of the circuit of one method.
+
+    The last `window` calls are considered. With at least `min_calls` of
+    them the breaker opens if the share of failed calls reaches
+    `error_rate` or the share of calls taking `slow_call_duration` seconds
+    or longer reaches `slow_rate`.
+    After `reset_timeout` seconds `probes` calls are let through. If all
+    of them succeed the breaker closes, any failure opens it again.
+
+    `before_call` returns a token to pass to `after_call`. Calls finishing
+    after the state changed since they started are not counted.
+    """
+
+    def __init__(self, window: int=50, min_calls: int=10, error_rate: float=0.5,
+                 slow_call_duration: Optional[float]=None, slow_rate: float=0.5,
+                 reset_timeout: float=30, probes: int=1,
+                 clock: Callable[[], float]=time.monotonic):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_rate = slow_rate
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.clock = clock
+
+        self.state = CLOSED
+        self.generation = 0
+        self.calls = collections.deque(maxlen=window)
+        self.failed = 0
+        self.slow = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = None
+        self._probing = 0
+        self._probed = 0
+
+    def before_call(self) -> int:
+        """
+        Raise `CircuitOpenError` if the call may not be made.
+
+        Returns the token for `after_call`.
+        """
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit is open")
+
+            self.state = HALF_OPEN
+            self.generation += 1
+            self._probing = 0
+            self._probed = 0
+
+        if self.state == HALF_OPEN:
+            if self._probing + self._probed >= self.probes:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit is open")
+
+            self._probing += 1
+
+        return self.generation
+
+    def after_call(self, token: int, failed: bool, duration: float) -> None:
+        if token != self.generation:
+            # Started before the state changed, like a call started while
+            # closed finishing while probing.
+            return
+
+        slow = self.slow_call_duration is not None and duration >= self.slow_call_duration
+        if self.state == HALF_OPEN:
+            self._probing -= 1
+            if failed or slow:
+                self.open()
+            else:
+                self._probed += 1
+                if self._probed >= self.probes:
+                    self.close()
+            return
+
+        if len(self.calls) == self.calls.maxlen:
+            old_failed, old_slow = self.calls[0]
+            self.failed -= old_failed
+            self.slow -= old_slow
+
+        self.calls.append((failed, slow))
+        self.failed += failed
+        self.slow += slow
+
+        count = len(self.calls)
+        if count >= self.min_calls and (self.failed / count >= self.error_rate or
+                                        self.slow / count >= self.slow_rate):
+            self.open()
+
+    def open(self) -> None:
+        self.state = OPEN
+        self.generation += 1
+        self.opened += 1
+        self._opened_at = self.clock()
+
+    def close(self) -> None:
+        self.state = CLOSED
+        self.generation += 1
+        self.calls.clear()
+        self.failed = 0
+        self.slow = 0
+
+    def stats(self) -> dict:
+        return {"state": self.state,
+                "calls": len(self.calls),
+                "failed": self.failed,
+                "slow": self.slow,
+                "opened": self.opened,
+                "rejected": self.rejected}
+
+
+class CircuitBreakers(Middleware):
+    """
+    A circuit breaker per method.
+
+    Breakers are created for the methods in `methods` or, if not given,
+    for every method the handler knows through `get_method`.
+    Further arguments are passed on to every `Breaker`.
+    """
+
+    def __init__(self, methods: Optional[Iterable[str]]=None, **options):
+        self.methods = set(methods) if methods is not None else None
+        self.options = options
+        self.breakers = {}
+
+    def get_breaker(self, handler, name) -> Optional[Breaker]:
+        try:
+            return self.breakers[name]
+        except (KeyError, TypeError):
+            pass
+
+        if self.methods is not None:
+            known = name in self.methods
+        else:
+            known = isinstance(name, str) and handler.get_method(name) is not None
+
+        if not known:
+            return None
+
+        breaker = self.breakers[name] = Breaker(**self.options)
+        return breaker
+
+    async def around_call(self, handler, request, call_next):
+        breaker = self.get_breaker(handler, request.method)
+        if breaker is None:
+            return await call_next(request)
+
+        token = breaker.before_call()
+        started = breaker.clock()
+        failed = True
+        try:
+            result = await call_next(request)
+            failed = False
+        except CLIENT_ERRORS:
+            failed = False
+            raise
+        finally:
+            breaker.after_call(token, failed, breaker.clock() - started)
+
+        return result
+
+    def stats(self) -> dict:
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
@@ -0,0 +1,260 @@
+"""
+A client for JSON-RPC endpoints served over HTTP.
+
+Idempotent calls can be hedged: if no response arrived within a latency
+percentile of the recent calls, the call is sent to another endpoint as
+well and the first response wins. The losing request is not aborted,
+it runs to completion in the background and its latency is recorded.
+Idempotent calls failing on the transport are retried on another endpoint.
+Hedges and retries are paid from a `RetryBudget` so that they can not
+multiply the load on endpoints that are failing.
+"""
+
+import asyncio
+import collections
+import itertools
+import math
+import time
+from typing import Callable, List, Optional, Union
+
+from tornado.escape import json_decode, json_encode
+from tornado.httpclient import AsyncHTTPClient, HTTPError
+
+from .exceptions import JSONRPCError
+
+__all__ = ('JSONRPCClient', 'RemoteError', 'RetryBudget', 'TransportError')
+
+
+class RemoteError(JSONRPCError):
+    """
+    An error returned by the endpoint.
+    """
+
+    def __init__(self, code: int, message: str, data=None):
+        super().__init__(message)
+        self.error_code = code
+        self.data = data
+
+
+class TransportError(Exception):
+    """
+    No valid response was received from the endpoint.
+    """
+
+
+class RetryBudget:
+    """
+    A token bucket limiting retries and hedges.
+
+    Every call adds `ratio` tokens and tokens are added at
+    `min_per_second` on top. Every retry or hedge takes one token.
+    At most `capacity` tokens are kept.
+    """
+
+    def __init__(self, ratio: float=0.1, min_per_second: float=1.0,
+                 capacity: float=10, clock: Callable[[], float]=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self._refilled = clock()
+
+    def deposit(self) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self._refilled) * self.min_per_second)
+        self._refilled = now
+
+
+class JSONRPCClient:
+    """
+    Calling methods on the JSON-RPC 2.0 endpoints at `urls`.
+
+    Calls are distributed round-robin over the endpoints.
+    Idempotent calls are retried up to `max_retries` times and, with more
+    than one endpoint, hedged once they take longer than the
+    `hedge_percentile` of the last `latency_window` calls.
+    Hedging starts after `hedge_min_samples` calls and never before
+    `min_hedge_delay` seconds.
+    """
+
+    def __init__(self, urls: Union[str, List[str]], budget: Optional[RetryBudget]=None,
+                 max_retries: int=2, hedge_percentile: Optional[float]=95,
+                 hedge_min_samples: int=20, min_hedge_delay: float=0.0,
+                 latency_window: int=1000, timeout: float=10,
+                 http_client: Optional[AsyncHTTPClient]=None):
+        self.urls = [urls] if isinstance(urls, str) else list(urls)
+        if not self.urls:
+            raise ValueError("No endpoints given")
+
+        self.budget = budget if budget is not None else RetryBudget()
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.timeout = timeout
+        self.http_client = http_client or AsyncHTTPClient()
+
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+        self._ids = itertools.count(1)
+        self._endpoints = itertools.cycle(self.urls)
+        self._hedge_delay = None
+        self._new_samples = 0
+
+    async def call(self, method: str, params=None, idempotent: bool=False):
+        """
+        Call `method` and return its result.
+
+        Raises `RemoteError` for error responses and `TransportError` if
+        no response was received.
+        """
+        request = {"jsonrpc": "2.0", "method": method, "id": next(self._ids)}
+        if params is not None:
+            request["params"] = params
+
+        body = await self.send(json_encode(request).encode('utf-8'), idempotent)
+        try:
+            response = json_decode(body)
+        except ValueError:
+            raise TransportError("Invalid response")
+
+        error = response.get('error') if isinstance(response, dict) else None
+        if error is not None:
+            raise RemoteError(error.get('code'), error.get('message'), error.get('data'))
+
+        try:
+            return response['result']
+        except (KeyError, TypeError):
+            raise TransportError("Invalid response")
+
+    async def notify(self, method: str, params=None) -> None:
+        request = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            request["params"] = params
+
+        await self.send(json_encode(request).encode('utf-8'), idempotent=False)
+
+    async def send(self, body: bytes, idempotent: bool) -> bytes:
+        self.calls += 1
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            try:
+                if idempotent and len(self.urls) > 1:
+                    return await self.send_hedged(body)
+
+                return await self.post(next(self._endpoints), body)
+            except TransportError:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+
+                if not self.budget.withdraw():
+                    self.budget_exhausted += 1
+                    raise
+
+                attempt += 1
+                self.retries += 1
+
+    async def send_hedged(self, body: bytes) -> bytes:
+        first = asyncio.ensure_future(self.post(next(self._endpoints), body))
+        second = None
+        try:
+            delay = self.hedge_delay()
+            if delay is None:
+                return await first
+
+            try:
+                return await asyncio.wait_for(asyncio.shield(first), delay)
+            except asyncio.TimeoutError:
+                pass
+
+            if not self.budget.withdraw():
+                self.budget_exhausted += 1
+                return await first
+
+            self.hedges += 1
+            second = asyncio.ensure_future(self.post(next(self._endpoints), body))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+
+            return first.result()
+        finally:
+            # Tornado can not abort a fetch, so the loser is left to finish
+            # and record its latency instead of being cancelled.
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.add_done_callback(self._discard)
+
+    @staticmethod
+    def _discard(task: asyncio.Future) -> None:
+        if not task.cancelled():
+            task.exception()
+
+    async def post(self, url: str, body: bytes) -> bytes:
+        started = time.monotonic()
+        try:
+            response = await self.http_client.fetch(
+                url, method='POST', body=body, request_timeout=self.timeout,
+                headers={'Content-Type': 'application/json'})
+        except (HTTPError, OSError) as error:
+            raise TransportError("Request to {} failed: {}".format(url, error))
+
+        self.record_latency(time.monotonic() - started)
+        return response.body
+
+    def record_latency(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+        self._new_samples += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Get the seconds to wait before hedging, `None` to not hedge.
+        """
+        if self.hedge_percentile is None or len(self.latencies) < self.hedge_min_samples:
+            return None
+
+        # Sorting the window for every call would cost more than the
+        # percentile moves, so it is only updated every few calls.
+        if self._hedge_delay is None or self._new_samples >= max(1, len(self.latencies) // 10):
+            ordered = sorted(self.latencies)
+            index = min(len(ordered) - 1,
+                        math.ceil(len(ordered) * self.hedge_percentile / 100) - 1)
+            self._hedge_delay = ordered[max(0, index)]
+            self._new_samples = 0
+
+        return max(self.min_hedge_delay, self._hedge_delay)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "budget_exhausted": self.budget_exhausted,
+                "hedge_delay": self.hedge_delay()}
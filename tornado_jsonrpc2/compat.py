@@ -0,0 +1,10 @@
+"""
+Compatibility with older versions of Python.
+"""
+
+import asyncio
+
+__all__ = ('current_task', )
+
+# asyncio.current_task was added in Python 3.7.
+current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
@@ -0,0 +1,44 @@
+"""
+Deduplication of identical calls within batch requests.
+"""
+
+from typing import Callable, Optional
+
+__all__ = ('Deduplicator', )
+
+
+class Deduplicator:
+    """
+    Finding calls to pure methods that can share their response.
+
+    Calls are identical if version, method and encoded params are equal.
+    The counters are shared by every handler using this instance.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.executed = 0
+
+    def key(self, call, get_method: Callable) -> Optional[tuple]:
+        """
+        Get the key identifying `call` or `None` if it must be executed.
+        """
+        if not isinstance(call.method, str):
+            return None
+
+        method = get_method(call.method)
+        if method is None or not getattr(method, 'pure', False):
+            return None
+
+        return (call.version, call.method, call.raw_params)
+
+    def count(self, executed: bool) -> None:
+        self.calls += 1
+        if executed:
+            self.executed += 1
+
+    def stats(self) -> dict:
+        saved = self.calls - self.executed
+        return {"calls": self.calls,
+                "executed": self.executed,
+                "ratio": saved / self.calls if self.calls else 0.0}
@@ -0,0 +1,125 @@
+"""
+Dispatching requests to registered methods.
+
+A `Dispatcher` can be used as `response_creator` of a `JSONRPCHandler`.
+"""
+
+import inspect
+from typing import Any, Callable, Optional
+
+from .batching import Batcher
+from .exceptions import MethodNotFound
+from .schema import compile_params_schema
+
+__all__ = ('Dispatcher', 'Method')
+
+
+class Method:
+    """
+    A method registered with a `Dispatcher`.
+
+    If a schema for `params` is given it will be compiled once and the
+    params of every call are validated before the function is called.
+
+    Methods marked `idempotent` may be called through HTTP GET if the
+    handler allows it. Their results are sent with `cache_control` as
+    value for the Cache-Control header.
+
+    Methods marked `pure` always return the same result for the same
+    params and have no side effects. Identical calls to them in a batch
+    may be computed only once. Pure methods are idempotent as well.
+
+    The `priority` class is used by a `tornado_jsonrpc2.scheduler.Scheduler`
+    to order waiting calls, lower values are served first.
+
+    Methods marked `vectorized` are called with a list of the params of all
+    calls collected during `window` seconds, at most `max_batch` at once,
+    and return a list with one result per call. See
+    `tornado_jsonrpc2.batching.Batcher`.
+    """
+
+    def __init__(self, func: Callable, name: str, params: Optional[dict]=None,
+                 idempotent: bool=False, cache_control: Optional[str]=None,
+                 pure: bool=False, priority: int=0, vectorized: bool=False,
+                 window: float=0.002, max_batch: int=100):
+        self.func = func
+        self.name = name
+        self.params_schema = params
+        self.idempotent = idempotent or pure
+        self.cache_control = cache_control
+        self.pure = pure
+        self.priority = priority
+
+        if vectorized:
+            self.batcher = Batcher(func, window=window, max_batch=max_batch)
+        else:
+            self.batcher = None
+
+        if params is None:
+            self.validate_params = None
+        else:
+            self.validate_params = compile_params_schema(params)
+
+    def __repr__(self):
+        return '{}(name={!r}, func={!r})'.format(
+            self.__class__.__name__, self.name, self.func)
+
+    async def __call__(self, params) -> Any:
+        if self.validate_params is not None:
+            self.validate_params(params)
+
+        if self.batcher is not None:
+            return await self.batcher.submit(params)
+
+        if params is None:
+            result = self.func()
+        elif isinstance(params, list):
+            result = self.func(*params)
+        else:
+            result = self.func(**params)
+
+        if inspect.isawaitable(result):
+            result = await result
+
+        return result
+
+
+class Dispatcher:
+    """
+    A table of methods callable through JSON-RPC.
+
+    Methods are added through `add_method` or by decorating them
+    with `method`.
+    """
+
+    def __init__(self):
+        self.methods = {}
+
+    def add_method(self, func: Callable, name: Optional[str]=None, **options) -> Method:
+        name = name or func.__name__
+        method = Method(func, name, **options)
+        self.methods[name] = method
+        return method
+
+    def method(self, name: Optional[str]=None, **options) -> Callable:
+        def decorator(func):
+            self.add_method(func, name=name, **options)
+            return func
+
+        return decorator
+
+    def get_method(self, name: str) -> Optional[Method]:
+        return self.methods.get(name)
+
+    async def __call__(self, request) -> Any:
+        try:
+            method = self.methods[request.method]
+        except KeyError:
+            raise MethodNotFound("Method {!r} not found!".format(request.method))
+
+        try:
+            params = request.params
+        except AttributeError:
+            params = None
+
+        return await method(params)
@@ -50,3 +50,9 @@ class InvalidParams(JSONRPCError):
 class InternalError(JSONRPCError):
     error_code = -32603
     short_message = "Internal error"
+
+
+class ServerError(JSONRPCError):
+    # Implementation-defined server error.
+    error_code = -32000
+    short_message = "Server error"
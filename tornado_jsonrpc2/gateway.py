@@ -0,0 +1,410 @@
+"""
+Forwarding JSON-RPC requests to upstream services.
+
+The `JSONRPCGatewayHandler` routes calls by the prefix of their method to
+upstream JSON-RPC endpoints. Connections to the upstreams are kept alive
+and reused between requests.
+"""
+
+import asyncio
+import bisect
+import collections
+import datetime
+import hashlib
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+from tornado import gen
+from tornado.escape import json_decode, json_encode
+from tornado.http1connection import HTTP1Connection, HTTP1ConnectionParameters
+from tornado.httputil import (
+    HTTPHeaders, HTTPMessageDelegate, RequestStartLine)
+from tornado.iostream import StreamClosedError
+from tornado.locks import Semaphore
+from tornado.log import app_log
+from tornado.tcpclient import TCPClient
+from tornado.web import stream_request_body
+
+from .exceptions import JSONRPCError, InvalidParams, MethodNotFound, ServerError
+from .handler import BasicJSONRPCHandler
+
+__all__ = ('JSONRPCGatewayHandler', 'RoutingTable', 'ShardedUpstream',
+           'UpstreamPool', 'UpstreamError')
+
+
+class UpstreamError(ServerError):
+    pass
+
+
+class UpstreamPool:
+    """
+    Keep-alive HTTP/1.1 connections to one upstream endpoint.
+
+    At most `max_connections` requests are sent at the same time.
+    Idle connections are reused for the next request.
+    """
+
+    def __init__(self, url: str, max_connections: int=10,
+                 connect_timeout: float=5, request_timeout: float=30,
+                 ssl_options=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError("Unsupported scheme {!r}".format(parts.scheme))
+
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.netloc = parts.netloc
+        self.path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        self.ssl_options = ssl_options if ssl_options is not None else (
+            {} if parts.scheme == 'https' else None)
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+
+        self._idle = collections.deque()
+        self._slots = Semaphore(max_connections)
+        self._tcp_client = TCPClient()
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.url)
+
+    async def post(self, body: bytes) -> bytes:
+        """
+        Send `body` to the upstream and return the body of the response.
+
+        Raises `UpstreamError` if no successful response was received.
+        """
+        async with self._slots:
+            while self._idle:
+                stream = self._idle.pop()
+                if stream.closed():
+                    continue
+
+                try:
+                    return await self._exchange(stream, body)
+                except StreamClosedError:
+                    # The upstream closed the idle connection before the
+                    # request was written.
+                    continue
+
+            try:
+                stream = await gen.with_timeout(
+                    datetime.timedelta(seconds=self.connect_timeout),
+                    self._tcp_client.connect(self.host, self.port,
+                                             ssl_options=self.ssl_options))
+            except (OSError, StreamClosedError, gen.TimeoutError) as error:
+                app_log.warning("Could not connect to upstream %s: %s", self.url, error)
+                raise UpstreamError("Upstream unavailable")
+
+            try:
+                return await self._exchange(stream, body)
+            except StreamClosedError as error:
+                app_log.warning("Connection to upstream %s lost: %s", self.url, error)
+                raise UpstreamError("Upstream unavailable")
+
+    def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+    async def _exchange(self, stream, body: bytes) -> bytes:
+        connection = HTTP1Connection(stream, True, HTTP1ConnectionParameters())
+        headers = HTTPHeaders({'Host': self.netloc,
+                               'Content-Type': 'application/json',
+                               'Content-Length': str(len(body))})
+        response = ResponseCollector()
+        # A StreamClosedError while writing means the request was not sent
+        # and may go to another connection.
+        await connection.write_headers(RequestStartLine('POST', self.path, 'HTTP/1.1'),
+                                       headers)
+        await connection.write(body)
+        connection.finish()
+        try:
+            await gen.with_timeout(datetime.timedelta(seconds=self.request_timeout),
+                                  connection.read_response(response))
+        except gen.TimeoutError:
+            stream.close()
+            app_log.warning("Upstream %s timed out", self.url)
+            raise UpstreamError("Upstream timed out")
+        except StreamClosedError:
+            pass
+
+        if not response.finished:
+            # The upstream may have executed the request, it must not be
+            # sent again.
+            stream.close()
+            app_log.warning("Connection to upstream %s lost", self.url)
+            raise UpstreamError("Upstream unavailable")
+
+        if response.keep_alive:
+            self._idle.append(stream)
+        else:
+            stream.close()
+
+        if response.start_line.code != 200:
+            app_log.warning("Upstream %s answered with %s", self.url, response.start_line.code)
+            raise UpstreamError("Upstream answered with status {}".format(
+                response.start_line.code))
+
+        return b''.join(response.chunks)
+
+
+class ResponseCollector(HTTPMessageDelegate):
+    def __init__(self):
+        self.start_line = None
+        self.keep_alive = False
+        self.chunks = []
+        self.finished = False
+
+    def headers_received(self, start_line, headers):
+        self.start_line = start_line
+        self.keep_alive = (start_line.version == 'HTTP/1.1' and
+                           headers.get('Connection', '').lower() != 'close')
+
+    def data_received(self, chunk):
+        self.chunks.append(chunk)
+
+    def finish(self):
+        self.finished = True
+
+
+class HashRing:
+    """
+    Consistent hashing of keys to nodes.
+
+    Every node is placed `replicas` times on the ring. Adding or removing
+    a node only moves the keys next to its places.
+    """
+
+    def __init__(self, nodes: dict, replicas: int=100):
+        points = sorted((hash_key('{}#{}'.format(name, replica)), name)
+                        for name in nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [nodes[name] for _, name in points]
+
+    def get(self, key: str):
+        index = bisect.bisect(self._hashes, hash_key(key))
+        if index == len(self._hashes):
+            index = 0
+
+        return self._nodes[index]
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class ShardedUpstream:
+    """
+    Upstreams sharing the calls by a key in the params.
+
+    The shard is chosen by consistent hashing of the value of the param
+    named `key`. For params given by position the value at `position`
+    is used.
+    Arguments not consumed here are passed on to every `UpstreamPool`.
+    """
+
+    def __init__(self, urls: List[str], key: str, position: Optional[int]=None,
+                 replicas: int=100, **pool_options):
+        self.key = key
+        self.position = position
+        self.pools = [UpstreamPool(url, **pool_options) for url in urls]
+        self.ring = HashRing({pool.url: pool for pool in self.pools}, replicas=replicas)
+
+    def select(self, request) -> UpstreamPool:
+        try:
+            params = request.params
+        except AttributeError:
+            params = None
+
+        try:
+            if isinstance(params, dict):
+                value = params[self.key]
+            elif isinstance(params, list) and self.position is not None:
+                value = params[self.position]
+            else:
+                raise KeyError(self.key)
+        except (KeyError, IndexError):
+            raise InvalidParams("Missing value for {!r}".format(self.key))
+
+        return self.ring.get(json_encode(value))
+
+
+class RoutingTable:
+    """
+    Mapping prefixes of methods to upstreams.
+
+    `routes` maps a prefix to the URL of an upstream endpoint or a
+    `ShardedUpstream`.
+    The longest matching prefix wins, an empty prefix matches everything.
+    Arguments not consumed here are passed on to every `UpstreamPool`
+    created for an URL.
+    """
+
+    def __init__(self, routes: Dict[str, Union[str, ShardedUpstream]], **pool_options):
+        pools = {}
+        self.routes = []
+        self.pools = []
+        for prefix, target in routes.items():
+            if isinstance(target, ShardedUpstream):
+                self.pools.extend(target.pools)
+            elif target in pools:
+                target = pools[target]
+            else:
+                target = pools[target] = UpstreamPool(target, **pool_options)
+                self.pools.append(target)
+
+            self.routes.append((prefix, target))
+
+        self.routes.sort(key=lambda route: len(route[0]), reverse=True)
+
+    def lookup(self, method: str) -> Optional[Union[UpstreamPool, ShardedUpstream]]:
+        for prefix, target in self.routes:
+            if method.startswith(prefix):
+                return target
+
+        return None
+
+
+def encode_request(request) -> str:
+    """
+    Encode `request` again using the params as they were received.
+    """
+    members = []
+    if request.version != '1.0':
+        members.append('"jsonrpc": ' + json_encode(request.version))
+
+    members.append('"method": ' + json_encode(request.method))
+
+    params = request.raw_params
+    if params is not None:
+        members.append('"params": ' + params)
+
+    if not request.is_notification or request.version == '1.0':
+        members.append('"id": ' + json_encode(request.id))
+
+    return '{' + ', '.join(members) + '}'
+
+
+@stream_request_body
+class JSONRPCGatewayHandler(BasicJSONRPCHandler):
+    """
+    Forwarding JSON-RPC requests to upstreams given by a `RoutingTable`.
+
+    Single requests are passed on as received and the response of the
+    upstream is returned unchanged.
+    Batch requests are split by upstream and shard. The sub-batches are sent
+    in parallel and the responses are merged in the order of the calls.
+    Params are kept encoded unless `lazy_params` is disabled.
+
+    The gateway is a pass-through: calls are not computed here, so options
+    applied per call like `middleware`, `access_log` or `inflight` have no
+    effect. They belong to the upstreams.
+    """
+
+    def initialize(self, routing: RoutingTable, version: Optional[str]=None,
+                   lazy_params: bool=True, **options):
+        super().initialize(version=version, lazy_params=lazy_params, **options)
+        self.routing = routing
+
+    async def post(self) -> None:
+        self.request.body = b''.join(self._body_chunks)
+        await self.handle_jsonrpc(self.request)
+
+    async def process_jsonrpc_request(self, request) -> None:
+        if isinstance(request, list):  # batch request
+            responses = await self.process_jsonrpc_batch_request(request)
+            if responses:
+                self.write(json_encode(responses))
+            return
+
+        try:
+            request.validate()
+            pool = self.route(request)
+            response = await pool.post(self.request.body)
+        except JSONRPCError as error:
+            if not request.is_notification:
+                self.write(self.exception_to_jsonrpc(error, request))
+            return
+
+        if response:
+            self.write(response)
+
+    async def process_jsonrpc_batch_request(self, request) -> list:
+        responses = [None] * len(request)
+        batches = collections.OrderedDict()
+        for index, call in enumerate(request):
+            if isinstance(call, JSONRPCError):
+                responses[index] = self.exception_to_jsonrpc(call)
+                continue
+
+            try:
+                call.validate()
+                pool = self.route(call)
+            except JSONRPCError as error:
+                if not call.is_notification:
+                    responses[index] = self.exception_to_jsonrpc(error, call)
+                continue
+
+            batches.setdefault(pool, []).append((index, call))
+
+        results = await asyncio.gather(*(self.forward_batch(pool, calls)
+                                         for pool, calls in batches.items()))
+        for result in results:
+            for index, response in result:
+                responses[index] = response
+
+        return [response for response in responses if response is not None]
+
+    async def forward_batch(self, pool: UpstreamPool, calls: list) -> list:
+        """
+        Send `calls` to `pool` as batch and return their responses.
+
+        The responses are returned as pairs of the index of the call and
+        its response.
+        """
+        body = '[' + ', '.join(encode_request(call) for _, call in calls) + ']'
+        try:
+            responses = json_decode(await pool.post(body.encode('utf-8')))
+        except JSONRPCError as error:
+            return [(index, self.exception_to_jsonrpc(error, call))
+                    for index, call in calls if not call.is_notification]
+        except ValueError:
+            error = UpstreamError("Invalid response from upstream")
+            return [(index, self.exception_to_jsonrpc(error, call))
+                    for index, call in calls if not call.is_notification]
+
+        if isinstance(responses, dict):
+            # The upstream rejected the batch as a whole.
+            responses = [dict(responses, id=call.id) for _, call in calls
+                         if not call.is_notification]
+        elif not isinstance(responses, list):
+            error = UpstreamError("Invalid response from upstream")
+            return [(index, self.exception_to_jsonrpc(error, call))
+                    for index, call in calls if not call.is_notification]
+
+        by_id = collections.defaultdict(collections.deque)
+        for response in responses:
+            if isinstance(response, dict):
+                by_id[json_encode(response.get('id'))].append(response)
+
+        merged = []
+        for index, call in calls:
+            if call.is_notification:
+                continue
+
+            try:
+                merged.append((index, by_id[json_encode(call.id)].popleft()))
+            except IndexError:
+                error = UpstreamError("No response from upstream")
+                merged.append((index, self.exception_to_jsonrpc(error, call)))
+
+        return merged
+
+    def route(self, request) -> UpstreamPool:
+        target = self.routing.lookup(request.method)
+        if target is None:
+            raise MethodNotFound("Method {!r} not found!".format(request.method))
+        elif isinstance(target, ShardedUpstream):
+            return target.select(request)
+
+        return target
@@ -1,73 +1,268 @@
-from typing import Any, Awaitable, Optional
+import asyncio
+import hashlib
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Optional
 
-from tornado.escape import json_encode
-from tornado.web import RequestHandler
+from tornado.concurrent import Future
+from tornado.escape import json_decode, json_encode
+from tornado.iostream import StreamClosedError
+from tornado.locks import Semaphore
+from tornado.log import app_log
+from tornado.web import HTTPError, RequestHandler, stream_request_body
 
-from .jsonrpc import decode
+from .accesslog import AccessLog
+from .dedup import Deduplicator
+from .idempotency import IdempotencyStore, ResponseNotStored
+from .inflight import CallCancelled, InFlightRegistry
+from .dispatcher import Dispatcher
+from .jsonrpc import get_decoder, get_request_processor
+from .middleware import Pipeline
+from .scheduler import Scheduler
+from .watchdog import LoopWatchdog
 from .exceptions import (
-    JSONRPCError, ParseError, InvalidRequest, MethodNotFound,
-    InvalidParams, InternalError, EmptyBatchRequest)
+    JSONRPCError, ParseError, InvalidRequest, InternalError, EmptyBatchRequest)
 
-__all__ = ("BasicJSONRPCHandler", "JSONRPCHandler")
+if TYPE_CHECKING:
+    # Importing it at runtime would pull in the HTTP client and server.
+    from .capture import TrafficCapture
 
+__all__ = ("BasicJSONRPCHandler", "JSONRPCHandler", "JSONRPCProcessor",
+           "StreamingJSONRPCHandler")
 
-class BasicJSONRPCHandler(RequestHandler):
-    def initialize(self, version: Optional[str]=None):
-        self.version = version
 
-    def set_default_headers(self):
-        self.set_header('Content-Type', 'application/json')
+class JSONRPCProcessor:
+    """
+    Processing of JSON-RPC requests independent of the transport.
 
-    async def handle_jsonrpc(self, request) -> None:
-        request = self.decode_jsonrpc_request(request)
-        if not request:
-            return
+    This is used by the request handlers and can be mixed into anything
+    else receiving JSON-RPC messages.
+    """
 
-        await self.process_jsonrpc_request(request)
+    @classmethod
+    def jsonrpc_settings(cls, version: Optional[str]=None,
+                         max_batch_size: Optional[int]=None,
+                         batch_concurrency: int=1,
+                         max_params_depth: Optional[int]=None,
+                         max_params_size: Optional[int]=None,
+                         lazy_params: bool=False,
+                         deduplicator: Optional[Deduplicator]=None,
+                         scheduler: Optional[Scheduler]=None,
+                         access_log: Optional[AccessLog]=None,
+                         watchdog: Optional[LoopWatchdog]=None,
+                         idempotency: Optional[IdempotencyStore]=None,
+                         middleware: Optional[Pipeline]=None,
+                         capture: Optional['TrafficCapture']=None,
+                         inflight: Optional[InFlightRegistry]=None) -> dict:
+        """
+        Get the attributes `setup_jsonrpc` sets for the options.
 
-    def decode_jsonrpc_request(self, request):
+        They can be computed once and shared by many processors.
+        """
+        return {"version": version,
+                "max_batch_size": max_batch_size,
+                "batch_concurrency": batch_concurrency,
+                "max_params_depth": max_params_depth,
+                "max_params_size": max_params_size,
+                "decode": get_decoder(version, lazy_params=lazy_params),
+                "deduplicator": deduplicator,
+                "scheduler": scheduler,
+                "access_log": access_log,
+                "watchdog": watchdog,
+                "idempotency": idempotency,
+                "capture": capture,
+                "inflight": inflight,
+                "compute_call": middleware.compute if middleware is not None else None,
+                "respond_call": middleware.respond if middleware is not None else None}
+
+    def setup_jsonrpc(self, **options) -> None:
+        """
+        Configure processing. The options are those of `jsonrpc_settings`.
+        """
+        self.__dict__.update(self.jsonrpc_settings(**options))
+
+    async def execute_jsonrpc(self, body):
+        """
+        Process the encoded request `body` and return the response.
+
+        The response is a dict for single requests, a list for batch
+        requests and `None` if there is nothing to answer.
+        """
         try:
-            return decode(request.body, version=self.version)
+            request = self.decode(body,
+                                  max_batch_size=self.max_batch_size,
+                                  max_params_depth=self.max_params_depth,
+                                  max_params_size=self.max_params_size)
         except (InvalidRequest, ParseError, EmptyBatchRequest) as error:
-            self.write(self.exception_to_jsonrpc(error))
+            return self.exception_to_jsonrpc(error)
 
-    async def process_jsonrpc_request(self, request) -> None:
         if isinstance(request, list):  # batch request
-            responses = await self.process_jsonrpc_batch_request(request)
-            if responses:
-                # Twisted won't write lists for security reasons
-                # see http://www.tornadoweb.org/en/stable/web.html#tornado.web.RequestHandler.write
-                self.write(json_encode(responses))
+            return await self.process_jsonrpc_batch_request(request) or None
         else:
             message = await self.process_jsonrpc_single_request(request)
-            if message:
-                self.write(message)
+            return await self.collect_jsonrpc_result(message, request)
+
+    def get_method(self, name: str):
+        """
+        Get the `tornado_jsonrpc2.dispatcher.Method` registered as `name`.
+
+        Returns `None` if the handler does not know about its methods.
+        """
+        return None
+
+    def get_client_id(self):
+        """
+        Get the identity of the client used for fair scheduling.
+        """
+        return None
 
     async def process_jsonrpc_batch_request(self, request) -> list:
-        responses = []
-        for call in request:
+        """
+        Process the calls of a batch request.
+
+        The responses are returned in the order of the calls.
+        """
+        if self.deduplicator is not None:
+            return await self.process_deduplicated_batch_request(request)
+
+        responses = await self.run_batch(self.process_jsonrpc_batch_call, request)
+        return [response for response in responses if response]
+
+    async def run_batch(self, process, calls) -> list:
+        """
+        Run `process` for every call of a batch and return the results.
+
+        Up to `batch_concurrency` calls are processed at the same time.
+        By default they are processed one after the other.
+        """
+        if self.batch_concurrency <= 1:
+            return [await process(call) for call in calls]
+
+        slots = Semaphore(self.batch_concurrency)
+
+        async def run(call):
+            async with slots:
+                return await process(call)
+
+        # Python 3.6 gathers coroutines in arbitrary order, tasks created
+        # up front start in the order of the calls.
+        tasks = [asyncio.ensure_future(run(call)) for call in calls]
+        return await asyncio.gather(*tasks)
+
+    async def process_jsonrpc_batch_call(self, call) -> Optional[dict]:
+        if isinstance(call, JSONRPCError):
+            return self.exception_to_jsonrpc(call)
+
+        message = await self.create_jsonrpc_response(call)
+        if message:
+            message = await self.collect_jsonrpc_result(message, call)
+
+        return message
+
+    async def process_deduplicated_batch_request(self, request) -> list:
+        """
+        Process a batch request computing identical calls to pure methods once.
+
+        Later calls wait for the response of the first call and get a copy
+        of it.
+        """
+        computed = {}
+
+        async def process(call):
             if isinstance(call, JSONRPCError):
-                responses.append(self.exception_to_jsonrpc(call))
-                continue
+                return self.exception_to_jsonrpc(call)
+
+            key = self.deduplicator.key(call, self.get_method)
+            if key is None:
+                return await self.process_jsonrpc_batch_call(call)
+
+            if key in computed:
+                self.deduplicator.count(executed=False)
+                message = await computed[key]
+                if not call.is_notification:
+                    return dict(message, id=call.id)
+                return None
+
+            self.deduplicator.count(executed=True)
+            if call.is_notification:
+                # A notification leaves nothing to copy from.
+                return await self.process_jsonrpc_batch_call(call)
 
-            message = await self.create_jsonrpc_response(call)
-            if message:
-                responses.append(message)
+            future = computed[key] = Future()
+            message = await self.process_jsonrpc_batch_call(call)
+            future.set_result(message)
+            return message
 
-        return responses
+        responses = await self.run_batch(process, request)
+        return [response for response in responses if response]
 
     async def process_jsonrpc_single_request(self, request) -> dict:
         return await self.create_jsonrpc_response(request)
 
     async def create_jsonrpc_response(self, request) -> dict:
+        if self.watchdog is not None:
+            self.watchdog.enter(request)
+
+        call = None
+        if self.inflight is not None:
+            call = self.inflight.register(request, self.get_client_id())
+
+        try:
+            if self.access_log is None or not self.access_log.sample():
+                return await self.answer_jsonrpc_call(request)
+
+            started = time.monotonic()
+            message = await self.answer_jsonrpc_call(request)
+            self.access_log.record(request, message, time.monotonic() - started,
+                                   client=self.get_client_id())
+            return message
+        except asyncio.CancelledError:
+            if call is None or not call.cancelled:
+                raise
+
+            # Cancelled through the registry: only this call is answered
+            # with an error, the task goes on with the rest of the request.
+            uncancel = getattr(call.task, 'uncancel', None)
+            if uncancel is not None:
+                uncancel()
+
+            if not request.is_notification:
+                return self.exception_to_jsonrpc(CallCancelled("Call was cancelled"), request)
+        finally:
+            if call is not None:
+                self.inflight.unregister(call)
+
+            if self.watchdog is not None:
+                self.watchdog.exit()
+
+    async def answer_jsonrpc_call(self, request) -> dict:
         try:
             request.validate()
         except InvalidRequest as error:
             return self.exception_to_jsonrpc(error, request)
 
+        if self.idempotency is not None and request.idempotency_key is not None:
+            message = await self.replay_jsonrpc_call(request)
+        else:
+            message = await self.compute_jsonrpc_response(request)
+
+        if self.respond_call is not None:
+            message = await self.respond_call(self, request, message)
+
+        return message
+
+    async def compute_jsonrpc_response(self, request) -> dict:
         try:
-            method_result = await self.compute_result(request)
-            if not request.is_notification:
+            if self.scheduler is not None:
+                method_result = await self.compute_scheduled_result(request)
+            elif self.compute_call is not None:
+                method_result = await self.compute_call(self, request)
+            else:
+                method_result = await self.compute_result(request)
+
+            if request.is_notification and is_async_iterable(method_result):
+                async for _ in method_result:
+                    pass
+            elif not request.is_notification:
                 if request.version == '1.0':
                     return {"id": request.id,
                             "result": method_result,
@@ -76,13 +271,89 @@ class BasicJSONRPCHandler(RequestHandler):
                     return {"jsonrpc": "2.0",
                             "id": request.id,
                             "result": method_result}
-        except (MethodNotFound, InvalidParams) as error:
+        except JSONRPCError as error:
             if not request.is_notification:
                 return self.exception_to_jsonrpc(error, request)
+        except asyncio.CancelledError:
+            # Before Python 3.8 this is an Exception as well.
+            raise
         except Exception as error:
             if not request.is_notification:
                 return self.exception_to_jsonrpc(InternalError(str(error)), request)
 
+    async def replay_jsonrpc_call(self, request) -> Optional[dict]:
+        """
+        Answer a call with an idempotency key.
+
+        The response of the first call with the key is stored and given to
+        every later call with that key using the id of the later call.
+        """
+        key = request.idempotency_key
+        if not isinstance(key, str):
+            error = InvalidRequest('"idempotency_key" must be a string!')
+            return self.exception_to_jsonrpc(error, request)
+
+        async def compute():
+            message = await self.compute_jsonrpc_response(request)
+            message = await self.collect_jsonrpc_result(message, request)
+            response = None if message is None else json_encode(message)
+            if is_retryable(message):
+                raise ResponseNotStored(response)
+
+            return response
+
+        try:
+            response = await self.idempotency.execute(
+                ('call', self.get_client_id(), request.method, key),
+                request.raw_params, compute)
+        except ResponseNotStored as error:
+            response = error.response
+        except JSONRPCError as error:
+            return self.exception_to_jsonrpc(error, request)
+
+        if response is None or request.is_notification:
+            return None
+
+        message = json_decode(response)
+        message['id'] = request.id
+        return message
+
+    async def compute_scheduled_result(self, request):
+        """
+        Compute the result once the scheduler has a slot for the call.
+
+        The priority class is taken from the method, the client from
+        `get_client_id`.
+        """
+        method = self.get_method(request.method)
+        priority = getattr(method, 'priority', 0)
+        await self.scheduler.acquire(self.get_client_id(), priority)
+        try:
+            if self.compute_call is not None:
+                return await self.compute_call(self, request)
+
+            return await self.compute_result(request)
+        finally:
+            self.scheduler.release()
+
+    async def collect_jsonrpc_result(self, message: Optional[dict], request) -> Optional[dict]:
+        """
+        Collect a result given as asynchronous iterator into a list.
+
+        Errors raised while iterating are turned into an error response.
+        """
+        if not message or not is_async_iterable(message.get('result')):
+            return message
+
+        try:
+            message['result'] = [item async for item in message['result']]
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            return self.exception_to_jsonrpc(InternalError(str(error)), request)
+
+        return message
+
     def exception_to_jsonrpc(self, exception: JSONRPCError, request=None) -> dict:
         assert isinstance(exception, JSONRPCError)
 
@@ -121,13 +392,297 @@ class BasicJSONRPCHandler(RequestHandler):
         raise NotImplementedError("Handler does not create an result.")
 
 
+class BasicJSONRPCHandler(JSONRPCProcessor, RequestHandler):
+    stream_chunk_size = 64 * 1024
+
+    def initialize(self, version: Optional[str]=None,
+                   max_body_size: Optional[int]=None, **options):
+        self.setup_jsonrpc(version=version, **options)
+        self.max_body_size = max_body_size
+
+        self._body_chunks = []
+        self._body_size = 0
+
+    def get_client_id(self):
+        return self.request.remote_ip
+
+    def set_default_headers(self):
+        self.set_header('Content-Type', 'application/json')
+
+    def prepare(self):
+        if self.max_body_size is None:
+            return
+
+        # Handlers using stream_request_body get here before the body
+        # has been read. Everyone else at least skips decoding it.
+        content_length = self.request.headers.get('Content-Length')
+        if content_length is not None and int(content_length) > self.max_body_size:
+            self.reject_oversized_body()
+
+    def data_received(self, chunk: bytes) -> None:
+        # Only called for handlers decorated with stream_request_body.
+        if self._finished:
+            return
+
+        self._body_size += len(chunk)
+        if self.max_body_size is not None and self._body_size > self.max_body_size:
+            # The rest is discarded and the error written by post. Finishing
+            # while the body is still arriving makes Tornado 5.0 close the
+            # connection before the client reads the response.
+            self._body_chunks = []
+        else:
+            self._body_chunks.append(chunk)
+
+    def reject_oversized_body(self) -> None:
+        error = InvalidRequest(
+            "Request body exceeds the maximum size of {} bytes".format(self.max_body_size))
+        self.finish(self.exception_to_jsonrpc(error))
+
+    async def handle_jsonrpc(self, request) -> None:
+        if self._finished:  # Rejected early
+            return
+
+        if self.max_body_size is not None and len(request.body) > self.max_body_size:
+            self.reject_oversized_body()
+            return
+
+        if self.capture is None or not self.capture.sample():
+            await self.answer_jsonrpc_request(request)
+            return
+
+        arrival = time.time()
+        started = time.monotonic()
+        try:
+            await self.answer_jsonrpc_request(request)
+        finally:
+            self.capture.record_request(request.body, arrival, time.monotonic() - started)
+
+    async def answer_jsonrpc_request(self, request) -> None:
+        key = request.headers.get('Idempotency-Key')
+        if key is not None and self.idempotency is not None:
+            await self.replay_jsonrpc_request(request, key)
+            return
+
+        request = self.decode_jsonrpc_request(request)
+        if not request:
+            return
+
+        await self.process_jsonrpc_request(request)
+
+    async def replay_jsonrpc_request(self, request, key: str) -> None:
+        """
+        Answer a request with an Idempotency-Key header.
+
+        The encoded response to the first request with the key is written
+        for every later request with the same key and body.
+        """
+        async def compute():
+            message = await self.execute_jsonrpc(request.body)
+            response = '' if message is None else json_encode(message)
+            if is_retryable(message):
+                raise ResponseNotStored(response)
+
+            return response
+
+        fingerprint = hashlib.sha1(request.body).hexdigest()
+        try:
+            response = await self.idempotency.execute(
+                ('request', self.get_client_id(), request.path, key),
+                fingerprint, compute)
+        except ResponseNotStored as error:
+            response = error.response
+        except JSONRPCError as error:
+            self.write(self.exception_to_jsonrpc(error))
+            return
+
+        self.write(response)
+
+    def decode_jsonrpc_request(self, request):
+        try:
+            return self.decode(request.body,
+                               max_batch_size=self.max_batch_size,
+                               max_params_depth=self.max_params_depth,
+                               max_params_size=self.max_params_size)
+        except (InvalidRequest, ParseError, EmptyBatchRequest) as error:
+            self.write(self.exception_to_jsonrpc(error))
+
+    async def handle_jsonrpc_query(self) -> None:
+        """
+        Handle a single request given through the query arguments.
+
+        Only methods marked as idempotent can be called this way.
+        Their results are sent with an ETag computed from the result and
+        conditional requests are answered with 304 Not Modified.
+        """
+        request = self.decode_jsonrpc_query()
+        if not request:
+            return
+
+        method = self.get_method(request.method)
+        if method is None or not method.idempotent:
+            self.set_status(405)
+            self.set_header('Allow', 'POST')
+            error = InvalidRequest(
+                "Method {!r} can not be called through GET".format(request.method))
+            self.write(self.exception_to_jsonrpc(error, request))
+            return
+
+        message = await self.process_jsonrpc_single_request(request)
+        message = await self.collect_jsonrpc_result(message, request)
+        if not message:
+            return
+
+        if message.get('error') is None:
+            if method.cache_control:
+                self.set_header('Cache-Control', method.cache_control)
+
+            result = json_encode(message['result']).encode('utf-8')
+            self.set_header('Etag', '"{}"'.format(hashlib.sha1(result).hexdigest()))
+            if self.check_etag_header():
+                self.set_status(304)
+                return
+
+        self.write(message)
+
+    def decode_jsonrpc_query(self):
+        arguments = self.request.query_arguments
+        request = {name: self.get_query_argument(name)
+                   for name in ('jsonrpc', 'method') if name in arguments}
+        try:
+            for name in ('params', 'id'):
+                if name in arguments:
+                    request[name] = json_decode(self.get_query_argument(name))
+        except ValueError as error:
+            self.write(self.exception_to_jsonrpc(ParseError(str(error))))
+            return
+
+        process_request = get_request_processor(self.version)
+        request = process_request(request, max_params_depth=self.max_params_depth,
+                                  max_params_size=self.max_params_size)
+        if isinstance(request, JSONRPCError):
+            self.write(self.exception_to_jsonrpc(request))
+            return
+
+        return request
+
+    async def process_jsonrpc_request(self, request) -> None:
+        if isinstance(request, list):  # batch request
+            responses = await self.process_jsonrpc_batch_request(request)
+            if responses:
+                # Twisted won't write lists for security reasons
+                # see http://www.tornadoweb.org/en/stable/web.html#tornado.web.RequestHandler.write
+                self.write(json_encode(responses))
+        else:
+            message = await self.process_jsonrpc_single_request(request)
+            if message and is_async_iterable(message.get('result')):
+                await self.stream_jsonrpc_response(message)
+            elif message:
+                self.write(message)
+
+    async def stream_jsonrpc_response(self, message: dict) -> None:
+        """
+        Write a response with its result sent incrementally.
+
+        The result is an asynchronous iterator and will be sent as a list.
+        The first item is sent right away, after that data is sent once
+        `stream_chunk_size` bytes have been collected.
+        """
+        envelope = json_encode({key: value for key, value in message.items()
+                                if key != 'result'})
+        self.write(envelope[:-1] + ', "result": [')
+
+        result = message['result']
+        pending = 0
+        separator = ''
+        try:
+            async for item in result:
+                chunk = separator + json_encode(item)
+                self.write(chunk)
+                if not separator or pending + len(chunk) >= self.stream_chunk_size:
+                    pending = 0
+                    await self.flush()
+                else:
+                    pending += len(chunk)
+
+                separator = ', '
+        except StreamClosedError:
+            app_log.debug("Client disconnected while streaming the result for id %r",
+                          message.get('id'))
+            return
+        except Exception:
+            # The response has already been started. Closing the connection
+            # without finishing the response makes the failure obvious.
+            app_log.exception("Error while streaming the result for id %r",
+                              message.get('id'))
+            self.request.connection.stream.close()
+            return
+        finally:
+            # Lets the generator clean up if it was not exhausted.
+            aclose = getattr(result, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+        self.write(']}')
+
+
+def is_async_iterable(value) -> bool:
+    return hasattr(value, '__aiter__')
+
+
+def is_retryable(message) -> bool:
+    """
+    Check if a response or batch response contains an internal or server
+    error, which a retry of the call may not get.
+    """
+    messages = message if isinstance(message, list) else [message]
+    for message in messages:
+        error = message.get('error') if isinstance(message, dict) else None
+        code = error.get('code') if isinstance(error, dict) else None
+        if code == InternalError.error_code or (
+                isinstance(code, int) and -32099 <= code <= -32000):
+            return True
+
+    return False
+
+
 class JSONRPCHandler(BasicJSONRPCHandler):
-    def initialize(self, response_creator: Awaitable, version: Optional[str]=None):
-        super().initialize(version=version)
+    def initialize(self, response_creator: Awaitable, version: Optional[str]=None,
+                   allow_get: bool=False, **options):
+        super().initialize(version=version, **options)
         self.create_response = response_creator
+        self.allow_get = allow_get
+
+    async def get(self) -> None:
+        if not self.allow_get:
+            raise HTTPError(405)
+
+        await self.handle_jsonrpc_query()
 
     async def post(self) -> None:
         await self.handle_jsonrpc(self.request)
 
+    def get_method(self, name: str):
+        if isinstance(self.create_response, Dispatcher):
+            return self.create_response.get_method(name)
+
     async def compute_result(self, request) -> Any:
         return await self.create_response(request)
+
+
+@stream_request_body
+class StreamingJSONRPCHandler(JSONRPCHandler):
+    """
+    A `JSONRPCHandler` receiving the body in chunks.
+
+    Bodies larger than `max_body_size` are rejected without being kept in
+    memory. Bodies announced larger by their Content-Length are rejected
+    before being read.
+    """
+
+    async def post(self) -> None:
+        if self.max_body_size is not None and self._body_size > self.max_body_size:
+            self.reject_oversized_body()
+            return
+
+        self.request.body = b''.join(self._body_chunks)
+        await super().post()
@@ -0,0 +1,119 @@
+"""
+Replaying responses for retried calls.
+
+Clients give a call an ``idempotency_key`` member or an HTTP request an
+``Idempotency-Key`` header. Keys are scoped to the client. The first call
+with a key is computed and its encoded response is stored. Calls with the
+same key get the stored response, or wait for it while the first call is
+still running. Responses with internal or server errors are not stored,
+so a retry computes the call again.
+"""
+
+import asyncio
+import collections
+import time
+from typing import Awaitable, Callable, Hashable, Optional
+
+from tornado.concurrent import Future
+
+from .exceptions import InvalidRequest, ServerError
+
+__all__ = ('IdempotencyStore', 'ResponseNotStored')
+
+
+class ResponseNotStored(Exception):
+    """
+    Raised by `compute` to answer with `response` without storing it.
+    """
+
+    def __init__(self, response: Optional[str]):
+        super().__init__(response)
+        self.response = response
+
+
+class Entry:
+    __slots__ = ('fingerprint', 'future', 'expires')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.future = Future()
+        self.expires = None
+
+
+class IdempotencyStore:
+    """
+    Responses by idempotency key kept for `ttl` seconds.
+
+    At most `max_entries` responses are kept, the oldest are removed first.
+    A key reused for a different request is refused with `InvalidRequest`.
+    """
+
+    def __init__(self, max_entries: int=10000, ttl: float=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+
+    async def execute(self, key: Hashable, fingerprint,
+                      compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """
+        Get the response stored for `key` or store the one returned by `compute`.
+
+        `fingerprint` identifies the request and has to match for the
+        stored response to be returned. If `compute` fails the key is
+        released and the error is raised for every waiting call, like a
+        `ResponseNotStored` for a response that should not be replayed. If
+        it is cancelled the waiting calls get a `ServerError`.
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires is not None and entry.expires < time.monotonic():
+            del self.entries[key]
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise InvalidRequest("Idempotency key used for a different request")
+
+            if entry.future.done():
+                self.replayed += 1
+            else:
+                self.waited += 1
+
+            # A waiting call going away must not cancel the first one.
+            return await asyncio.shield(entry.future)
+
+        entry = self.entries[key] = Entry(fingerprint)
+        self.executed += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        try:
+            response = await compute()
+        except BaseException as error:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+
+            if isinstance(error, asyncio.CancelledError):
+                # Waiting calls answer with an error instead of being
+                # cancelled themselves.
+                error = ServerError("Call with the same idempotency key was cancelled")
+
+            entry.future.set_exception(error)
+            # Nobody may be waiting for it.
+            entry.future.exception()
+            raise
+
+        entry.expires = time.monotonic() + self.ttl
+        entry.future.set_result(response)
+        return response
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries),
+                "executed": self.executed,
+                "replayed": self.replayed,
+                "waited": self.waited,
+                "conflicts": self.conflicts}
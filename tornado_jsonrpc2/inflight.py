@@ -0,0 +1,184 @@
+"""
+Calls currently being answered.
+
+Handlers configured with an `InFlightRegistry` register every call while
+it is answered. The `InFlightAdminHandler` lists these calls oldest first,
+counts them per method and cancels calls that are stuck. A cancelled call
+is answered with a server error, other calls of the same batch are not
+affected.
+"""
+
+import itertools
+import time
+from typing import Callable, List, Optional
+
+from tornado.web import HTTPError, RequestHandler
+
+from .compat import current_task
+from .exceptions import ServerError
+
+__all__ = ('CallCancelled', 'InFlightAdminHandler', 'InFlightCall', 'InFlightRegistry')
+
+
+class CallCancelled(ServerError):
+    pass
+
+
+class InFlightCall:
+    """
+    A call being answered by `task`.
+    """
+
+    __slots__ = ('id', 'method', 'request_id', 'client', 'batch_index',
+                 'started', 'task', 'cancelled')
+
+    def __init__(self, id: int, request, client, started: float):
+        self.id = id
+        self.method = getattr(request, 'method', None)
+        self.request_id = getattr(request, 'id', None)
+        self.batch_index = getattr(request, 'batch_index', None)
+        self.client = client
+        self.started = started
+        self.task = current_task()
+        self.cancelled = False
+
+    def to_dict(self, now: float) -> dict:
+        return {"id": self.id,
+                "method": self.method,
+                "request_id": self.request_id,
+                "client": self.client,
+                "batch_index": self.batch_index,
+                "age": now - self.started,
+                "cancelled": self.cancelled}
+
+
+class InFlightRegistry:
+    """
+    The calls being answered by the handlers using this registry.
+    """
+
+    def __init__(self, clock: Callable[[], float]=time.monotonic):
+        self.clock = clock
+        # Calls are added when they start, so they are kept oldest first.
+        self.calls = {}
+        self.registered = 0
+        self.cancelled = 0
+        self._ids = itertools.count(1)
+
+    def register(self, request, client=None) -> InFlightCall:
+        call = InFlightCall(next(self._ids), request, client, self.clock())
+        self.calls[call.id] = call
+        self.registered += 1
+        return call
+
+    def unregister(self, call: InFlightCall) -> None:
+        self.calls.pop(call.id, None)
+
+    def find(self, method: Optional[str]=None,
+             min_age: Optional[float]=None) -> List[InFlightCall]:
+        """
+        Get the calls of `method` running for at least `min_age` seconds,
+        oldest first.
+        """
+        now = self.clock()
+        return [call for call in self.calls.values()
+                if (method is None or call.method == method) and
+                (min_age is None or now - call.started >= min_age)]
+
+    def list(self, method: Optional[str]=None, min_age: Optional[float]=None) -> List[dict]:
+        now = self.clock()
+        return [call.to_dict(now) for call in self.find(method, min_age)]
+
+    def aggregate(self) -> dict:
+        """
+        Get the number of calls and the age of the oldest call per method.
+        """
+        now = self.clock()
+        methods = {}
+        for call in self.calls.values():
+            stats = methods.get(call.method)
+            if stats is None:
+                methods[call.method] = {"count": 1, "oldest": now - call.started}
+            else:
+                stats["count"] += 1
+
+        return methods
+
+    def cancel(self, call: InFlightCall) -> bool:
+        """
+        Cancel `call`. Returns if it was not cancelled before.
+        """
+        if call.cancelled or call.task is None:
+            return False
+
+        call.cancelled = True
+        call.task.cancel()
+        self.cancelled += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.calls),
+                "registered": self.registered,
+                "cancelled": self.cancelled}
+
+
+class InFlightAdminHandler(RequestHandler):
+    """
+    Listing and cancelling the calls of an `InFlightRegistry`.
+
+    GET lists the calls oldest first and counts them per method.
+    DELETE cancels the call with the id given in the path or all calls
+    matching the query. Both take the query arguments `method` and
+    `min_age` in seconds to select calls.
+
+    The handler should only be reachable by operators::
+
+        (r"/admin/calls(?:/(\\d+))?", InFlightAdminHandler, {"registry": registry})
+    """
+
+    def initialize(self, registry: InFlightRegistry):
+        self.registry = registry
+
+    def set_default_headers(self):
+        self.set_header('Content-Type', 'application/json')
+
+    def get(self, call_id: Optional[str]=None) -> None:
+        if call_id is not None:
+            call = self.get_call(call_id)
+            self.write(call.to_dict(self.registry.clock()))
+            return
+
+        method, min_age = self.get_filters()
+        self.write({"calls": self.registry.list(method, min_age),
+                    "methods": self.registry.aggregate()})
+
+    def delete(self, call_id: Optional[str]=None) -> None:
+        if call_id is not None:
+            calls = [self.get_call(call_id)]
+        else:
+            method, min_age = self.get_filters()
+            if method is None and min_age is None:
+                raise HTTPError(400, "Select calls by method or min_age")
+
+            calls = self.registry.find(method, min_age)
+
+        cancelled = [call.id for call in calls if self.registry.cancel(call)]
+        self.write({"cancelled": cancelled})
+
+    def get_call(self, call_id: str) -> InFlightCall:
+        call = self.registry.calls.get(int(call_id))
+        if call is None:
+            raise HTTPError(404)
+
+        return call
+
+    def get_filters(self) -> tuple:
+        method = self.get_query_argument('method', None)
+        min_age = self.get_query_argument('min_age', None)
+        if min_age is not None:
+            try:
+                min_age = float(min_age)
+            except ValueError:
+                raise HTTPError(400, "Invalid min_age")
+
+        return method, min_age
@@ -1,62 +1,204 @@
+import functools
 import json
-from typing import Optional
+from typing import Callable, Optional
 
-from tornado.escape import json_decode
-from .exceptions import InvalidRequest, ParseError, EmptyBatchRequest
+from tornado.escape import json_decode, json_encode
+from .exceptions import InvalidRequest, InvalidParams, ParseError, EmptyBatchRequest
+from .lazyjson import RawParams, loads as lazy_loads
 
 __all__ = ('decode', )
 
 SUPPORTED_VERSIONS = {'2.0', '1.0'}
 
 
-def decode(request: str, version: Optional[str]=None):
+def decode(request: str, version: Optional[str]=None,
+           max_batch_size: Optional[int]=None,
+           max_params_depth: Optional[int]=None,
+           max_params_size: Optional[int]=None,
+           lazy_params: bool=False):
+    decoder = get_decoder(version, lazy_params=lazy_params)
+    return decoder(request, max_batch_size=max_batch_size,
+                   max_params_depth=max_params_depth,
+                   max_params_size=max_params_size)
+
+
+def get_decoder(version: Optional[str]=None, lazy_params: bool=False) -> Callable:
+    """
+    Get a decode function for the given version.
+
+    For the supported versions the function is specialised to only
+    create requests of that version and refuse everything else.
+
+    With `lazy_params` the params of the requests are kept encoded until
+    they are accessed. Limits for params are checked at that time.
+    """
+    decoders = LAZY_DECODERS if lazy_params else DECODERS
     try:
-        obj = json_decode(request)
-    except json.JSONDecodeError as jsonError:
-        raise ParseError(str(jsonError))
+        return decoders[version]
+    except KeyError:
+        return make_decoder(get_request_processor(version),
+                            loads=lazy_loads if lazy_params else json_decode)
 
-    if isinstance(obj, list):  # Batch request
-        requests = [process_request(data, version=version) for data in obj]
-        if not requests:
-            raise EmptyBatchRequest("Empty batch request")
 
-        return requests
-    else:  # Single request
-        request = process_request(obj, version=version)
-        if isinstance(request, Exception):
-            raise request
+def get_request_processor(version: Optional[str]=None) -> Callable:
+    """
+    Get a function creating a request object from a decoded request.
 
-        return request
+    For the supported versions the function is pinned to that version.
+    """
+    try:
+        return PROCESSORS[version]
+    except KeyError:
+        return functools.partial(process_request, version=version)
 
 
-def process_request(request: dict, version: Optional[str]=None):
+def make_decoder(process: Callable, loads: Callable=json_decode) -> Callable:
+    """
+    Create a decode function using `process` to create request objects.
+    """
+    def decode(request: str, max_batch_size: Optional[int]=None,
+               max_params_depth: Optional[int]=None,
+               max_params_size: Optional[int]=None):
+        try:
+            obj = loads(request)
+        except json.JSONDecodeError as jsonError:
+            raise ParseError(str(jsonError))
+
+        if isinstance(obj, list):  # Batch request
+            if max_batch_size is not None and len(obj) > max_batch_size:
+                # Checked before any request object gets created.
+                raise InvalidRequest(
+                    "Batch request exceeds the maximum size of {} requests".format(max_batch_size))
+
+            requests = [process(data, max_params_depth=max_params_depth,
+                                max_params_size=max_params_size)
+                        for data in obj]
+            if not requests:
+                raise EmptyBatchRequest("Empty batch request")
+
+            for index, request in enumerate(requests):
+                if isinstance(request, JSONRPCStyleRequest):
+                    request.batch_index = index
+
+            return requests
+        else:  # Single request
+            request = process(obj, max_params_depth=max_params_depth,
+                              max_params_size=max_params_size)
+            if isinstance(request, Exception):
+                raise request
+
+            return request
+
+    return decode
+
+
+def process_request(request: dict, version: Optional[str]=None,
+                    max_params_depth: Optional[int]=None,
+                    max_params_size: Optional[int]=None):
     try:
         request_version = request.get('jsonrpc', '1.0')
         if version is not None and request_version != version:
             raise InvalidRequest("Refusing to handle version {}".format(request_version))
 
+        if max_params_depth is not None or max_params_size is not None:
+            check_params(request.get('params'), max_depth=max_params_depth,
+                         max_size=max_params_size)
+
         if request_version == '2.0':
             return JSONRPC2Request(**request)
         elif request_version == '1.0':
             return JSONRPC1Request(**request)
         elif request_version not in SUPPORTED_VERSIONS:
             return JSONRPCRequest(**request)
-    except KeyError as kerr:
-        return InvalidRequest('Missing member {!s}'.format(kerr),
-                              JSONRPCStyleRequest(**request))
-    except InvalidRequest as inverr:
-        return InvalidRequest(str(inverr), JSONRPCStyleRequest(**request))
     except Exception as err:
-        return InvalidRequest(str(err))
+        return invalid_request(err, request)
+
+
+def make_request_processor(version: str, request_class: type) -> Callable:
+    """
+    Create a function like `process_request` that is pinned to `version`.
+
+    Requests of other versions are refused without further inspection.
+    """
+    def process_request(request: dict,
+                        max_params_depth: Optional[int]=None,
+                        max_params_size: Optional[int]=None):
+        try:
+            if request.get('jsonrpc', '1.0') != version:
+                raise InvalidRequest("Refusing to handle version {}".format(
+                    request.get('jsonrpc', '1.0')))
+
+            if max_params_depth is not None or max_params_size is not None:
+                check_params(request.get('params'), max_depth=max_params_depth,
+                             max_size=max_params_size)
+
+            return request_class(**request)
+        except Exception as err:
+            return invalid_request(err, request)
+
+    return process_request
+
+
+def invalid_request(error: Exception, request) -> InvalidRequest:
+    if isinstance(error, KeyError):
+        return InvalidRequest('Missing member {!s}'.format(error),
+                              JSONRPCStyleRequest(**request))
+    elif isinstance(error, InvalidRequest):
+        return InvalidRequest(str(error), JSONRPCStyleRequest(**request))
+    else:
+        return InvalidRequest(str(error))
+
+
+def check_params(params, max_depth: Optional[int]=None,
+                 max_size: Optional[int]=None) -> None:
+    """
+    Check that params do not nest too deep or hold too many values.
+
+    The depth of a list or dict given as params is 1.
+    The size is the number of values contained at all levels.
+    Raises `InvalidRequest` as soon as a limit is exceeded.
+
+    Encoded params will be checked once they get decoded.
+    """
+    if isinstance(params, RawParams):
+        params.max_depth = max_depth
+        params.max_size = max_size
+        return
+
+    size = 0
+    stack = [(params, 1)]
+    while stack:
+        value, depth = stack.pop()
+        if isinstance(value, dict):
+            children = value.values()
+        elif isinstance(value, list):
+            children = value
+        else:
+            continue
+
+        if max_depth is not None and depth > max_depth:
+            raise InvalidRequest(
+                "Params exceed the maximum depth of {}".format(max_depth))
+
+        size += len(children)
+        if max_size is not None and size > max_size:
+            raise InvalidRequest(
+                "Params exceed the maximum size of {} values".format(max_size))
+
+        stack.extend((child, depth + 1) for child in children
+                     if isinstance(child, (dict, list)))
 
 
 class JSONRPCStyleRequest:
+    # Position of the request in its batch, `None` for single requests.
+    batch_index = None
 
     def __init__(self, **kwargs):
         self._id = kwargs.get('id')
         self._method = kwargs.get('method')
         self._params = kwargs.get('params')
         self._version = kwargs.get('jsonrpc', '1.0')
+        self._idempotency_key = kwargs.get('idempotency_key')
 
     @property
     def id(self):
@@ -74,6 +216,10 @@ class JSONRPCStyleRequest:
     def version(self) -> str:
         return self._version
 
+    @property
+    def idempotency_key(self) -> Optional[str]:
+        return self._idempotency_key
+
 
 class JSONRPCRequest(JSONRPCStyleRequest):
     """
@@ -105,8 +251,29 @@ class JSONRPCRequest(JSONRPCStyleRequest):
         if self._params is None:
             raise AttributeError("No params given.")
 
+        if isinstance(self._params, RawParams):
+            self._params = decode_params(self._params)
+
         return self._params
 
+    @params.setter
+    def params(self, value) -> None:
+        self._params = value
+
+    @property
+    def raw_params(self) -> Optional[str]:
+        """
+        The params encoded as JSON.
+
+        Params that have not been decoded yet are returned as received.
+        """
+        if self._params is None:
+            return None
+        elif isinstance(self._params, RawParams):
+            return self._params.raw
+
+        return json_encode(self._params)
+
     def validate(self) -> None:
         if self.version not in SUPPORTED_VERSIONS:
             raise InvalidRequest("Unsupported JSONRPC version!")
@@ -126,9 +293,11 @@ class JSONRPC1Request(JSONRPCRequest):
             self._is_notification = True
 
     def validate(self) -> None:
-        super().validate()
+        # The version is known to be supported and needs no check.
+        if not isinstance(self._method, str):
+            raise InvalidRequest('"method" must be a string!')
 
-        if not isinstance(self._params, list):
+        if not params_isinstance(self._params, list):
             raise InvalidRequest('Invalid type for "params"!')
 
 
@@ -140,9 +309,44 @@ class JSONRPC2Request(JSONRPCRequest):
             self._is_notification = True
 
     def validate(self) -> None:
-        super().validate()
+        # The version is known to be supported and needs no check.
+        if not isinstance(self._method, str):
+            raise InvalidRequest('"method" must be a string!')
 
         if (self._params is not None and
-           not isinstance(self._params, (list, dict))):
+           not params_isinstance(self._params, (list, dict))):
 
             raise InvalidRequest('Invalid type for "params"!')
+
+
+def params_isinstance(params, types) -> bool:
+    if isinstance(params, RawParams):
+        return issubclass(params.type, types)
+
+    return isinstance(params, types)
+
+
+def decode_params(params: RawParams):
+    try:
+        value = json_decode(params.raw)
+    except json.JSONDecodeError as jsonError:
+        raise InvalidParams(str(jsonError))
+
+    if params.max_depth is not None or params.max_size is not None:
+        try:
+            check_params(value, max_depth=params.max_depth, max_size=params.max_size)
+        except InvalidRequest as error:
+            raise InvalidParams(str(error))
+
+    return value
+
+
+PROCESSORS = {
+    None: process_request,
+    '1.0': make_request_processor('1.0', JSONRPC1Request),
+    '2.0': make_request_processor('2.0', JSONRPC2Request),
+}
+
+DECODERS = {version: make_decoder(process) for version, process in PROCESSORS.items()}
+LAZY_DECODERS = {version: make_decoder(process, loads=lazy_loads)
+                 for version, process in PROCESSORS.items()}
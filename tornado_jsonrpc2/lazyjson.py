@@ -0,0 +1,147 @@
+"""
+Decoding requests while keeping their params encoded.
+
+`loads` works like `json.loads` for JSON-RPC requests but puts a
+`RawParams` in place of params given as list or object.
+Their content is only skipped over and not decoded.
+Everything else in the document is decoded as usual.
+"""
+
+import json
+import re
+
+__all__ = ('loads', 'RawParams')
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+STRUCTURE = re.compile(r'["\[\]{}]')
+STRING_REST = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+
+_decoder = json.JSONDecoder()
+_scanstring = json.decoder.scanstring
+
+
+class RawParams:
+    """
+    Params of a request kept as encoded JSON.
+
+    `type` is the type the params will have once decoded.
+    """
+
+    __slots__ = ('raw', 'type', 'max_depth', 'max_size')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.type = list if raw[0] == '[' else dict
+        self.max_depth = None
+        self.max_size = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.raw)
+
+
+def loads(text):
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+
+    index = _skip_whitespace(text, 0)
+    if text.startswith('[', index):
+        value, end = _parse_batch(text, index)
+    else:
+        value, end = _parse_element(text, index)
+
+    end = _skip_whitespace(text, end)
+    if end != len(text):
+        raise json.JSONDecodeError("Extra data", text, end)
+
+    return value
+
+
+def skip_value(text: str, index: int) -> int:
+    """
+    Get the index after the list or object starting at `index`.
+
+    Only strings and brackets are looked at, the content is not checked.
+    """
+    depth = 0
+    while True:
+        match = STRUCTURE.search(text, index)
+        if match is None:
+            raise json.JSONDecodeError("Unterminated value", text, index)
+
+        char = match.group()
+        index = match.end()
+        if char == '"':
+            match = STRING_REST.match(text, index)
+            if match is None:
+                raise json.JSONDecodeError("Unterminated string", text, index)
+
+            index = match.end()
+        elif char in '[{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return index
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    return WHITESPACE.match(text, index).end()
+
+
+def _parse_element(text: str, index: int):
+    if text.startswith('{', index):
+        return _parse_request(text, index)
+
+    return _decoder.raw_decode(text, index)
+
+
+def _parse_batch(text: str, index: int):
+    requests = []
+    index = _skip_whitespace(text, index + 1)
+    if text.startswith(']', index):
+        return requests, index + 1
+
+    while True:
+        value, index = _parse_element(text, index)
+        requests.append(value)
+
+        index = _skip_whitespace(text, index)
+        if text.startswith(',', index):
+            index = _skip_whitespace(text, index + 1)
+        elif text.startswith(']', index):
+            return requests, index + 1
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+
+
+def _parse_request(text: str, index: int):
+    request = {}
+    index = _skip_whitespace(text, index + 1)
+    if text.startswith('}', index):
+        return request, index + 1
+
+    while True:
+        if not text.startswith('"', index):
+            raise json.JSONDecodeError(
+                "Expecting property name enclosed in double quotes", text, index)
+
+        key, index = _scanstring(text, index + 1)
+        index = _skip_whitespace(text, index)
+        if not text.startswith(':', index):
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, index)
+
+        index = _skip_whitespace(text, index + 1)
+        if key == 'params' and text[index:index + 1] in ('[', '{'):
+            end = skip_value(text, index)
+            request[key] = RawParams(text[index:end])
+            index = end
+        else:
+            request[key], index = _decoder.raw_decode(text, index)
+
+        index = _skip_whitespace(text, index)
+        if text.startswith(',', index):
+            index = _skip_whitespace(text, index + 1)
+        elif text.startswith('}', index):
+            return request, index + 1
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
@@ -0,0 +1,289 @@
+"""
+Generating load against JSON-RPC endpoints.
+
+Run ``python -m tornado_jsonrpc2.loadtest --help`` for the options.
+
+In closed-loop mode a fixed number of clients send their next request once
+the previous one was answered. In open-loop mode requests are started at a
+fixed rate regardless of how fast they are answered. Latencies in open-loop
+mode are measured from the time a request was due to be sent so that a
+slow server can not hide its delays.
+
+The results are written as JSON.
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPError
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+
+from .measure import Histogram, count_errors, load_app
+
+__all__ = ('Histogram', 'LoadTest', 'PayloadMix', 'main', 'run')
+
+
+class PayloadMix:
+    """
+    Producing request bodies by a weighted mix of kinds.
+
+    `weights` maps "single", "batch" and "notification" to their share.
+    Every request uses one of `versions` chosen at random.
+    Batches contain `batch_size` calls.
+    """
+
+    KINDS = ('single', 'batch', 'notification')
+
+    def __init__(self, method: str, params=None, weights: Optional[Dict[str, float]]=None,
+                 batch_size: int=10, versions: Tuple[str, ...]=('2.0', ),
+                 seed: Optional[int]=None):
+        weights = weights or {'single': 1}
+        unknown = set(weights) - set(self.KINDS)
+        if unknown:
+            raise ValueError("Unknown payload kinds {}".format(', '.join(sorted(unknown))))
+
+        self.method = method
+        self.params = params
+        self.kinds = list(weights)
+        self.weights = [weights[kind] for kind in self.kinds]
+        self.batch_size = batch_size
+        self.versions = versions
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+
+    def next(self) -> Tuple[bytes, str, int]:
+        """
+        Get the next body, its kind and the number of calls in it.
+        """
+        kind = self._random.choices(self.kinds, self.weights)[0]
+        version = self._random.choice(self.versions)
+        if kind == 'batch':
+            body = [self.call(version) for _ in range(self.batch_size)]
+            calls = self.batch_size
+        else:
+            body = self.call(version, notification=(kind == 'notification'))
+            calls = 1
+
+        return json.dumps(body).encode('utf-8'), kind, calls
+
+    def call(self, version: str, notification: bool=False) -> dict:
+        call = {"method": self.method}
+        if version == '1.0':
+            call["params"] = self.params if self.params is not None else []
+            call["id"] = None if notification else next(self._ids)
+        else:
+            call["jsonrpc"] = version
+            if self.params is not None:
+                call["params"] = self.params
+            if not notification:
+                call["id"] = next(self._ids)
+
+        return call
+
+
+class LoadTest:
+    """
+    Sending requests produced by `payloads` to `url` and recording the results.
+    """
+
+    def __init__(self, url: str, payloads: PayloadMix, timeout: float=30):
+        self.url = url
+        self.payloads = payloads
+        self.timeout = timeout
+        self.histogram = Histogram()
+        self.failed_histogram = Histogram()
+        self.kinds = collections.Counter()
+        self.requests = 0
+        self.calls = 0
+        self.errors = 0
+        self.failures = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+        self.client = None
+
+    async def send(self, started: float) -> None:
+        body, kind, calls = self.payloads.next()
+        try:
+            response = await self.client.fetch(
+                self.url, method='POST', body=body,
+                headers={'Content-Type': 'application/json'},
+                request_timeout=self.timeout)
+        except (HTTPError, OSError):
+            self.failures += 1
+            self.failed_histogram.record(time.monotonic() - started)
+            return
+
+        self.histogram.record(time.monotonic() - started)
+        self.requests += 1
+        self.calls += calls
+        self.kinds[kind] += 1
+        self.errors += count_errors(response.body)
+
+    async def run_closed(self, concurrency: int, duration: float) -> dict:
+        """
+        Keep `concurrency` requests running for `duration` seconds.
+        """
+        self.client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+        start = time.monotonic()
+        deadline = start + duration
+
+        async def worker():
+            while time.monotonic() < deadline:
+                await self.send(time.monotonic())
+
+        try:
+            await gen.multi([worker() for _ in range(concurrency)])
+        finally:
+            self.client.close()
+
+        self.elapsed = time.monotonic() - start
+        return self.results(mode='closed', concurrency=concurrency)
+
+    async def run_open(self, rate: float, duration: float,
+                       max_outstanding: int=1000) -> dict:
+        """
+        Start `rate` requests per second for `duration` seconds.
+
+        Requests due while `max_outstanding` requests are running are
+        skipped and counted.
+        """
+        self.client = AsyncHTTPClient(force_instance=True, max_clients=max_outstanding)
+        start = time.monotonic()
+        outstanding = set()
+        try:
+            for index in itertools.count():
+                if index / rate >= duration:
+                    break
+
+                due = start + index / rate
+
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await gen.sleep(delay)
+
+                if len(outstanding) >= max_outstanding:
+                    self.skipped += 1
+                    continue
+
+                future = gen.convert_yielded(self.send(due))
+                outstanding.add(future)
+                future.add_done_callback(outstanding.discard)
+
+            if outstanding:
+                await gen.multi(list(outstanding))
+        finally:
+            self.client.close()
+
+        self.elapsed = time.monotonic() - start
+        return self.results(mode='open', rate=rate)
+
+    def results(self, **settings) -> dict:
+        elapsed = self.elapsed or 1.0
+        return dict(settings,
+                    url=self.url,
+                    duration=self.elapsed,
+                    requests=self.requests,
+                    calls=self.calls,
+                    kinds=dict(self.kinds),
+                    errors=self.errors,
+                    failures=self.failures,
+                    skipped=self.skipped,
+                    throughput={"requests": self.requests / elapsed,
+                                "calls": self.calls / elapsed},
+                    latency=self.histogram.to_dict(),
+                    failed_latency=self.failed_histogram.to_dict())
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    weights = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        try:
+            weights[kind.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError("Invalid weight {!r}".format(weight))
+
+    return weights
+
+
+def parse_args(argv: Optional[List[str]]=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m tornado_jsonrpc2.loadtest',
+        description="Generate load against a JSON-RPC endpoint.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help="URL of the endpoint")
+    target.add_argument('--app', metavar='MODULE:FACTORY',
+                        help="Start the application returned by FACTORY in "
+                             "this process and target it")
+    parser.add_argument('--path', default='/jsonrpc',
+                        help="Path of the endpoint when using --app")
+    parser.add_argument('--method', default='subtract')
+    parser.add_argument('--params', type=json.loads, default=None,
+                        help="Params as JSON")
+    parser.add_argument('--mix', type=parse_mix, default={'single': 1},
+                        help="Weights of single, batch and notification "
+                             "requests, e.g. single=8,batch=1,notification=1")
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--versions', default='2.0',
+                        help="Comma separated JSON-RPC versions to mix")
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help="Clients in closed-loop mode")
+    parser.add_argument('--rate', type=float,
+                        help="Requests per second, enables open-loop mode")
+    parser.add_argument('--max-outstanding', type=int, default=1000,
+                        help="Running requests in open-loop mode")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--output', help="Write the results to this file")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    server = None
+    url = args.url
+    if args.app:
+        server = HTTPServer(load_app(args.app)())
+        sockets = bind_sockets(0, '127.0.0.1')
+        server.add_sockets(sockets)
+        port = sockets[0].getsockname()[1]
+        url = 'http://127.0.0.1:{}{}'.format(port, args.path)
+
+    payloads = PayloadMix(args.method, args.params, weights=args.mix,
+                          batch_size=args.batch_size,
+                          versions=tuple(args.versions.split(',')),
+                          seed=args.seed)
+    test = LoadTest(url, payloads, timeout=args.timeout)
+    try:
+        if args.rate:
+            return await test.run_open(args.rate, args.duration,
+                                       max_outstanding=args.max_outstanding)
+        else:
+            return await test.run_closed(args.concurrency, args.duration)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+def main(argv: Optional[List[str]]=None) -> None:
+    args = parse_args(argv)
+    results = IOLoop.current().run_sync(lambda: run(args))
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Measuring latencies and answers for the load generator and the replay.
+
+This only uses the standard library so that it can be imported without
+the HTTP client and server.
+"""
+
+import collections
+import importlib
+import json
+import math
+from typing import Callable
+
+__all__ = ('PERCENTILES', 'Histogram', 'count_errors', 'load_app')
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Histogram:
+    """
+    Latencies recorded with a bounded relative error.
+
+    Values are kept in microseconds in buckets whose width grows with the
+    value so that every bucket is at most 2 ** -(`precision` - 1) of its
+    value wide, like an HDR histogram.
+    """
+
+    def __init__(self, precision: int=7):
+        self.precision = precision
+        self.counts = collections.Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float) -> None:
+        value = max(0, int(seconds * 1000000))
+        shift = max(0, value.bit_length() - self.precision)
+        self.counts[(shift, value >> shift)] += 1
+
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Get the latency in seconds below which `percent` of the values lie.
+        """
+        if not self.count:
+            return 0.0
+
+        target = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for (shift, mantissa) in sorted(self.counts):
+            seen += self.counts[(shift, mantissa)]
+            if seen >= target:
+                upper = ((mantissa + 1) << shift) - 1
+                return min(upper, self.max) / 1000000
+
+        return self.max / 1000000
+
+    def to_dict(self) -> dict:
+        """
+        Summarize the histogram with latencies in milliseconds.
+        """
+        if not self.count:
+            return {"count": 0}
+
+        return {"count": self.count,
+                "min": self.min / 1000,
+                "max": self.max / 1000,
+                "mean": self.total / self.count / 1000,
+                "percentiles": {str(percent): self.percentile(percent) * 1000
+                                for percent in PERCENTILES}}
+
+
+def count_errors(body: bytes) -> int:
+    if not body:
+        return 0
+
+    try:
+        response = json.loads(body.decode('utf-8'))
+    except ValueError:
+        return 1
+
+    if not isinstance(response, list):
+        response = [response]
+
+    return sum(1 for message in response
+               if not isinstance(message, dict) or message.get('error') is not None)
+
+
+def load_app(spec: str) -> Callable:
+    module_name, _, factory = spec.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, factory or 'make_app')
@@ -0,0 +1,151 @@
+"""
+Tracking memory allocated by methods.
+
+The `AllocationTracker` middleware measures sampled calls with
+`tracemalloc`: the bytes still allocated after the call, the peak while
+it ran and, optionally, the code allocating the most.
+
+Memory is traced for the whole process, so allocations made by other
+coroutines while a sampled call waits are counted for it as well.
+Only one call is measured at a time and tracing is only active while
+it runs, unless it was started elsewhere.
+"""
+
+import collections
+import random
+import tracemalloc
+from typing import Optional
+
+from .middleware import Middleware
+
+__all__ = ('AllocationTracker', )
+
+
+class AllocationTracker(Middleware):
+    """
+    Measuring allocations of a share of `sample_rate` of the calls.
+
+    `track_next` measures the next calls regardless of the sample rate.
+    With `top_sites` the allocation sites are compared before and after
+    the call, which is expensive, and the biggest are kept per method.
+    `frames` is the depth of the traceback stored per allocation.
+    """
+
+    def __init__(self, sample_rate: float=0.0, top_sites: int=0, frames: int=1):
+        self.sample_rate = sample_rate
+        self.top_sites = top_sites
+        self.frames = frames
+        self.methods = {}
+        self.skipped = 0
+
+        self._requested = 0
+        self._active = False
+        self._random = random.random
+
+    def track_next(self, calls: int=1) -> None:
+        self._requested += calls
+
+    def should_track(self) -> bool:
+        if self._requested:
+            return True
+
+        return self.sample_rate > 0 and self._random() < self.sample_rate
+
+    async def around_call(self, handler, request, call_next):
+        if not self.should_track():
+            return await call_next(request)
+
+        if self._active:
+            self.skipped += 1
+            return await call_next(request)
+
+        if self._requested:
+            self._requested -= 1
+
+        self._active = True
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.frames)
+
+        try:
+            before = self.take_snapshot()
+            reset_peak = getattr(tracemalloc, 'reset_peak', None)
+            if reset_peak is not None:
+                reset_peak()
+
+            current, _ = tracemalloc.get_traced_memory()
+            try:
+                return await call_next(request)
+            finally:
+                after, peak = tracemalloc.get_traced_memory()
+                if reset_peak is None:
+                    # Without reset_peak the peak may be from before the call.
+                    peak = None
+                else:
+                    peak -= current
+
+                sites = self.compare(before, self.take_snapshot())
+                self.record(request.method, after - current, peak, sites)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+            self._active = False
+
+    def take_snapshot(self) -> Optional[tracemalloc.Snapshot]:
+        if not self.top_sites:
+            return None
+
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),
+             tracemalloc.Filter(False, __file__)))
+
+    def compare(self, before, after) -> list:
+        if before is None:
+            return []
+
+        sites = []
+        for diff in after.compare_to(before, 'lineno'):
+            if diff.size_diff <= 0:
+                continue
+
+            frame = diff.traceback[0]
+            sites.append(('{}:{}'.format(frame.filename, frame.lineno), diff.size_diff))
+            if len(sites) >= self.top_sites:
+                break
+
+        return sites
+
+    def record(self, method, net: int, peak: Optional[int], sites: list) -> None:
+        stats = self.methods.get(method)
+        if stats is None:
+            stats = self.methods[method] = {
+                "calls": 0, "net_total": 0, "net_max": None,
+                "peak_total": 0, "peak_max": None, "sites": collections.Counter()}
+
+        stats["calls"] += 1
+        stats["net_total"] += net
+        stats["net_max"] = net if stats["net_max"] is None else max(stats["net_max"], net)
+        if peak is not None:
+            stats["peak_total"] += peak
+            stats["peak_max"] = peak if stats["peak_max"] is None else max(stats["peak_max"], peak)
+
+        for site, size in sites:
+            stats["sites"][site] += size
+
+    def stats(self) -> dict:
+        """
+        Get the allocations per method in bytes.
+
+        Sites are the allocation sites with the most bytes allocated over
+        all measured calls.
+        """
+        return {"skipped": self.skipped,
+                "methods": {
+                    method: {"calls": stats["calls"],
+                             "net_mean": stats["net_total"] / stats["calls"],
+                             "net_max": stats["net_max"],
+                             "peak_mean": stats["peak_total"] / stats["calls"],
+                             "peak_max": stats["peak_max"],
+                             "sites": stats["sites"].most_common(self.top_sites)}
+                    for method, stats in self.methods.items()}}
@@ -0,0 +1,133 @@
+"""
+Middleware wrapping the computation of calls.
+
+A `Middleware` implements some of the hooks `pre_dispatch`, `around_call`,
+`post_response` and `on_error`. A `Pipeline` is created once from a list of
+middleware and flattens the hooks into a single callable. Hooks not
+implemented by any middleware do not cost anything per call.
+"""
+
+from typing import Awaitable, Callable, List, Optional
+
+__all__ = ('Middleware', 'Pipeline')
+
+
+class Middleware:
+    """
+    Base class of middleware. Only implemented hooks are called.
+    """
+
+    async def pre_dispatch(self, handler, request) -> None:
+        """
+        Called before the call is computed.
+
+        Raise a `JSONRPCError` to refuse the call.
+        """
+
+    async def around_call(self, handler, request, call_next: Callable[..., Awaitable]):
+        """
+        Compute the result of the call by awaiting `call_next(request)`.
+
+        The result returned here is used as the result of the call.
+        """
+
+    async def post_response(self, handler, request, message: Optional[dict]) -> Optional[dict]:
+        """
+        Called with the response to the call, `None` for notifications.
+
+        The returned message is sent instead.
+        """
+
+    async def on_error(self, handler, request, error: Exception) -> None:
+        """
+        Called if computing the call raised `error`.
+
+        Raise another exception to replace the error.
+        """
+
+
+def implements(middleware: Middleware, hook: str) -> bool:
+    return getattr(type(middleware), hook, None) is not getattr(Middleware, hook)
+
+
+async def compute(handler, request):
+    return await handler.compute_result(request)
+
+
+def with_around(hook: Callable, call_next: Callable) -> Callable:
+    async def call(handler, request):
+        return await hook(handler, request, lambda request: call_next(handler, request))
+
+    return call
+
+
+def with_pre_dispatch(hooks: List[Callable], call_next: Callable) -> Callable:
+    async def call(handler, request):
+        for hook in hooks:
+            await hook(handler, request)
+
+        return await call_next(handler, request)
+
+    return call
+
+
+def with_error_hooks(hooks: List[Callable], call_next: Callable) -> Callable:
+    async def call(handler, request):
+        try:
+            return await call_next(handler, request)
+        except Exception as error:
+            for hook in hooks:
+                await hook(handler, request, error)
+
+            raise
+
+    return call
+
+
+class Pipeline:
+    """
+    Middleware flattened into one callable per stage.
+
+    Middleware listed first is the outermost one: its `pre_dispatch` runs
+    first and its `around_call` wraps the ones following it.
+    `post_response` hooks are applied in the order given.
+
+    `compute(handler, request)` computes the result of a call through
+    `handler.compute_result`. `respond(handler, request, message)` returns
+    the message to send. Both are `None` if no middleware uses them.
+    """
+
+    def __init__(self, middleware: List[Middleware]):
+        self.middleware = list(middleware)
+
+        def hooks(name):
+            return [getattr(item, name) for item in self.middleware
+                    if implements(item, name)]
+
+        around = hooks('around_call')
+        pre_dispatch = hooks('pre_dispatch')
+        on_error = hooks('on_error')
+        post_response = hooks('post_response')
+
+        call = compute
+        for hook in reversed(around):
+            call = with_around(hook, call)
+
+        if pre_dispatch:
+            call = with_pre_dispatch(pre_dispatch, call)
+
+        if on_error:
+            call = with_error_hooks(on_error, call)
+
+        self.compute = call if call is not compute else None
+
+        if post_response:
+            async def respond(handler, request, message):
+                for hook in post_response:
+                    message = await hook(handler, request, message)
+
+                return message
+
+            self.respond = respond
+        else:
+            self.respond = None
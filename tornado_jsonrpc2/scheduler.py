@@ -0,0 +1,194 @@
+"""
+Scheduling calls by priority and fairly between clients.
+
+A `Scheduler` limits how many calls are computed at the same time.
+Calls waiting for a slot are queued by the priority class of their method.
+Within a class the clients take turns by weighted fair queuing so that a
+client sending many calls does not delay everybody else.
+"""
+
+import collections
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, Hashable, Optional, Union
+
+from tornado.concurrent import Future
+
+from .exceptions import ServerError
+
+__all__ = ('Scheduler', )
+
+
+class Entry:
+    __slots__ = ('client', 'future', 'arrival', 'done')
+
+    def __init__(self, client: Hashable):
+        self.client = client
+        self.future = Future()
+        self.arrival = time.monotonic()
+        self.done = False
+
+
+class FairQueue:
+    """
+    Weighted fair queuing of entries from different clients.
+
+    Every entry gets a virtual finish time that grows by the inverse of the
+    weight of its client. Entries are served in the order of these times.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.virtual_time = 0.0
+        self.finish = {}
+        self._counter = itertools.count()
+
+    def push(self, entry: Entry, weight: float) -> None:
+        start = max(self.virtual_time, self.finish.get(entry.client, 0.0))
+        finish = start + 1.0 / weight
+        self.finish[entry.client] = finish
+        heapq.heappush(self.heap, (finish, next(self._counter), start, entry))
+
+    def pop(self) -> Optional[Entry]:
+        while self.heap:
+            _, _, start, entry = heapq.heappop(self.heap)
+            if entry.done:
+                continue
+
+            self.virtual_time = start
+            if not self.heap:
+                self.finish.clear()
+
+            return entry
+
+        return None
+
+
+class Scheduler:
+    """
+    Limiting concurrent calls with priority classes and fair queuing.
+
+    At most `concurrency` calls are computed at the same time.
+    The priority class is an int where lower values are served first.
+    `weights` maps clients to their share within a class, either as
+    dict or as function of the client. Clients default to a weight of 1.
+
+    To protect lower classes from starving a call that waited longer than
+    `max_wait` seconds is served next regardless of its class.
+    Calls are rejected with a `ServerError` if `max_queue_size` calls are
+    waiting or the client already has `max_client_queue_size` calls waiting.
+    """
+
+    def __init__(self, concurrency: int=10, max_queue_size: int=1000,
+                 max_client_queue_size: Optional[int]=None,
+                 weights: Optional[Union[Dict[Hashable, float], Callable]]=None,
+                 max_wait: float=1.0):
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.max_client_queue_size = max_client_queue_size
+        self.max_wait = max_wait
+        if weights is None:
+            self.get_weight = lambda client: 1.0
+        elif callable(weights):
+            self.get_weight = weights
+        else:
+            self.get_weight = lambda client: weights.get(client, 1.0)
+
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.promoted = 0
+
+        self._queues = {}
+        self._priorities = []
+        self._arrivals = collections.deque()
+        self._client_queued = collections.Counter()
+
+    async def acquire(self, client: Hashable=None, priority: int=0) -> None:
+        """
+        Wait for a slot to compute a call.
+
+        Every successful call has to be followed by a call to `release`.
+        """
+        if self.running < self.concurrency and not self.queued:
+            self.running += 1
+            self.admitted += 1
+            return
+
+        if self.queued >= self.max_queue_size or (
+                self.max_client_queue_size is not None and
+                self._client_queued[client] >= self.max_client_queue_size):
+            self.rejected += 1
+            raise ServerError("Too many calls waiting")
+
+        entry = Entry(client)
+        try:
+            queue = self._queues[priority]
+        except KeyError:
+            queue = self._queues[priority] = FairQueue()
+            self._priorities = sorted(self._queues)
+
+        queue.push(entry, self.get_weight(client))
+        self._arrivals.append(entry)
+        self.queued += 1
+        self._client_queued[client] += 1
+
+        try:
+            await entry.future
+        except BaseException:
+            if entry.future.cancelled():
+                self._remove(entry)
+            elif entry.future.done():
+                # The slot was granted right before we got cancelled.
+                self.release()
+
+            raise
+
+    def release(self) -> None:
+        self.running -= 1
+        while self.running < self.concurrency:
+            entry = self._next()
+            if entry is None:
+                return
+
+            self._remove(entry)
+            self.running += 1
+            self.admitted += 1
+            entry.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {"running": self.running,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "promoted": self.promoted,
+                "queues": {priority: sum(1 for item in queue.heap if not item[-1].done)
+                           for priority, queue in self._queues.items()}}
+
+    def _next(self) -> Optional[Entry]:
+        arrivals = self._arrivals
+        while arrivals and arrivals[0].done:
+            arrivals.popleft()
+
+        if arrivals and time.monotonic() - arrivals[0].arrival >= self.max_wait:
+            self.promoted += 1
+            return arrivals.popleft()
+
+        for priority in self._priorities:
+            entry = self._queues[priority].pop()
+            if entry is not None:
+                return entry
+
+        return None
+
+    def _remove(self, entry: Entry) -> None:
+        if entry.done:
+            return
+
+        entry.done = True
+        self.queued -= 1
+        self._client_queued[entry.client] -= 1
+        if not self._client_queued[entry.client]:
+            del self._client_queued[entry.client]
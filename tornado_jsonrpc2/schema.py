@@ -0,0 +1,261 @@
+"""
+Compiling parameter schemas into validator functions.
+
+A subset of JSON Schema is supported:
+type, enum, minimum, maximum, exclusiveMinimum, exclusiveMaximum,
+minLength, maxLength, pattern, items, minItems, maxItems,
+properties, required and additionalProperties.
+
+Schemas are compiled once into plain functions that raise `InvalidParams`
+with the path of the offending value.
+"""
+
+import re
+from typing import Any, Callable
+
+from .exceptions import InvalidParams
+
+__all__ = ('compile_schema', 'compile_params_schema')
+
+Validator = Callable[[Any, str], None]
+
+TYPES = {
+    'null': lambda value: value is None,
+    'boolean': lambda value: isinstance(value, bool),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: (isinstance(value, (int, float)) and
+                             not isinstance(value, bool)),
+    'string': lambda value: isinstance(value, str),
+    'array': lambda value: isinstance(value, list),
+    'object': lambda value: isinstance(value, dict),
+}
+
+# Keywords without influence on validation.
+ANNOTATIONS = {'$schema', '$comment', 'title', 'description', 'default', 'examples'}
+
+
+def compile_schema(schema: dict) -> Validator:
+    """
+    Compile `schema` into a function taking the value and its path.
+
+    Raises `ValueError` for schemas using unsupported keywords.
+    """
+    unsupported = set(schema) - set(KEYWORDS) - ANNOTATIONS
+    if unsupported:
+        raise ValueError("Unsupported schema keywords: {}".format(
+            ', '.join(sorted(unsupported))))
+
+    checks = tuple(KEYWORDS[keyword](schema[keyword], schema)
+                   for keyword in KEYWORDS if keyword in schema)
+    checks = tuple(check for check in checks if check is not None)
+
+    if not checks:
+        return _accept_anything
+    elif len(checks) == 1:
+        return checks[0]
+
+    def validate(value, path):
+        for check in checks:
+            check(value, path)
+
+    return validate
+
+
+def compile_params_schema(schema: dict) -> Callable[[Any], None]:
+    """
+    Compile the schema for the params of a method.
+
+    A schema of type object with properties also accepts params given
+    by position. These are matched to the properties in their given order.
+    """
+    validate = compile_schema(schema)
+    properties = schema.get('properties')
+    if schema.get('type') != 'object' or not properties:
+        def validate_params(params):
+            validate(params, 'params')
+
+        return validate_params
+
+    names = tuple(properties)
+    positional = tuple(compile_schema(properties[name]) for name in names)
+    required = set(schema.get('required', ()))
+    max_length = len(names)
+
+    def validate_params(params):
+        if params is None:
+            params = {}
+
+        if isinstance(params, list):
+            if len(params) > max_length:
+                raise InvalidParams("params: expected at most {} values, got {}".format(
+                    max_length, len(params)))
+
+            for name in names[len(params):]:
+                if name in required:
+                    raise InvalidParams("params: missing value for {!r}".format(name))
+
+            for index, value in enumerate(params):
+                positional[index](value, 'params[{}]'.format(index))
+        else:
+            validate(params, 'params')
+
+    return validate_params
+
+
+def _accept_anything(value, path):
+    pass
+
+
+def _type(expected, schema):
+    if isinstance(expected, str):
+        expected = [expected]
+
+    try:
+        tests = tuple(TYPES[name] for name in expected)
+    except KeyError as kerr:
+        raise ValueError("Unknown type {!s}".format(kerr))
+
+    description = ' or '.join(expected)
+
+    def check(value, path):
+        for test in tests:
+            if test(value):
+                return
+
+        raise InvalidParams("{}: expected {}, got {}".format(
+            path, description, _type_name(value)))
+
+    return check
+
+
+def _enum(allowed, schema):
+    allowed = list(allowed)
+
+    def check(value, path):
+        if value not in allowed:
+            raise InvalidParams("{}: {!r} is not one of {!r}".format(path, value, allowed))
+
+    return check
+
+
+def _number_check(compare, description):
+    def keyword(limit, schema):
+        def check(value, path):
+            if (isinstance(value, (int, float)) and not isinstance(value, bool) and
+                    not compare(value, limit)):
+                raise InvalidParams("{}: {!r} {} {!r}".format(path, value, description, limit))
+
+        return check
+
+    return keyword
+
+
+def _length_check(types, compare, description):
+    def keyword(limit, schema):
+        def check(value, path):
+            if isinstance(value, types) and not compare(len(value), limit):
+                raise InvalidParams("{}: length {} {} {}".format(
+                    path, len(value), description, limit))
+
+        return check
+
+    return keyword
+
+
+def _pattern(pattern, schema):
+    regex = re.compile(pattern)
+
+    def check(value, path):
+        if isinstance(value, str) and not regex.search(value):
+            raise InvalidParams("{}: {!r} does not match {!r}".format(path, value, pattern))
+
+    return check
+
+
+def _items(items, schema):
+    validate = compile_schema(items)
+
+    def check(value, path):
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                validate(item, '{}[{}]'.format(path, index))
+
+    return check
+
+
+def _properties(properties, schema):
+    validators = tuple((name, compile_schema(subschema))
+                       for name, subschema in properties.items())
+
+    def check(value, path):
+        if isinstance(value, dict):
+            for name, validate in validators:
+                if name in value:
+                    validate(value[name], '{}.{}'.format(path, name))
+
+    return check
+
+
+def _required(required, schema):
+    required = tuple(required)
+
+    def check(value, path):
+        if isinstance(value, dict):
+            for name in required:
+                if name not in value:
+                    raise InvalidParams("{}: missing value for {!r}".format(path, name))
+
+    return check
+
+
+def _additional_properties(additional, schema):
+    known = frozenset(schema.get('properties', ()))
+    if additional is True:
+        return None
+    elif additional is False:
+        validate = None
+    else:
+        validate = compile_schema(additional)
+
+    def check(value, path):
+        if not isinstance(value, dict):
+            return
+
+        for name in value:
+            if name in known:
+                continue
+
+            if validate is None:
+                raise InvalidParams("{}: unexpected value for {!r}".format(path, name))
+
+            validate(value[name], '{}.{}'.format(path, name))
+
+    return check
+
+
+def _type_name(value) -> str:
+    for name in ('null', 'boolean', 'integer', 'number', 'string', 'array', 'object'):
+        if TYPES[name](value):
+            return name
+
+    return type(value).__name__
+
+
+# The order defines the order of checks: types are checked first.
+KEYWORDS = {
+    'type': _type,
+    'enum': _enum,
+    'minimum': _number_check(lambda value, limit: value >= limit, 'is less than'),
+    'maximum': _number_check(lambda value, limit: value <= limit, 'is greater than'),
+    'exclusiveMinimum': _number_check(lambda value, limit: value > limit, 'is not greater than'),
+    'exclusiveMaximum': _number_check(lambda value, limit: value < limit, 'is not less than'),
+    'minLength': _length_check(str, lambda length, limit: length >= limit, 'is less than'),
+    'maxLength': _length_check(str, lambda length, limit: length <= limit, 'is greater than'),
+    'pattern': _pattern,
+    'minItems': _length_check(list, lambda length, limit: length >= limit, 'is less than'),
+    'maxItems': _length_check(list, lambda length, limit: length <= limit, 'is greater than'),
+    'items': _items,
+    'required': _required,
+    'properties': _properties,
+    'additionalProperties': _additional_properties,
+}
@@ -0,0 +1,123 @@
+"""
+An RPC service configured once for the whole application.
+
+Tornado creates a handler per request. An `RPCService` holds everything
+the handlers need: the methods, the codec, limits, middleware and
+instrumentation. It is built once at startup and every
+`RPCServiceHandler` only copies the prepared settings.
+"""
+
+from typing import Callable, List, Optional, Tuple, Union
+
+from .dispatcher import Dispatcher, Method
+from .handler import JSONRPCProcessor, StreamingJSONRPCHandler
+from .middleware import Middleware, Pipeline
+
+__all__ = ('RPCService', 'RPCServiceHandler')
+
+
+class RPCService:
+    """
+    Methods and configuration shared by all requests.
+
+    Methods are registered with `add_method` or `method` like on a
+    `Dispatcher`. `middleware` may be a `Pipeline` or a list of middleware.
+    The remaining options are those of `JSONRPCHandler`, like `version`,
+    `max_body_size`, `allow_get`, `scheduler` or `access_log`.
+    """
+
+    def __init__(self, dispatcher: Optional[Dispatcher]=None,
+                 middleware: Optional[Union[Pipeline, List[Middleware]]]=None,
+                 max_body_size: Optional[int]=None, allow_get: bool=False,
+                 **options):
+        self.dispatcher = dispatcher if dispatcher is not None else Dispatcher()
+        if middleware is not None and not isinstance(middleware, Pipeline):
+            middleware = Pipeline(middleware)
+
+        self.middleware = middleware
+        self.options = options
+
+        self.max_body_size = max_body_size
+        self.allow_get = allow_get
+        self.handler_settings = JSONRPCProcessor.jsonrpc_settings(middleware=middleware,
+                                                                  **options)
+
+    def add_method(self, func: Callable, name: Optional[str]=None, **options) -> Method:
+        return self.dispatcher.add_method(func, name=name, **options)
+
+    def method(self, name: Optional[str]=None, **options) -> Callable:
+        return self.dispatcher.method(name=name, **options)
+
+    def route(self, path: str=r"/jsonrpc") -> Tuple[str, type, dict]:
+        """
+        Get a route spec serving this service at `path`.
+        """
+        return (path, RPCServiceHandler, {"service": self})
+
+    def warm_up(self) -> None:
+        """
+        Start the instrumentation. Has to be called on the IOLoop thread.
+
+        Without this the instrumentation starts with the first call.
+        """
+        watchdog = self.handler_settings.get('watchdog')
+        if watchdog is not None:
+            watchdog.start()
+
+        for name in ('access_log', 'capture'):
+            writer = self.handler_settings.get(name)
+            if writer is not None:
+                writer.start()
+
+    async def close(self) -> None:
+        """
+        Stop the instrumentation and write the remaining access log and
+        captured traffic.
+        """
+        watchdog = self.handler_settings.get('watchdog')
+        if watchdog is not None:
+            watchdog.stop()
+
+        for name in ('access_log', 'capture'):
+            writer = self.handler_settings.get(name)
+            if writer is not None:
+                await writer.close()
+
+    def stats(self) -> dict:
+        """
+        Collect the stats of all configured components.
+
+        Stats of middleware are collected under ``middleware`` by the name
+        of their class.
+        """
+        stats = {}
+        for name in ('deduplicator', 'scheduler', 'access_log', 'watchdog', 'idempotency',
+                     'capture', 'inflight'):
+            component = self.handler_settings.get(name)
+            if component is not None:
+                stats[name] = component.stats()
+
+        if self.middleware is not None:
+            middleware_stats = {
+                type(middleware).__name__: middleware.stats()
+                for middleware in self.middleware.middleware
+                if callable(getattr(middleware, 'stats', None))}
+            if middleware_stats:
+                stats["middleware"] = middleware_stats
+
+        return stats
+
+
+class RPCServiceHandler(StreamingJSONRPCHandler):
+    """
+    A handler taking its configuration from an `RPCService`.
+    """
+
+    def initialize(self, service: RPCService):
+        self.service = service
+        super().initialize(service.dispatcher, max_body_size=service.max_body_size,
+                           allow_get=service.allow_get)
+
+    def setup_jsonrpc(self, **options) -> None:
+        # Prepared once by the service instead of for every request.
+        self.__dict__.update(self.service.handler_settings)
@@ -0,0 +1,148 @@
+"""
+JSON-RPC over plain TCP and Unix domain sockets.
+
+Messages are framed either by a newline after every message or by a
+4 byte big-endian length before every message.
+Clients may send further requests before the responses arrived.
+Responses are sent as soon as they are ready and may arrive in a
+different order than the requests.
+"""
+
+import struct
+from typing import Awaitable, Optional
+
+from tornado.escape import json_encode
+from tornado.iostream import IOStream, StreamClosedError, UnsatisfiableReadError
+from tornado.ioloop import IOLoop
+from tornado.locks import Semaphore
+from tornado.log import app_log
+from tornado.netutil import bind_unix_socket
+from tornado.tcpserver import TCPServer
+
+from .dispatcher import Dispatcher
+from .exceptions import InvalidRequest
+from .handler import JSONRPCProcessor
+
+__all__ = ('JSONRPCConnection', 'JSONRPCTCPServer')
+
+LENGTH = struct.Struct('>I')
+
+
+class JSONRPCConnection(JSONRPCProcessor):
+    """
+    Processing the JSON-RPC messages received on one connection.
+
+    At most `max_in_flight` requests are processed at the same time.
+    Further messages are not read before one of them has been answered.
+    """
+
+    def __init__(self, server: 'JSONRPCTCPServer', stream: IOStream, address):
+        self.setup_jsonrpc(version=server.version, **server.options)
+        self.server = server
+        self.stream = stream
+        self.address = address
+        self.create_response = server.create_response
+        self._slots = Semaphore(server.max_in_flight)
+
+    def get_client_id(self):
+        if isinstance(self.address, tuple):
+            return self.address[0]
+
+        return self.address
+
+    def get_method(self, name: str):
+        if isinstance(self.create_response, Dispatcher):
+            return self.create_response.get_method(name)
+
+    async def compute_result(self, request):
+        return await self.create_response(request)
+
+    async def serve(self) -> None:
+        try:
+            while True:
+                await self._slots.acquire()
+                try:
+                    message = await self.read_message()
+                except UnsatisfiableReadError:
+                    error = InvalidRequest("Message exceeds the maximum size of {} bytes".format(
+                        self.server.max_message_size))
+                    await self.write_message(json_encode(self.exception_to_jsonrpc(error)))
+                    self.stream.close()
+                    return
+
+                if message is None:
+                    self._slots.release()
+                    continue
+
+                IOLoop.current().add_callback(self.respond, message)
+        except StreamClosedError:
+            pass
+
+    async def read_message(self) -> Optional[bytes]:
+        """
+        Read the next message. Returns `None` for empty messages.
+        """
+        max_size = self.server.max_message_size
+        if self.server.framing == 'length':
+            header = await self.stream.read_bytes(LENGTH.size)
+            length, = LENGTH.unpack(header)
+            if length > max_size:
+                raise UnsatisfiableReadError()
+
+            message = await self.stream.read_bytes(length)
+        else:
+            message = await self.stream.read_until(b'\n', max_bytes=max_size + 1)
+
+        return message.strip() or None
+
+    async def write_message(self, message: str) -> None:
+        data = message.encode('utf-8')
+        if self.server.framing == 'length':
+            await self.stream.write(LENGTH.pack(len(data)) + data)
+        else:
+            await self.stream.write(data + b'\n')
+
+    async def respond(self, message: bytes) -> None:
+        try:
+            response = await self.execute_jsonrpc(message)
+            if response is not None:
+                await self.write_message(json_encode(response))
+        except StreamClosedError:
+            pass
+        except Exception:
+            app_log.exception("Error while answering %r", message)
+            self.stream.close()
+        finally:
+            self._slots.release()
+
+
+class JSONRPCTCPServer(TCPServer):
+    """
+    A server answering JSON-RPC requests over TCP or Unix domain sockets.
+
+    `framing` is either "newline" to terminate messages by a newline or
+    "length" to prefix them by their length as 4 byte big-endian integer.
+    Messages larger than `max_message_size` bytes make the server close the
+    connection. With length framing an error response is sent before.
+    Further options are those of `JSONRPCProcessor.jsonrpc_settings`.
+    """
+
+    def __init__(self, response_creator: Awaitable, version: Optional[str]=None,
+                 framing: str='newline', max_in_flight: int=16,
+                 max_message_size: int=1024 * 1024, ssl_options=None, **options):
+        if framing not in ('newline', 'length'):
+            raise ValueError("Unknown framing {!r}".format(framing))
+
+        super().__init__(ssl_options=ssl_options, max_buffer_size=max_message_size + 1024)
+        self.create_response = response_creator
+        self.version = version
+        self.framing = framing
+        self.max_in_flight = max_in_flight
+        self.max_message_size = max_message_size
+        self.options = options
+
+    def listen_unix(self, path: str, mode: int=0o600) -> None:
+        self.add_socket(bind_unix_socket(path, mode=mode))
+
+    async def handle_stream(self, stream: IOStream, address) -> None:
+        await JSONRPCConnection(self, stream, address).serve()
@@ -0,0 +1,211 @@
+"""
+Numeric arrays sent as tagged binary buffers.
+
+Instead of a list of numbers an array is sent as object::
+
+    {"$typedarray": "<base64 of the little-endian buffer>",
+     "dtype": "float64", "shape": [2, 3]}
+
+The `TypedArrays` middleware decodes such objects in params into NumPy
+arrays or, if NumPy is not installed, into `memoryview` objects using
+the decoded buffer without copying it.
+Arrays, memoryviews and `array.array` objects in results are encoded the
+same way for clients asking for it and as plain lists for everyone else.
+"""
+
+import array
+import base64
+import binascii
+import sys
+from typing import Optional
+
+from .exceptions import InvalidParams
+from .middleware import Middleware
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ('TypedArrays', 'decode_array', 'encode_array')
+
+TAG = '$typedarray'
+HEADER = 'X-Typed-Arrays'
+
+FORMATS = {
+    'int8': 'b', 'uint8': 'B',
+    'int16': 'h', 'uint16': 'H',
+    'int32': 'i', 'uint32': 'I',
+    'int64': 'q', 'uint64': 'Q',
+    'float32': 'f', 'float64': 'd',
+}
+DTYPES = {format: dtype for dtype, format in FORMATS.items()}
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def decode_array(obj: dict):
+    """
+    Decode a tagged array into a NumPy array or a `memoryview`.
+    """
+    dtype = obj.get('dtype')
+    shape = obj.get('shape')
+    try:
+        format = FORMATS[dtype]
+    except (KeyError, TypeError):
+        raise InvalidParams("Unsupported dtype {!r}".format(dtype))
+
+    if not isinstance(shape, list) or not all(
+            isinstance(size, int) and size >= 0 for size in shape):
+        raise InvalidParams("Invalid shape {!r}".format(shape))
+
+    try:
+        buffer = base64.b64decode(obj[TAG], validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        raise InvalidParams("Invalid data for typed array")
+
+    count = 1
+    for size in shape:
+        count *= size
+
+    itemsize = array.array(format).itemsize
+    if len(buffer) != count * itemsize:
+        raise InvalidParams("Data does not match shape {!r}".format(shape))
+
+    try:
+        if numpy is not None:
+            return numpy.frombuffer(
+                buffer, dtype=numpy.dtype(dtype).newbyteorder('<')).reshape(shape)
+
+        if count == 0:
+            # A memoryview can not have zeros in its shape, only be empty.
+            if len(shape) != 1:
+                raise InvalidParams(
+                    "Empty arrays with shape {!r} need NumPy".format(shape))
+
+            return memoryview(buffer).cast(format)
+
+        if not LITTLE_ENDIAN:
+            swapped = array.array(format, buffer)
+            swapped.byteswap()
+            buffer = swapped.tobytes()
+
+        return memoryview(buffer).cast(format, shape)
+    except (TypeError, ValueError) as error:
+        raise InvalidParams("Invalid typed array: {}".format(error))
+
+
+def encode_array(value, tagged: bool=True):
+    """
+    Encode a NumPy array, `memoryview` or `array.array`.
+
+    Returns a tagged array or, if `tagged` is false or the type of the
+    items is not supported, a list.
+    """
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        if not tagged or value.dtype.name not in FORMATS:
+            return value.tolist()
+
+        value = numpy.ascontiguousarray(value, dtype=value.dtype.newbyteorder('<'))
+        return {TAG: base64.b64encode(memoryview(value).cast('B')).decode('ascii'),
+                "dtype": value.dtype.name,
+                "shape": list(value.shape)}
+
+    if isinstance(value, array.array):
+        value = memoryview(value)
+
+    dtype = DTYPES.get(value.format.lstrip('@='))
+    if not tagged or dtype is None:
+        return value.tolist()
+
+    if not value.c_contiguous:
+        value = memoryview(value.tobytes()).cast(value.format, value.shape)
+
+    if LITTLE_ENDIAN:
+        data = value.cast('B') if value.ndim else value.tobytes()
+    else:
+        swapped = array.array(value.format.lstrip('@='), value.tobytes())
+        swapped.byteswap()
+        data = swapped.tobytes()
+
+    return {TAG: base64.b64encode(data).decode('ascii'),
+            "dtype": dtype,
+            "shape": list(value.shape)}
+
+
+def is_array(value) -> bool:
+    return (isinstance(value, (memoryview, array.array)) or
+            (numpy is not None and isinstance(value, numpy.ndarray)))
+
+
+def decode_arrays(value) -> tuple:
+    """
+    Replace tagged arrays anywhere in `value` by their decoded arrays.
+
+    Returns the new value and if any typed arrays were found.
+    """
+    if isinstance(value, dict):
+        if TAG in value:
+            return decode_array(value), True
+
+        items = [(key, decode_arrays(item)) for key, item in value.items()]
+        return ({key: item for key, (item, _) in items},
+                any(found for _, (_, found) in items))
+    elif isinstance(value, list):
+        items = [decode_arrays(item) for item in value]
+        return [item for item, _ in items], any(found for _, found in items)
+
+    return value, False
+
+
+def encode_arrays(value, tagged: bool):
+    """
+    Replace arrays anywhere in `value` by tagged arrays or lists.
+    """
+    if is_array(value):
+        return encode_array(value, tagged)
+    elif isinstance(value, dict):
+        return {key: encode_arrays(item, tagged) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [encode_arrays(item, tagged) for item in value]
+
+    return value
+
+
+class TypedArrays(Middleware):
+    """
+    Decoding typed arrays in params and encoding arrays in results.
+
+    Results are encoded as typed arrays if `tagged` is true, as lists if it
+    is false. By default this is decided per request: clients sending the
+    header ``X-Typed-Arrays: 1`` or typed arrays in their params get typed
+    arrays.
+    """
+
+    def __init__(self, tagged: Optional[bool]=None):
+        self.tagged = tagged
+
+    async def around_call(self, handler, request, call_next):
+        tagged = self.tagged
+        try:
+            params = request.params
+        except AttributeError:
+            params = None
+
+        if params is not None:
+            request.params, found = decode_arrays(params)
+            if tagged is None and found:
+                tagged = True
+
+        if tagged is None:
+            tagged = accepts_typed_arrays(handler)
+
+        return encode_arrays(await call_next(request), tagged)
+
+
+def accepts_typed_arrays(handler) -> bool:
+    try:
+        headers = handler.request.headers
+    except AttributeError:
+        return False
+
+    return headers.get(HEADER) == '1'
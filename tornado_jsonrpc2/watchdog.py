@@ -0,0 +1,153 @@
+"""
+Detecting calls that block the IOLoop.
+
+A `LoopWatchdog` runs a heartbeat on the IOLoop and a thread watching it.
+If the heartbeat is late by more than a threshold the thread captures the
+stack of the loop thread. The stall is attributed to the call that was
+running in the current task of the loop.
+"""
+
+import collections
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Optional
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.log import app_log
+
+from .compat import current_task
+
+__all__ = ('LoopWatchdog', 'Stall')
+
+Stall = collections.namedtuple('Stall', 'duration method id stack')
+
+
+class LoopWatchdog:
+    """
+    Reporting stalls of the IOLoop longer than `threshold` seconds.
+
+    The heartbeat runs every `interval` seconds, by default a fifth of the
+    threshold. Handlers configured with the watchdog register the call
+    they are computing so that stalls can be attributed to a method and id.
+
+    Every stall is logged as warning and passed to `on_stall` if given.
+    The last `history` stalls are kept in `recent`.
+    """
+
+    def __init__(self, threshold: float=0.1, interval: Optional[float]=None,
+                 on_stall: Optional[Callable[[Stall], None]]=None,
+                 history: int=100):
+        self.threshold = threshold
+        self.interval = interval if interval is not None else threshold / 5
+        self.on_stall = on_stall
+        self.recent = collections.deque(maxlen=history)
+        self.methods = {}
+        self.stalls = 0
+
+        self._calls = {}
+        self._beat = None
+        self._capture = None
+        self._heartbeat = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._loop = None
+        self._loop_thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None
+
+    def start(self) -> None:
+        """
+        Start watching the current IOLoop. Has to be called on its thread.
+        """
+        if self.running:
+            return
+
+        self._loop = IOLoop.current().asyncio_loop
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+
+        self._heartbeat = PeriodicCallback(self._on_heartbeat, self.interval * 1000)
+        self._heartbeat.start()
+        self._thread = threading.Thread(target=self._watch, name='LoopWatchdog',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+
+        self._heartbeat.stop()
+        self._heartbeat = None
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def enter(self, request) -> None:
+        """
+        Register `request` as the call computed by the current task.
+        """
+        if not self.running:
+            self.start()
+
+        self._calls[current_task()] = request
+
+    def exit(self) -> None:
+        self._calls.pop(current_task(), None)
+
+    def stats(self) -> dict:
+        return {"stalls": self.stalls,
+                "methods": {method: dict(stats) for method, stats in self.methods.items()}}
+
+    def _on_heartbeat(self) -> None:
+        now = time.monotonic()
+        lag = now - self._beat - self.interval
+        self._beat = now
+
+        capture, self._capture = self._capture, None
+        if lag < self.threshold:
+            return
+
+        method, request_id, stack = capture or (None, None, None)
+        stall = Stall(lag, method, request_id, stack)
+        self.stalls += 1
+        self.recent.append(stall)
+
+        stats = self.methods.setdefault(method, {"stalls": 0, "total": 0.0, "max": 0.0})
+        stats["stalls"] += 1
+        stats["total"] += lag
+        stats["max"] = max(stats["max"], lag)
+
+        app_log.warning("IOLoop blocked for %.3fs by method %r (id %r)%s",
+                        lag, method, request_id,
+                        ":\n" + ''.join(stack) if stack else "")
+        if self.on_stall is not None:
+            try:
+                self.on_stall(stall)
+            except Exception:
+                app_log.exception("Error in stall callback")
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval / 2):
+            lag = time.monotonic() - self._beat - self.interval
+            if lag < self.threshold or self._capture is not None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = traceback.format_stack(frame) if frame is not None else None
+
+            request = None
+            try:
+                task = current_task(self._loop)
+            except RuntimeError:
+                task = None
+
+            if task is not None:
+                request = self._calls.get(task)
+
+            self._capture = (getattr(request, 'method', None),
+                             getattr(request, 'id', None), stack)
@@ -0,0 +1,218 @@
+"""
+JSON-RPC over WebSocket with subscriptions to topics.
+
+Clients subscribe to topics of a `SubscriptionHub` by calling
+``rpc.subscribe`` and unsubscribe by calling ``rpc.unsubscribe``, both with
+a list of topic names as params.
+Everything published to a topic is sent to its subscribers as JSON-RPC 2.0
+notification with the topic as method.
+"""
+
+import collections
+from typing import Awaitable, Optional
+
+from tornado.escape import json_encode
+from tornado.ioloop import IOLoop
+from tornado.websocket import WebSocketClosedError, WebSocketHandler
+
+from .dispatcher import Dispatcher
+from .exceptions import InvalidParams
+from .handler import JSONRPCProcessor
+
+__all__ = ('JSONRPCWebSocketHandler', 'SubscriptionHub')
+
+SUBSCRIBE = 'rpc.subscribe'
+UNSUBSCRIBE = 'rpc.unsubscribe'
+
+
+class SubscriptionHub:
+    """
+    Topics to publish notifications on.
+
+    A notification is encoded once per publish and the same message is
+    handed to every subscriber.
+    Messages not yet sent are buffered per subscriber.
+    If a subscriber has `buffer_size` messages waiting the `overflow`
+    policy is applied: "drop" discards the oldest waiting message and
+    "disconnect" closes the connection to the subscriber.
+    """
+
+    def __init__(self, buffer_size: int=100, overflow: str='drop'):
+        if overflow not in ('drop', 'disconnect'):
+            raise ValueError("Unknown overflow policy {!r}".format(overflow))
+
+        self.buffer_size = buffer_size
+        self.overflow = overflow
+        self.topics = {}
+        self.dropped = 0
+        self.disconnected = 0
+
+    def add_topic(self, name: str) -> None:
+        self.topics.setdefault(name, set())
+
+    def remove_topic(self, name: str) -> None:
+        self.topics.pop(name, None)
+
+    def subscribe(self, name: str, subscriber: 'Subscriber') -> None:
+        try:
+            self.topics[name].add(subscriber)
+        except KeyError:
+            raise InvalidParams("Unknown topic {!r}".format(name))
+
+    def unsubscribe(self, name: str, subscriber: 'Subscriber') -> None:
+        try:
+            self.topics[name].discard(subscriber)
+        except KeyError:
+            raise InvalidParams("Unknown topic {!r}".format(name))
+
+    def unsubscribe_all(self, subscriber: 'Subscriber') -> None:
+        for subscribers in self.topics.values():
+            subscribers.discard(subscriber)
+
+    def publish(self, name: str, params=None) -> int:
+        """
+        Send a notification to all subscribers of the topic `name`.
+
+        Returns the number of subscribers the notification was handed to.
+        Unknown topics have no subscribers.
+        """
+        subscribers = self.topics.get(name)
+        if not subscribers:
+            return 0
+
+        notification = {"jsonrpc": "2.0", "method": name}
+        if params is not None:
+            notification["params"] = params
+
+        message = json_encode(notification).encode('utf-8')
+        return sum(subscriber.push(message) for subscriber in tuple(subscribers))
+
+    def stats(self) -> dict:
+        return {"topics": {name: len(subscribers)
+                           for name, subscribers in self.topics.items()},
+                "dropped": self.dropped,
+                "disconnected": self.disconnected}
+
+
+class Subscriber:
+    """
+    The buffered connection of one client to a `SubscriptionHub`.
+    """
+
+    def __init__(self, hub: SubscriptionHub, handler: WebSocketHandler):
+        self.hub = hub
+        self.handler = handler
+        self.buffer = collections.deque()
+        self.dropped = 0
+        self.closed = False
+        self._sending = False
+
+    def push(self, message: bytes) -> bool:
+        """
+        Queue `message` for sending. Returns if it was queued.
+        """
+        if self.closed:
+            return False
+
+        if len(self.buffer) >= self.hub.buffer_size:
+            if self.hub.overflow == 'disconnect':
+                self.hub.disconnected += 1
+                self.close()
+                self.handler.close(1008, "Too slow")
+                return False
+
+            self.buffer.popleft()
+            self.dropped += 1
+            self.hub.dropped += 1
+
+        self.buffer.append(message)
+        if not self._sending:
+            self._sending = True
+            IOLoop.current().add_callback(self._send)
+
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self.buffer.clear()
+        self.hub.unsubscribe_all(self)
+
+    async def _send(self) -> None:
+        try:
+            while self.buffer:
+                # Waiting for the write to finish makes slow clients
+                # fill their buffer instead of the memory of the stream.
+                await self.handler.write_message(self.buffer.popleft())
+        except WebSocketClosedError:
+            self.close()
+        finally:
+            self._sending = False
+
+
+class JSONRPCWebSocketHandler(JSONRPCProcessor, WebSocketHandler):
+    """
+    Handling JSON-RPC messages received through a WebSocket.
+
+    Calls are answered like the `JSONRPCHandler` does.
+    Subscriptions are only available if a `SubscriptionHub` is given.
+    """
+
+    def initialize(self, response_creator: Awaitable,
+                   hub: Optional[SubscriptionHub]=None,
+                   version: Optional[str]=None, **options):
+        self.setup_jsonrpc(version=version, **options)
+        self.create_response = response_creator
+        self.hub = hub
+        self.subscriber = None
+
+    async def on_message(self, message) -> None:
+        response = await self.execute_jsonrpc(message)
+        if response is None:
+            return
+
+        try:
+            await self.write_message(json_encode(response))
+        except WebSocketClosedError:
+            pass
+
+    def on_close(self) -> None:
+        if self.subscriber is not None:
+            self.subscriber.close()
+
+    def get_client_id(self):
+        return self.request.remote_ip
+
+    def get_method(self, name: str):
+        if isinstance(self.create_response, Dispatcher):
+            return self.create_response.get_method(name)
+
+    async def compute_result(self, request):
+        if self.hub is not None and request.method in (SUBSCRIBE, UNSUBSCRIBE):
+            return self.manage_subscriptions(request)
+
+        return await self.create_response(request)
+
+    def manage_subscriptions(self, request) -> list:
+        try:
+            topics = request.params
+        except AttributeError:
+            topics = None
+
+        if not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics):
+            raise InvalidParams("Expected a list of topics")
+
+        unknown = [topic for topic in topics if topic not in self.hub.topics]
+        if unknown:
+            raise InvalidParams("Unknown topics {!r}".format(unknown))
+
+        if request.method == SUBSCRIBE:
+            if self.subscriber is None:
+                self.subscriber = Subscriber(self.hub, self)
+
+            for topic in topics:
+                self.hub.subscribe(topic, self.subscriber)
+        elif self.subscriber is not None:
+            for topic in topics:
+                self.hub.unsubscribe(topic, self.subscriber)
+
+        return topics